@@ -0,0 +1,36 @@
+"""
+Admin API endpoints for operational metrics
+"""
+
+from fastapi import APIRouter, Depends
+from typing import Any, Dict
+from app.core.auth import clerk_auth, AuthenticatedUser
+from app.core.database import query_profiler
+from app.core.metrics import request_metrics
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/metrics")
+async def get_request_metrics(
+    auth: AuthenticatedUser = Depends(clerk_auth)
+) -> Dict[str, Any]:
+    """Per-route latency percentiles and database usage since startup (protected)"""
+    return request_metrics.snapshot()
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    auth: AuthenticatedUser = Depends(clerk_auth)
+) -> Dict[str, Any]:
+    """Slowest statements with their query plans, when QUERY_PROFILER_ENABLED is set (protected)"""
+    return query_profiler.snapshot()
+
+
+@router.delete("/slow-queries")
+async def reset_slow_queries(
+    auth: AuthenticatedUser = Depends(clerk_auth)
+) -> Dict[str, Any]:
+    """Forget the recorded statements and plans (protected)"""
+    query_profiler.reset()
+    return query_profiler.snapshot()
@@ -3,10 +3,12 @@ Email API endpoints for sending bulk emails to event registrants
 """
 
 from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.responses import JSONResponse
 from typing import Dict, Optional
 from pydantic import BaseModel, Field
 from app.services.email_messaging_service import EmailMessagingService
 from app.services.message_template_service import message_template_service
+from app.services.job_service import JobService, job_worker
 from app.core.auth import clerk_auth, AuthenticatedUser
 
 router = APIRouter(prefix="/email", tags=["email"])
@@ -22,6 +24,7 @@ class BulkEmailRequest(BaseModel):
     send_to: str = "all"  # "all" or "subset"
     filter_field: Optional[str] = None
     filter_value: Optional[str] = None
+    background: bool = False  # queue as a background job and return its id
 
 
 @router.post("/send-bulk/", status_code=status.HTTP_200_OK)
@@ -40,6 +43,7 @@ async def send_bulk_emails(
     - **send_to**: "all" or "subset"
     - **filter_field**: Field name to filter by (required if send_to="subset")
     - **filter_value**: Value to match for filtering (required if send_to="subset")
+    - **background**: Queue the send as a job and return 202 with its id (poll /api/jobs/{job_id})
 
     Returns summary of sent emails (success, failed, total)
     """
@@ -61,6 +65,33 @@ async def send_bulk_emails(
 
             message_text = template.template_text
 
+        if request.background:
+            # Snapshot the recipients and let the job worker do the sending
+            registrations = await email_service.get_target_registrations(
+                request.event_id, request.send_to, request.filter_field, request.filter_value
+            )
+            if not registrations:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="No registrations found to send to"
+                )
+
+            job = await JobService.create_job(
+                event_id=request.event_id,
+                job_type="email_bulk",
+                payload={
+                    "subject": request.subject,
+                    "message": message_text,
+                    "template_variables": request.template_variables,
+                },
+                registration_ids=[reg["id"] for reg in registrations]
+            )
+            job_worker.submit(job.id)
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content={"job_id": job.id, "status": job.status, "total": job.total}
+            )
+
         # Send bulk emails
         result = await email_service.send_bulk_emails(
             event_id=request.event_id,
@@ -11,13 +11,13 @@ router = APIRouter(prefix="/events/{event_id}/fields", tags=["event-fields"])
 async def get_event_fields(event_id: str):
     """Get all fields for an event"""
     try:
-        event = await EventService.get_event(event_id)
-        if not event:
+        fields = await EventService.get_event_fields(event_id)
+        if fields is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Event not found",
             )
-        return event.fields
+        return fields
     except HTTPException:
         raise
     except Exception as e:
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
-from app.schemas.event import EventCreate, EventUpdate, EventResponse
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from app.schemas.event import EventCreate, EventUpdate, EventResponse, EventFacetsResponse
+from app.schemas.registration import RegistrationImportResponse
 from app.services.event_service import EventService
+from app.services.export_service import ExportService
+from app.services.facet_service import FacetService
+from app.services.import_service import ImportService
 from app.core.auth import clerk_auth, AuthenticatedUser
 
 router = APIRouter(prefix="/events", tags=["events"])
@@ -24,11 +29,13 @@ async def create_event(
 
 @router.get("/", response_model=List[EventResponse])
 async def get_all_events(
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    offset: int = Query(0, ge=0),
     auth: AuthenticatedUser = Depends(clerk_auth)
 ):
-    """Get all events (protected)"""
+    """Get all events, newest first; pass limit/offset to page (protected)"""
     try:
-        return await EventService.get_all_events()
+        return await EventService.get_all_events(limit=limit, offset=offset)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -165,16 +172,138 @@ async def delete_event(
         )
 
 
+@router.get("/{event_id}/facets", response_model=EventFacetsResponse)
+async def get_event_facets(
+    event_id: str,
+    auth: AuthenticatedUser = Depends(clerk_auth)
+):
+    """Answer counts (total and checked in) for every form field of an event (protected)"""
+    try:
+        facets = await FacetService.get_facets(event_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch facets: {str(e)}",
+        )
+    if not facets:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found",
+        )
+    return facets
+
+
 @router.get("/{event_id}/registrations")
 async def get_event_registrations(
     event_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    checked_in: Optional[bool] = Query(None),
+    email_prefix: Optional[str] = Query(None),
+    phone_prefix: Optional[str] = Query(None),
+    form_filter: List[str] = Query([], description="Form answer filters as field_name:value"),
+    fields: Optional[str] = Query(None, description="Comma-separated keys to return, e.g. email,form_data.name"),
     auth: AuthenticatedUser = Depends(clerk_auth)
 ):
-    """Get all registrations for an event (protected)"""
+    """Get registrations for an event, newest first (protected)
+
+    Without `limit` every matching registration is returned. With `limit`, the
+    cursor for the next page (if any) is sent in the `X-Next-Cursor` header.
+    """
     try:
-        return await EventService.get_event_registrations(event_id)
+        form_filters = {}
+        for item in form_filter:
+            field_name, sep, value = item.partition(":")
+            if not sep or not field_name:
+                raise ValueError(f"Invalid form_filter '{item}', expected field_name:value")
+            form_filters[field_name] = value
+
+        page = await EventService.get_event_registrations_page(
+            event_id,
+            limit=limit,
+            cursor=cursor,
+            checked_in=checked_in,
+            email_prefix=email_prefix,
+            phone_prefix=phone_prefix,
+            form_filters=form_filters,
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+        )
+        if page["next_cursor"]:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
+        return page["registrations"]
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch registrations: {str(e)}",
         )
+
+
+@router.get("/{event_id}/registrations/export")
+async def export_event_registrations(
+    event_id: str,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    checked_in: Optional[bool] = Query(None),
+    auth: AuthenticatedUser = Depends(clerk_auth)
+):
+    """Stream all registrations for an event as CSV or NDJSON (protected)"""
+    event = await EventService.get_event(event_id)
+    if not event:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found",
+        )
+
+    if format == "ndjson":
+        stream = ExportService.stream_ndjson(event_id, checked_in)
+        media_type = "application/x-ndjson"
+    else:
+        stream = ExportService.stream_csv(event_id, checked_in)
+        media_type = "text/csv"
+
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="registrations-{event_id}.{format}"'
+        },
+    )
+
+
+@router.post("/{event_id}/registrations/import", response_model=RegistrationImportResponse)
+async def import_event_registrations(
+    event_id: str,
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    send_confirmations: bool = Query(False),
+    auth: AuthenticatedUser = Depends(clerk_auth)
+):
+    """Bulk import registrations from a CSV or NDJSON request body (protected)
+
+    Rows are validated against the event's fields; emails already registered
+    are counted as duplicates and skipped. Per-row errors are returned.
+    """
+    data = await request.body()
+    try:
+        result = await ImportService.import_registrations(event_id, data, format, send_confirmations)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to import registrations: {str(e)}",
+        )
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found",
+        )
+    return result
@@ -0,0 +1,68 @@
+"""
+Background job API endpoints for tracking bulk sends
+"""
+
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from typing import List, Optional
+from app.schemas.job import JobResponse, JobRecipientResponse
+from app.services.job_service import JobService
+from app.core.auth import clerk_auth, AuthenticatedUser
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/", response_model=List[JobResponse])
+async def list_jobs(
+    event_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    auth: AuthenticatedUser = Depends(clerk_auth)
+):
+    """List background jobs, newest first (protected)"""
+    return await JobService.list_jobs(event_id, limit)
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    auth: AuthenticatedUser = Depends(clerk_auth)
+):
+    """Get a job's status and progress (protected)"""
+    job = await JobService.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    return job
+
+
+@router.get("/{job_id}/recipients", response_model=List[JobRecipientResponse])
+async def get_job_recipients(
+    job_id: str,
+    status_filter: Optional[str] = Query(None, alias="status", pattern="^(pending|sending|sent|failed)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    auth: AuthenticatedUser = Depends(clerk_auth)
+):
+    """Get per-recipient delivery results of a job (protected)"""
+    if not await JobService.get_job(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    return await JobService.get_job_recipients(job_id, status_filter, limit, offset)
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(
+    job_id: str,
+    auth: AuthenticatedUser = Depends(clerk_auth)
+):
+    """Cancel a pending or running job (protected)"""
+    job = await JobService.cancel_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    return job
@@ -7,7 +7,12 @@ from app.schemas.registration import (
     CheckInRequest,
     ManualCheckInRequest,
 )
-from app.services.registration_service import RegistrationService
+from app.services.registration_service import (
+    DuplicateRegistrationError,
+    EventNotFoundError,
+    RegistrationService,
+    RegistrationsClosedError,
+)
 from app.core.auth import clerk_auth, AuthenticatedUser
 
 router = APIRouter(prefix="/registrations", tags=["registrations"])
@@ -17,29 +22,22 @@ router = APIRouter(prefix="/registrations", tags=["registrations"])
 async def create_registration(registration: RegistrationCreate):
     """Create a new registration"""
     try:
-        event = await RegistrationService.get_event_registration_status(registration.event_id)
-        if not event:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Event not found",
-            )
-        if not event["registrations_open"]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Registrations are closed for this event",
-            )
-
-        # Check if user is already registered
-        is_registered = await RegistrationService.is_user_registered(
-            registration.event_id, registration.email
-        )
-        if is_registered:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User already registered for this event",
-            )
-
         return await RegistrationService.create_registration(registration)
+    except EventNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found",
+        )
+    except RegistrationsClosedError:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Registrations are closed for this event",
+        )
+    except DuplicateRegistrationError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User already registered for this event",
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -72,6 +70,26 @@ async def get_registration(
         )
 
 
+@router.delete("/{registration_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_registration(
+    registration_id: str,
+    auth: AuthenticatedUser = Depends(clerk_auth)
+):
+    """Delete a registration (protected)"""
+    try:
+        deleted = await RegistrationService.delete_registration(registration_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to delete registration: {str(e)}",
+        )
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Registration not found",
+        )
+
+
 @router.get("/profile/autofill", response_model=UserProfileResponse)
 async def get_user_profile_for_autofill(
     email: Optional[str] = Query(None), phone: Optional[str] = Query(None)
@@ -131,13 +149,17 @@ async def manual_check_in(
 async def check_in_user(event_id: str, check_in: CheckInRequest):
     """Check in a user for an event"""
     try:
-        success = await RegistrationService.check_in_user(event_id, check_in.email)
-        if not success:
+        checked_in = await RegistrationService.check_in_user(event_id, check_in.email)
+        if checked_in is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Registration not found",
             )
-        return {"message": "Successfully checked in", "email": check_in.email}
+        return {
+            "message": "Successfully checked in",
+            "email": check_in.email,
+            "already_checked_in": not checked_in,
+        }
     except HTTPException:
         raise
     except Exception as e:
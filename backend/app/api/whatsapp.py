@@ -3,10 +3,12 @@ WhatsApp messaging API endpoints
 """
 
 from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.responses import JSONResponse
 from typing import Dict, Any, Optional
 from app.models.message_template import WhatsAppBulkMessageRequest
 from app.services.whatsapp_service import WhatsAppService
 from app.services.message_template_service import message_template_service
+from app.services.job_service import JobService, job_worker
 from app.core.auth import clerk_auth, AuthenticatedUser
 
 router = APIRouter(prefix="/whatsapp", tags=["whatsapp"])
@@ -27,6 +29,7 @@ async def send_bulk_whatsapp_messages(
     - **send_to**: "all" or "subset"
     - **filter_field**: Field name to filter by (required if send_to="subset")
     - **filter_value**: Value to match for filtering (required if send_to="subset")
+    - **background**: Queue the send as a job and return 202 with its id (poll /api/jobs/{job_id})
 
     Returns summary of sent messages (success, failed, total)
     """
@@ -61,12 +64,38 @@ async def send_bulk_whatsapp_messages(
                 detail="Either message or template_id must be provided"
             )
 
+        filter_field = request.filter_field if request.send_to == "subset" else None
+        filter_value = request.filter_value if request.send_to == "subset" else None
+
+        if request.background:
+            # Snapshot the recipients and let the job worker do the sending
+            registrations = await whatsapp_service.get_target_registrations(
+                request.event_id, filter_field, filter_value
+            )
+            if not registrations:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=whatsapp_service.no_recipients_error(filter_field, filter_value)
+                )
+
+            job = await JobService.create_job(
+                event_id=request.event_id,
+                job_type="whatsapp_bulk",
+                payload={"message": message_text, "template_variables": request.template_variables},
+                registration_ids=[reg["id"] for reg in registrations]
+            )
+            job_worker.submit(job.id)
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content={"job_id": job.id, "status": job.status, "total": job.total}
+            )
+
         # Send bulk messages with optional filtering
         result = await whatsapp_service.send_bulk_messages(
             event_id=request.event_id,
             message=message_text,
-            filter_field=request.filter_field if request.send_to == "subset" else None,
-            filter_value=request.filter_value if request.send_to == "subset" else None,
+            filter_field=filter_field,
+            filter_value=filter_value,
             template_variables=request.template_variables
         )
 
@@ -3,17 +3,22 @@
 Authentication utilities using Clerk
 """
 import os
+import asyncio
+import hashlib
 import requests
 import time
 import logging
-from jwt import PyJWKClient
+from collections import OrderedDict
+from typing import Dict, Optional
+from jwt import PyJWK, PyJWKClient
 from fastapi import Security, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
+from app.core.metrics import gauge_lines, metrics_registry, provider_call
 
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Get Clerk secret key
@@ -38,6 +43,146 @@ jwks_client = PyJWKClient(
     headers=custom_headers
 )
 
+# Signing keys are refreshed in the background this often
+JWKS_REFRESH_INTERVAL = 600  # seconds
+# A token signed with an unknown kid (key rotation) forces a refresh at most this often
+JWKS_MIN_REFRESH_INTERVAL = 30  # seconds
+# Verified tokens remembered until they expire
+TOKEN_CACHE_MAX_ENTRIES = 1024
+
+
+class JWKSCache:
+    """
+    Clerk signing keys by kid
+
+    Keys are fetched at startup and refreshed in the background, so requests
+    look keys up in memory instead of blocking on the Clerk JWKS endpoint.
+    """
+
+    def __init__(self, client: PyJWKClient, refresh_interval: float, min_refresh_interval: float):
+        self._client = client
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, PyJWK] = {}
+        self._fetched_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"refreshes": 0, "refresh_errors": 0}
+
+    @property
+    def key_count(self) -> int:
+        return len(self._keys)
+
+    async def get_key(self, kid: Optional[str]) -> PyJWK:
+        """Signing key for `kid`, refreshing the key set if it is unknown"""
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        if not self._keys or time.monotonic() - self._fetched_at >= self.min_refresh_interval:
+            await self.refresh()
+            key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unable to find a signing key that matches: {kid}")
+        return key
+
+    async def refresh(self):
+        """Fetch the key set; concurrent callers share one request"""
+        task = self._refresh_task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._refresh_task = asyncio.create_task(self._fetch())
+        await asyncio.shield(task)
+
+    async def _fetch(self):
+        loop = asyncio.get_running_loop()
+        try:
+            with provider_call("clerk", "jwks_fetch"):
+                jwk_set = await loop.run_in_executor(None, self._client.get_jwk_set, True)
+        except Exception:
+            self.stats["refresh_errors"] += 1
+            raise
+        self._keys = {key.key_id: key for key in jwk_set.keys}
+        self._fetched_at = time.monotonic()
+        self.stats["refreshes"] += 1
+        logger.debug(f"Refreshed Clerk JWKS ({len(self._keys)} keys)")
+
+    async def start(self):
+        """Load the keys and keep them fresh in the background"""
+        if self._task is not None:
+            return
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Requests retry the fetch on demand until it succeeds
+            logger.warning(f"Initial Clerk JWKS fetch failed: {str(e)}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Clerk JWKS refresh failed, keeping {len(self._keys)} cached keys: {str(e)}")
+
+
+class VerifiedTokenCache:
+    """Claims of verified tokens, keyed by SHA-256 of the token, until the token's exp"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        claims = self._entries.get(key)
+        if claims is None or time.time() >= claims["exp"]:
+            if claims is not None:
+                del self._entries[key]
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return claims
+
+    def set(self, token: str, claims: dict):
+        if not isinstance(claims.get("exp"), (int, float)):
+            return
+        self._entries[self._key(token)] = claims
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+jwks_cache = JWKSCache(jwks_client, JWKS_REFRESH_INTERVAL, JWKS_MIN_REFRESH_INTERVAL)
+token_cache = VerifiedTokenCache(TOKEN_CACHE_MAX_ENTRIES)
+
+
+def _collect_auth_metrics():
+    return (
+        gauge_lines("magpie_auth_token_cache_hits_total", "Requests authenticated from the verified-token cache", token_cache.stats["hits"], "counter")
+        + gauge_lines("magpie_auth_token_cache_misses_total", "Requests that needed full token verification", token_cache.stats["misses"], "counter")
+        + gauge_lines("magpie_auth_jwks_keys", "Clerk signing keys held in memory", jwks_cache.key_count)
+    )
+
+
+metrics_registry.register_collector(_collect_auth_metrics)
+
 # HTTP Bearer security scheme
 security = HTTPBearer()
 
@@ -56,13 +201,15 @@ async def clerk_auth(credentials: HTTPAuthorizationCredentials = Security(securi
     """
     token = credentials.credentials
 
-    logger.debug(f"🔍 Received token: {token[:50]}...")
+    # Dashboard polling sends the same token many times; verify it once
+    decoded_token = token_cache.get(token)
+    if decoded_token is not None:
+        return AuthenticatedUser(credentials, decoded_token)
 
     try:
-        # Get the signing key from JWKS using PyJWKClient with headers
-        signing_key = jwks_client.get_signing_key_from_jwt(token)
-        logger.info(f"🔍 signing_key: {signing_key.key}...")
-        logger.debug("✅ Got signing key")
+        # Look up the signing key by kid in the in-memory key set
+        kid = jwt.get_unverified_header(token).get("kid")
+        signing_key = await jwks_cache.get_key(kid)
 
         # Decode and verify the token
         decoded_token = jwt.decode(
@@ -71,9 +218,9 @@ async def clerk_auth(credentials: HTTPAuthorizationCredentials = Security(securi
             algorithms=["RS256"],
             options={"verify_exp": True, "verify_aud": False}  # Clerk doesn't use aud
         )
+        token_cache.set(token, decoded_token)
 
-        logger.info(f"✅ Token validated successfully for user: {decoded_token.get('sub', 'unknown')}")
-        logger.debug(f"📋 Token claims: {decoded_token}")
+        logger.debug(f"✅ Token validated for user: {decoded_token.get('sub', 'unknown')}")
 
         # Return authenticated user with decoded token
         return AuthenticatedUser(credentials, decoded_token)
@@ -1,73 +1,389 @@
 """
 Cache utility for FastAPI endpoints with invalidation support.
 Uses in-memory caching with TTL and manual invalidation.
+Invalidations (tags, keys, prefixes, clear-all) are broadcast to the other worker processes.
 """
-from typing import Optional, Any, Dict
-from datetime import datetime, timedelta
+from typing import Optional, Any, Awaitable, Callable, Dict, Iterable, Set, Union
+from collections import OrderedDict
+from datetime import datetime
 from functools import wraps
 import asyncio
+import contextvars
 import hashlib
 import json
+import logging
+import sys
+import time
+from app.core.config import get_settings
+from app.core.cache_bus import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class CacheEntry:
+    """A cached value with its expiry and approximate size.
+
+    After `expires_at` the value may still be served for `stale_ttl` seconds
+    by `get_or_set` while it is refreshed in the background.
+    """
+
+    __slots__ = ("value", "expires_at", "stale_until", "created_at", "size", "tags")
+
+    def __init__(
+        self,
+        value: Any,
+        ttl_seconds: float,
+        size: int,
+        stale_ttl: float = 0,
+        tags: Iterable[str] = (),
+    ):
+        self.value = value
+        self.expires_at = time.monotonic() + ttl_seconds
+        self.stale_until = self.expires_at + stale_ttl
+        self.created_at = datetime.utcnow()
+        self.size = size
+        self.tags = frozenset(tags)
+
+    def is_expired(self, now: float) -> bool:
+        return now > self.expires_at
+
+    def is_dead(self, now: float) -> bool:
+        """Past expiry and past the stale window"""
+        return now > self.stale_until
+
+
+def estimate_size(key: str, value: Any) -> int:
+    """Approximate memory held by an entry, in bytes"""
+    try:
+        value_size = len(json.dumps(value, default=_jsonable))
+    except (TypeError, ValueError):
+        value_size = sys.getsizeof(value)
+    return len(key) + value_size
+
+
+def _jsonable(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
 
 
 class CacheStore:
-    """Simple in-memory cache store with TTL and invalidation support"""
+    """In-memory LRU cache store with TTL, size bounds and invalidation support.
+
+    Holds at most `max_entries` entries and roughly `max_bytes` of values
+    (sized by their JSON encoding); the least recently used entries are
+    evicted first. Expired entries are dropped when read and by a periodic
+    background sweep.
+
+    All bookkeeping is synchronous and never awaits, so on the event loop
+    every operation is atomic and reads take no lock. `get_or_set` adds
+    per-key single-flight loading and stale-while-revalidate.
+
+    Entries can carry dependency tags (e.g. "event:<id>", "branding"); an
+    inverted tag -> keys index lets `invalidate_tags` drop exactly the
+    dependent entries.
+    """
 
-    def __init__(self):
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        self._lock = asyncio.Lock()
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        sweep_interval: float = 60.0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+
+        # Ordered least to most recently used
+        self._cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._tag_index: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        # Loads in progress, so concurrent misses share one loader call
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: set = set()
+        self._background: set = set()  # keeps refresh tasks referenced until done
+        # Bumped by every invalidation; loads that started earlier aren't stored
+        self._epoch = 0
+
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'rejected': 0,  # values larger than max_bytes on their own
+            'stale_hits': 0,
+            'coalesced': 0,  # misses that waited for another caller's load
+            'refreshes': 0,
+        }
 
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache if not expired"""
-        async with self._lock:
-            if key not in self._cache:
-                return None
-
-            item = self._cache[key]
-            if datetime.utcnow() > item['expires_at']:
-                # Expired, remove it
-                del self._cache[key]
-                return None
-
-            return item['value']
-
-    async def set(self, key: str, value: Any, ttl_seconds: int = 3600):
-        """Set value in cache with TTL"""
-        async with self._lock:
-            self._cache[key] = {
-                'value': value,
-                'expires_at': datetime.utcnow() + timedelta(seconds=ttl_seconds),
-                'created_at': datetime.utcnow()
-            }
+        item = self._lookup(key)
+        if item is None or item.is_expired(time.monotonic()):
+            self._stats['misses'] += 1
+            return None
+        self._stats['hits'] += 1
+        return item.value
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: int = 3600,
+        stale_ttl: float = 0,
+        tags: Iterable[str] = (),
+    ):
+        """Set value in cache with TTL, evicting least recently used entries if full"""
+        self._store(key, value, ttl_seconds, stale_ttl, tags)
+
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl_seconds: int = 3600,
+        stale_ttl: float = 0,
+        tags: Union[Iterable[str], Callable[[Any], Iterable[str]]] = (),
+    ) -> Any:
+        """
+        Return the cached value, loading it with `loader` on a miss
+
+        Concurrent misses for the same key await a single `loader` call.
+        Within `stale_ttl` seconds after expiry the old value is returned
+        immediately and refreshed in the background. `None` is never cached.
+        `tags` may be a callable that derives the tags from the loaded value.
+        """
+        item = self._lookup(key)
+        now = time.monotonic()
+        if item is not None:
+            if not item.is_expired(now):
+                self._stats['hits'] += 1
+                return item.value
+            # Expired but inside the stale window
+            self._stats['stale_hits'] += 1
+            self._refresh_in_background(key, loader, ttl_seconds, stale_ttl, tags)
+            return item.value
+
+        self._stats['misses'] += 1
+        future = self._inflight.get(key)
+        if future is not None and future.get_loop() is asyncio.get_running_loop():
+            self._stats['coalesced'] += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The caller doing the load was cancelled, not us: load it ourselves
+                return await self.get_or_set(key, loader, ttl_seconds, stale_ttl, tags)
+
+        return await self._load(key, loader, ttl_seconds, stale_ttl, tags)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl_seconds: int, stale_ttl: float, tags) -> Any:
+        """Run `loader` once for `key`, sharing the result with concurrent callers"""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        epoch = self._epoch
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters get it; don't warn if there are none
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+        # Only store if nothing was invalidated while loading
+        if value is not None and epoch == self._epoch:
+            self._store(key, value, ttl_seconds, stale_ttl, tags(value) if callable(tags) else tags)
+        future.set_result(value)
+        return value
+
+    def _refresh_in_background(self, key: str, loader, ttl_seconds: int, stale_ttl: float, tags):
+        if key in self._refreshing or key in self._inflight:
+            return
+        self._refreshing.add(key)
+        self._stats['refreshes'] += 1
+
+        async def refresh():
+            try:
+                await self._load(key, loader, ttl_seconds, stale_ttl, tags)
+            except Exception:
+                logger.exception(f"Background refresh of cache key {key} failed")
+            finally:
+                self._refreshing.discard(key)
+
+        # A fresh context, so a refresh started inside db.transaction() doesn't
+        # keep using that transaction's pinned connection after it ends
+        task = asyncio.get_running_loop().create_task(refresh(), context=contextvars.Context())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
 
     async def delete(self, key: str):
         """Delete specific key from cache"""
-        async with self._lock:
-            if key in self._cache:
-                del self._cache[key]
+        self._epoch += 1
+        if key in self._cache:
+            self._remove(key)
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Delete every entry carrying any of `tags`; returns how many were removed"""
+        self._epoch += 1
+        keys = set()
+        for tag in tags:
+            keys.update(self._tag_index.get(tag, ()))
+        for key in keys:
+            self._remove(key)
+        return len(keys)
 
     async def clear_pattern(self, pattern: str):
         """Clear all keys matching a pattern (simple prefix match)"""
-        async with self._lock:
-            keys_to_delete = [k for k in self._cache.keys() if k.startswith(pattern)]
-            for key in keys_to_delete:
-                del self._cache[key]
+        self._epoch += 1
+        keys_to_delete = [k for k in self._cache.keys() if k.startswith(pattern)]
+        for key in keys_to_delete:
+            self._remove(key)
 
     async def clear_all(self):
         """Clear entire cache"""
-        async with self._lock:
-            self._cache.clear()
+        self._epoch += 1
+        self._cache.clear()
+        self._tag_index.clear()
+        self._bytes = 0
+
+    async def purge_expired(self) -> int:
+        """Drop every entry past its stale window; returns how many were removed"""
+        now = time.monotonic()
+        expired = [k for k, item in self._cache.items() if item.is_dead(now)]
+        for key in expired:
+            self._remove(key)
+        self._stats['expirations'] += len(expired)
+        return len(expired)
+
+    def _lookup(self, key: str) -> Optional[CacheEntry]:
+        """Entry for `key` unless it is past its stale window (marks it recently used)"""
+        item = self._cache.get(key)
+        if item is None:
+            return None
+        if item.is_dead(time.monotonic()):
+            self._remove(key)
+            self._stats['expirations'] += 1
+            return None
+        self._cache.move_to_end(key)
+        return item
+
+    def _store(self, key: str, value: Any, ttl_seconds: float, stale_ttl: float = 0, tags: Iterable[str] = ()):
+        size = estimate_size(key, value)
+        if key in self._cache:
+            self._remove(key)
+
+        if size > self.max_bytes:
+            self._stats['rejected'] += 1
+            return
+
+        item = CacheEntry(value, ttl_seconds, size, stale_ttl, tags)
+        self._cache[key] = item
+        self._bytes += size
+        for tag in item.tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+
+        while len(self._cache) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._cache))
+            self._remove(oldest)
+            self._stats['evictions'] += 1
+
+    def start_sweeper(self):
+        """Start the background task that purges expired entries"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop_sweeper(self):
+        """Stop the background sweeper"""
+        sweeper, self._sweeper = self._sweeper, None
+        if sweeper:
+            sweeper.cancel()
+            await asyncio.gather(sweeper, return_exceptions=True)
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.purge_expired()
+            except Exception:
+                logger.exception("Cache sweep failed")
+
+    def _remove(self, key: str):
+        item = self._cache.pop(key)
+        self._bytes -= item.size
+        for tag in item.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        """Copy of the hit/miss/eviction counters"""
+        return dict(self._stats)
+
+    @property
+    def entry_count(self) -> int:
+        return len(self._cache)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
 
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
+        lookups = self._stats['hits'] + self._stats['misses']
         return {
             'total_keys': len(self._cache),
-            'keys': list(self._cache.keys())
+            'keys': list(self._cache.keys()),
+            'inflight': len(self._inflight),
+            'tags': len(self._tag_index),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hit_rate': self._stats['hits'] / lookups if lookups else 0.0,
+            **self._stats,
         }
 
 
 # Global cache instance
-cache_store = CacheStore()
+cache_store = CacheStore(
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    max_bytes=settings.CACHE_MAX_BYTES,
+    sweep_interval=settings.CACHE_SWEEP_INTERVAL,
+)
+
+# Bus messages for invalidations that aren't tags: one key, a key prefix, everything
+KEY_MESSAGE = "cache-key:"
+PREFIX_MESSAGE = "cache-prefix:"
+CLEAR_MESSAGE = "cache-clear"
+
+
+async def _apply_remote_invalidation(tags: Iterable[str]):
+    """Apply invalidations published by other workers"""
+    plain = []
+    for tag in tags:
+        if tag == CLEAR_MESSAGE:
+            await cache_store.clear_all()
+        elif tag.startswith(KEY_MESSAGE):
+            await cache_store.delete(tag[len(KEY_MESSAGE):])
+        elif tag.startswith(PREFIX_MESSAGE):
+            await cache_store.clear_pattern(tag[len(PREFIX_MESSAGE):])
+        else:
+            plain.append(tag)
+    if plain:
+        await cache_store.invalidate_tags(*plain)
+
+
+invalidation_bus.subscribe(_apply_remote_invalidation)
 
 
 def generate_cache_key(prefix: str, *args, **kwargs) -> str:
@@ -103,21 +419,95 @@ async def set_cached(key: str, value: Any, ttl_seconds: int = 3600):
     await cache_store.set(key, value, ttl_seconds)
 
 
+async def get_or_set_cached(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ttl_seconds: int = 3600,
+    stale_ttl: float = 0,
+    tags: Union[Iterable[str], Callable[[Any], Iterable[str]]] = (),
+) -> Any:
+    """Get value from cache, loading it once (single-flight) on a miss"""
+    return await cache_store.get_or_set(key, loader, ttl_seconds, stale_ttl, tags)
+
+
 async def invalidate_cache(key: str):
-    """Invalidate specific cache key"""
+    """Invalidate specific cache key, in every worker"""
     await cache_store.delete(key)
+    await invalidation_bus.publish([KEY_MESSAGE + key])
+
+
+async def invalidate_tags(*tags: str) -> int:
+    """Invalidate every cache entry tagged with any of `tags`, in every worker"""
+    removed = await cache_store.invalidate_tags(*tags)
+    await invalidation_bus.publish(list(tags))
+    return removed
 
 
 async def invalidate_cache_pattern(pattern: str):
-    """Invalidate all cache keys matching pattern"""
+    """Invalidate all cache keys matching pattern, in every worker"""
     await cache_store.clear_pattern(pattern)
+    await invalidation_bus.publish([PREFIX_MESSAGE + pattern])
 
 
 async def clear_all_cache():
-    """Clear entire cache"""
+    """Clear entire cache, in every worker"""
     await cache_store.clear_all()
+    await invalidation_bus.publish([CLEAR_MESSAGE])
 
 
 def get_cache_stats() -> Dict[str, Any]:
     """Get cache statistics"""
     return cache_store.get_stats()
+
+
+def cached(
+    prefix: str,
+    ttl: int = 300,
+    key: Optional[Callable[..., Any]] = None,
+    stale_ttl: float = 0,
+    tags: Optional[Callable[..., Iterable[str]]] = None,
+):
+    """Read-through cache decorator for async functions.
+
+    The cache key is `prefix` plus `key(*args, **kwargs)` (or all arguments
+    when `key` is omitted). Misses are loaded once per key (single-flight)
+    and `None` results are not cached. Cached objects are shared between
+    callers, so treat them as read-only.
+
+    `tags(result, *args, **kwargs)` returns the dependency tags stored with
+    the result, for `invalidate_tags`.
+
+    The wrapped function gains `cache_key(...)` and `invalidate(...)`, which
+    take the same arguments:
+
+        @cached("event", ttl=300, key=lambda event_id: event_id,
+                tags=lambda event, event_id: [f"event:{event_id}"])
+        async def get_event(event_id): ...
+
+        await get_event.invalidate(event_id)
+        await invalidate_tags(f"event:{event_id}")
+    """
+    def decorator(func):
+        def cache_key(*args, **kwargs) -> str:
+            if key is None:
+                return generate_cache_key(prefix, *args, **kwargs)
+            return generate_cache_key(prefix, key(*args, **kwargs))
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await cache_store.get_or_set(
+                cache_key(*args, **kwargs),
+                lambda: func(*args, **kwargs),
+                ttl,
+                stale_ttl,
+                (lambda result: tags(result, *args, **kwargs)) if tags else (),
+            )
+
+        async def invalidate(*args, **kwargs):
+            await invalidate_cache(cache_key(*args, **kwargs))
+
+        wrapper.cache_key = cache_key
+        wrapper.invalidate = invalidate
+        return wrapper
+
+    return decorator
@@ -0,0 +1,178 @@
+"""
+Cache invalidation bus
+Propagates cache invalidations between uvicorn worker processes, so an update
+handled by one worker doesn't leave the others serving stale data until the TTL
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, List, Optional
+from app.core.config import get_settings
+from app.core.database import db
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Called with the tags another worker invalidated
+InvalidationListener = Callable[[List[str]], Awaitable[None]]
+
+
+class InvalidationBackend(ABC):
+    """Transport that carries invalidated tags from one worker to the others"""
+
+    @abstractmethod
+    async def publish(self, origin: str, tags: List[str]) -> None:
+        """Send tags invalidated by `origin` to the other workers"""
+
+    async def start(self, origin: str, deliver: InvalidationListener) -> None:
+        """Start delivering messages published by other origins"""
+
+    async def stop(self) -> None:
+        """Stop delivering messages"""
+
+
+class LocalInvalidationBackend(InvalidationBackend):
+    """Single worker: invalidations are already applied in-process"""
+
+    async def publish(self, origin: str, tags: List[str]) -> None:
+        return None
+
+
+class DatabaseInvalidationBackend(InvalidationBackend):
+    """
+    Invalidations appended to the shared `cache_invalidations` table
+
+    Every worker polls for rows newer than the last one it saw. The workers
+    already share the database (Turso, or the local SQLite file), so this
+    also works across machines. Rows older than `retention` are pruned.
+
+    Polling starts every `poll_interval` seconds and backs off (doubling) to
+    `max_poll_interval` while nothing is published, so an idle deployment
+    costs one query per worker every `max_poll_interval`. Any invalidation
+    seen or published resets it to `poll_interval`.
+    """
+
+    def __init__(self, poll_interval: float = 1.0, max_poll_interval: float = 15.0, retention: float = 3600.0):
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(poll_interval, max_poll_interval)
+        self.retention = retention
+        self.delay = poll_interval  # until the next poll
+        self._origin: Optional[str] = None
+        self._deliver: Optional[InvalidationListener] = None
+        self._last_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self, origin: str, tags: List[str]) -> None:
+        await db.execute(
+            "INSERT INTO cache_invalidations (origin, tags) VALUES (?, ?)",
+            [origin, json.dumps(tags)],
+        )
+        # Writes come in bursts: other workers are likely to publish soon too
+        self.delay = self.poll_interval
+
+    async def start(self, origin: str, deliver: InvalidationListener) -> None:
+        if self._task is not None:
+            return
+        self._origin = origin
+        self._deliver = deliver
+        # Anything older was published before this worker had a cache to invalidate
+        row = await db.fetch_one("SELECT MAX(id) AS last_id FROM cache_invalidations")
+        self._last_id = (row or {}).get("last_id") or 0
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def poll(self) -> int:
+        """Deliver invalidations published since the last poll; returns how many were applied"""
+        rows = await db.fetch_all(
+            "SELECT id, origin, tags FROM cache_invalidations WHERE id > ? ORDER BY id LIMIT 500",
+            [self._last_id],
+        )
+        applied = 0
+        for row in rows:
+            if row["origin"] != self._origin:
+                await self._deliver(json.loads(row["tags"]))
+                applied += 1
+            self._last_id = row["id"]
+        self.delay = self.poll_interval if rows else min(self.max_poll_interval, self.delay * 2)
+        return applied
+
+    async def prune(self) -> None:
+        """Delete expired rows, always keeping the newest so ids are never reused"""
+        await db.execute(
+            """
+            DELETE FROM cache_invalidations
+            WHERE created_at < datetime('now', ?)
+            AND id < (SELECT MAX(id) FROM cache_invalidations)
+            """,
+            [f"-{int(self.retention)} seconds"],
+        )
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_prune = loop.time() + self.retention
+        while True:
+            await asyncio.sleep(self.delay)
+            try:
+                await self.poll()
+                if loop.time() >= next_prune:
+                    next_prune = loop.time() + self.retention
+                    await self.prune()
+            except Exception:
+                logger.exception("Polling cache invalidations failed")
+
+
+class InvalidationBus:
+    """Publishes local invalidations and applies the ones from other workers"""
+
+    def __init__(self, backend: Optional[InvalidationBackend] = None):
+        self.origin = uuid.uuid4().hex
+        self.backend = backend or LocalInvalidationBackend()
+        self._listeners: List[InvalidationListener] = []
+
+    def subscribe(self, listener: InvalidationListener):
+        """Register a coroutine that applies tags invalidated elsewhere"""
+        self._listeners.append(listener)
+
+    async def publish(self, tags: List[str]):
+        """Tell the other workers about tags this worker just invalidated"""
+        try:
+            await self.backend.publish(self.origin, list(tags))
+        except Exception:
+            # The change itself succeeded; other workers fall back to the TTL
+            logger.exception(f"Publishing cache invalidation {tags} failed")
+
+    async def start(self):
+        await self.backend.start(self.origin, self._deliver)
+
+    async def stop(self):
+        await self.backend.stop()
+
+    async def _deliver(self, tags: List[str]):
+        for listener in self._listeners:
+            await listener(tags)
+
+
+def build_invalidation_backend(name: str) -> InvalidationBackend:
+    """Backend for CACHE_INVALIDATION_BACKEND"""
+    if name == "local":
+        return LocalInvalidationBackend()
+    if name == "database":
+        return DatabaseInvalidationBackend(
+            poll_interval=settings.CACHE_INVALIDATION_POLL_INTERVAL,
+            max_poll_interval=settings.CACHE_INVALIDATION_MAX_POLL_INTERVAL,
+            retention=settings.CACHE_INVALIDATION_RETENTION,
+        )
+    raise ValueError(f"Unknown cache invalidation backend: {name}")
+
+
+# Global invalidation bus
+invalidation_bus = InvalidationBus(build_invalidation_backend(settings.CACHE_INVALIDATION_BACKEND))
@@ -14,6 +14,32 @@ class Settings(BaseSettings):
     TURSO_DATABASE_URL: str
     TURSO_AUTH_TOKEN: str
 
+    # Database connection pool
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_IDLE_TIMEOUT: float = 300.0  # seconds before an idle connection is closed
+    DB_POOL_HEALTH_CHECK_INTERVAL: float = 30.0  # ping connections idle longer than this
+    DB_POOL_ACQUIRE_TIMEOUT: float = 30.0
+
+    # In-memory cache
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # approximate, measured as JSON size
+    CACHE_SWEEP_INTERVAL: float = 60.0  # seconds between expired-entry sweeps
+    CACHE_INVALIDATION_BACKEND: str = "database"  # "database" (shared table, any number of workers) or "local"
+    CACHE_INVALIDATION_POLL_INTERVAL: float = 1.0  # seconds between checks for other workers' invalidations...
+    CACHE_INVALIDATION_MAX_POLL_INTERVAL: float = 15.0  # ...backing off to this while none are published
+    CACHE_INVALIDATION_RETENTION: float = 3600.0  # seconds invalidation rows are kept
+
+    # Request logging (every 5xx and slow request is logged, plus this fraction of the rest)
+    REQUEST_LOG_SAMPLE_RATE: float = 0.01
+    REQUEST_LOG_SLOW_MS: float = 1000.0
+    METRICS_TOKEN: str = ""  # if set, /metrics requires "Authorization: Bearer <token>"
+
+    # Query profiler (slow-query log on /api/admin/slow-queries)
+    QUERY_PROFILER_ENABLED: bool = False  # keep the slowest statements and their query plans
+    QUERY_PROFILER_SLOW_MS: float = 100.0  # statements slower than this get an EXPLAIN QUERY PLAN
+    QUERY_PROFILER_MAX_ENTRIES: int = 50
+
     # Local development flag
     IS_LOCAL: bool = False
 
@@ -24,6 +50,29 @@ class Settings(BaseSettings):
     TWILIO_ACCOUNT_SID: str = ""
     TWILIO_AUTH_TOKEN: str = ""
     TWILIO_WHATSAPP_NUMBER: str = "whatsapp:+14155238886"
+    WHATSAPP_SEND_CONCURRENCY: int = 8
+    WHATSAPP_MESSAGES_PER_SECOND: float = 20.0  # keep at or below the sender's Twilio throughput
+    WHATSAPP_SEND_MAX_RETRIES: int = 2
+
+    # Background jobs (bulk email/WhatsApp sends)
+    JOB_WORKER_CONCURRENCY: int = 2  # jobs processed at the same time
+    JOB_BATCH_SIZE: int = 50  # recipients sent and checkpointed per batch
+    JOB_LEASE_SECONDS: int = 300  # a worker's claim on a job, renewed every batch
+    JOB_POLL_INTERVAL: float = 60.0  # seconds between checks for jobs whose owner died
+
+    # Outbox (registration confirmation emails)
+    OUTBOX_POLL_INTERVAL: float = 5.0  # seconds between checks for due retries
+    OUTBOX_BATCH_SIZE: int = 20
+    OUTBOX_CONCURRENCY: int = 4
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_RETRY_BASE_DELAY: float = 30.0  # doubled after every failed attempt
+    OUTBOX_RETRY_MAX_DELAY: float = 3600.0
+    OUTBOX_LEASE_SECONDS: int = 300  # a claimed message is offered again after this (sender died)
+
+    # Door check-in (scans answered from memory, written in batches)
+    CHECKIN_FLUSH_INTERVAL: float = 0.5  # seconds a check-in may wait to be written
+    CHECKIN_FLUSH_BATCH_SIZE: int = 200
+    CHECKIN_INDEX_MAX_EVENTS: int = 4  # events whose registrations are kept in memory
 
     class Config:
         env_file = ".env"
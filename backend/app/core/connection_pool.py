@@ -0,0 +1,240 @@
+"""
+Connection pool for libsql
+Keeps a bounded set of connections and hands them out per request or transaction
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the acquire timeout"""
+
+
+class PooledConnection:
+    """A raw libsql connection plus the bookkeeping the pool needs"""
+
+    __slots__ = ("raw", "created_at", "last_used")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """Bounded pool of libsql connections.
+
+    Connections are checked out per request (or per transaction) and returned
+    afterwards. Every libsql call goes through `run`. Calls run inline on the
+    event loop: the libsql driver holds the GIL for the whole statement, so
+    offloading them to worker threads bought no concurrency, only a thread hop
+    per statement. The loop is blocked for each statement's duration.
+
+    Waiters are plain futures created on the caller's running loop, so the pool
+    is not tied to a single event loop.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        idle_timeout: float = 300.0,
+        health_check_interval: float = 30.0,
+        acquire_timeout: float = 30.0,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: Deque[PooledConnection] = deque()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._size = 0  # open connections, idle + checked out (+ being created)
+        self._closed = False
+
+        self._stats = {
+            "acquired": 0,
+            "created": 0,
+            "closed": 0,
+            "health_check_failures": 0,
+            "waits": 0,
+            "timeouts": 0,
+        }
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run a blocking libsql call (the single place every driver call goes through)"""
+        return fn(*args)
+
+    async def open(self):
+        """Pre-create `min_size` connections"""
+        while self._size < self.min_size:
+            self._size += 1
+            try:
+                raw = await self.run(self.factory)
+            except Exception:
+                self._size -= 1
+                raise
+            self._stats["created"] += 1
+            self._idle.append(PooledConnection(raw))
+
+    async def acquire(self) -> PooledConnection:
+        """Check out a connection, waiting for one to be released if the pool is full"""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            self._evict_idle()
+
+            while self._idle:
+                conn = self._idle.pop()  # most recently used first
+                if await self._is_healthy(conn):
+                    conn.last_used = time.monotonic()
+                    self._stats["acquired"] += 1
+                    return conn
+                self._stats["health_check_failures"] += 1
+                self._discard(conn)
+
+            if self._size < self.max_size:
+                self._size += 1
+                try:
+                    raw = await self.run(self.factory)
+                except Exception:
+                    self._size -= 1
+                    self._wake_next()
+                    raise
+                self._stats["created"] += 1
+                self._stats["acquired"] += 1
+                return PooledConnection(raw)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._stats["timeouts"] += 1
+                raise PoolTimeoutError(
+                    f"Timed out after {self.acquire_timeout}s waiting for a database connection"
+                )
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self._stats["waits"] += 1
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def release(self, conn: PooledConnection, discard: bool = False):
+        """Return a connection to the pool (or drop it if it is broken)"""
+        if discard or self._closed:
+            self._discard(conn)
+        else:
+            conn.last_used = time.monotonic()
+            self._idle.append(conn)
+        self._wake_next()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Check out a connection for the duration of the block"""
+        conn = await self.acquire()
+        broken = False
+        try:
+            yield conn
+        except BaseException as e:
+            broken = not isinstance(e, Exception) or _looks_disconnected(e)
+            raise
+        finally:
+            self.release(conn, discard=broken)
+
+    async def close(self):
+        """Close every idle connection and refuse new checkouts"""
+        self._closed = True
+        while self._idle:
+            conn = self._idle.pop()
+            self._size -= 1
+            self._stats["closed"] += 1
+            try:
+                await self.run(conn.raw.close)
+            except Exception:
+                pass
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics"""
+        return {
+            "size": self._size,
+            "idle": len(self._idle),
+            "in_use": self._size - len(self._idle),
+            "waiting": len(self._waiters),
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            **self._stats,
+        }
+
+    async def _is_healthy(self, conn: PooledConnection) -> bool:
+        """Ping connections that have been idle longer than the health check interval"""
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            await self.run(_ping, conn.raw)
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self):
+        """Close connections idle longer than `idle_timeout`, keeping `min_size` open"""
+        if not self.idle_timeout:
+            return
+        now = time.monotonic()
+        # Oldest idle connections sit at the left end of the deque
+        while self._idle and self._size > self.min_size:
+            if now - self._idle[0].last_used < self.idle_timeout:
+                break
+            self._discard(self._idle.popleft())
+
+    def _discard(self, conn: PooledConnection):
+        self._size -= 1
+        self._stats["closed"] += 1
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+
+    def _wake_next(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.get_loop().call_soon_threadsafe(_set_if_pending, waiter)
+                return
+
+
+def _ping(raw):
+    raw.execute("SELECT 1").fetchall()
+
+
+def _set_if_pending(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _looks_disconnected(error: Exception) -> bool:
+    """Heuristic for errors that mean the connection itself is unusable"""
+    message = str(error).lower()
+    return any(
+        marker in message
+        for marker in ("connection", "stream", "hrana", "closed", "broken pipe")
+    )
@@ -1,105 +1,514 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
 import libsql
-from contextlib import contextmanager
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from app.core.config import get_settings
-from app.core.schema_manager import SchemaManager
+from app.core.connection_pool import ConnectionPool, PooledConnection
+from app.core.schema_manager import SchemaManager, is_full_scan
+
+logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+# Called after every statement as listener(query, params, elapsed_seconds, rows)
+QueryListener = Callable[[str, Optional[list], float, int], None]
+
+LOCAL_DB_PATH = "../local-dev/magpie_local.db"
+
+# Bound parameters per statement, under SQLite's limit of 32766
+MAX_PARAMS = 30000
+
+
+class QueryResult:
+    """Materialized result of `Database.execute`.
+
+    Rows are read before the connection goes back to the pool, so callers can
+    still use `fetchall()`/`fetchone()` like a cursor.
+    """
+
+    def __init__(self, description, rows: List[tuple], rowcount: int, lastrowid: Optional[int]):
+        self.description = description
+        self.rowcount = rowcount
+        self.lastrowid = lastrowid
+        self._rows = rows
+        self._position = 0
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        row = self._rows[self._position]
+        self._position += 1
+        return row
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+
+class _TransactionState:
+    """Connection pinned to the current context for the duration of a transaction.
+
+    Child tasks spawned inside the block inherit the context and therefore the
+    transaction, so statements on the pinned connection are serialized by `lock`.
+    """
+
+    __slots__ = ("conn", "depth", "lock")
+
+    def __init__(self, conn: PooledConnection):
+        self.conn = conn
+        self.depth = 0
+        self.lock = asyncio.Lock()
+
+
+_current_transaction: ContextVar[Optional[_TransactionState]] = ContextVar(
+    "current_transaction", default=None
+)
+
+
+_READ_PREFIXES = ("SELECT", "WITH", "PRAGMA", "EXPLAIN")
+
+_WHITESPACE = re.compile(r"\s+")
+# "(?, ?, ?)" in IN lists and multi-row VALUES vary with the number of items
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*")
+_MAX_CACHED_SHAPES = 2000
+_shapes: Dict[str, str] = {}
+
+
+def normalize_query(query: str) -> str:
+    """Statement shape: whitespace collapsed and placeholder lists folded"""
+    shape = _shapes.get(query)
+    if shape is None:
+        shape = _PLACEHOLDER_LIST.sub("(?...)", _WHITESPACE.sub(" ", query).strip())
+        if len(_shapes) < _MAX_CACHED_SHAPES:
+            _shapes[query] = shape
+    return shape
+
+
+def sql_timestamp() -> str:
+    """Now, in the format CURRENT_TIMESTAMP stores"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _is_write(query: str) -> bool:
+    return not query.lstrip().upper().startswith(_READ_PREFIXES)
+
+
+def _run_statement(raw, query: str, params: Optional[list]):
+    if params:
+        return raw.execute(query, params)
+    return raw.execute(query)
+
+
+def _columns(cursor) -> List[str]:
+    return [desc[0] for desc in cursor.description] if cursor.description else []
+
+
+def _execute_sync(raw, query: str, params: Optional[list], commit: bool) -> QueryResult:
+    try:
+        cursor = _run_statement(raw, query, params)
+        rows = cursor.fetchall() if cursor.description else []
+        if commit:
+            raw.commit()
+    except Exception:
+        if commit:
+            # Don't hand a connection with a half-open implicit transaction back to the pool
+            raw.rollback()
+        raise
+    return QueryResult(cursor.description, rows or [], cursor.rowcount, cursor.lastrowid)
+
+
+def _fetch_all_sync(raw, query: str, params: Optional[list]) -> List[dict]:
+    cursor = _run_statement(raw, query, params)
+    columns = _columns(cursor)
+    rows = cursor.fetchall()
+    return [dict(zip(columns, row)) for row in rows] if rows else []
+
+
+def _fetch_one_sync(raw, query: str, params: Optional[list]) -> Optional[dict]:
+    cursor = _run_statement(raw, query, params)
+    columns = _columns(cursor)
+    row = cursor.fetchone()
+    return dict(zip(columns, row)) if row else None
+
+
+def _executemany_sync(raw, query: str, params_seq: List[list], commit: bool) -> int:
+    try:
+        raw.executemany(query, params_seq)
+        if commit:
+            raw.commit()
+    except Exception:
+        if commit:
+            raw.rollback()
+        raise
+    return len(params_seq)
+
 
 class Database:
     """Database connection manager for Turso"""
 
     def __init__(self):
-        self.conn = None
+        self.pool: Optional[ConnectionPool] = None
         self.schema_manager = None
-        self._in_transaction = False
+        # libsql holds the GIL while a statement runs, so a writer blocked on
+        # SQLite's write lock would stall the whole process (including the
+        # transaction it is waiting for). Writers queue here on the event loop instead.
+        self._write_lock = asyncio.Lock()
+        self._query_listeners: List[QueryListener] = []
+
+    @staticmethod
+    def local_connection_factory(path: str) -> Callable[[], Any]:
+        """Factory for connections to a local SQLite file"""
+        def connect():
+            raw = libsql.connect(path)
+            # Pooled connections share one file, so wait for write locks instead of failing fast
+            raw.execute("PRAGMA busy_timeout = 5000")
+            return raw
+        return connect
 
-    async def connect(self):
-        """Connect to database"""
+    def _connection_factory(self) -> Callable[[], Any]:
+        """Build the factory used by the pool to open new connections"""
         if settings.IS_LOCAL:
             # Local development: Use local SQLite if the flag is enabled
-            self.conn = libsql.connect("../local-dev/magpie_local.db")
-            print("✅ Connected to local SQLite database")
-        else:
-            # Production: Direct connection to Turso (no embedded replica)
-            # Convert libsql:// to https:// for direct connection
-            db_url = settings.TURSO_DATABASE_URL.replace("libsql://", "https://")
-            self.conn = libsql.connect(
-                db_url,
-                auth_token=settings.TURSO_AUTH_TOKEN
-            )
-            print("✅ Connected to Turso database (direct connection)")
+            return self.local_connection_factory(LOCAL_DB_PATH)
+
+        # Production: Direct connection to Turso (no embedded replica)
+        # Convert libsql:// to https:// for direct connection
+        db_url = settings.TURSO_DATABASE_URL.replace("libsql://", "https://")
+        return lambda: libsql.connect(db_url, auth_token=settings.TURSO_AUTH_TOKEN)
+
+    async def connect(self, factory: Optional[Callable[[], Any]] = None):
+        """Open the connection pool and sync the schema"""
+        self.pool = ConnectionPool(
+            factory or self._connection_factory(),
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            idle_timeout=settings.DB_POOL_IDLE_TIMEOUT,
+            health_check_interval=settings.DB_POOL_HEALTH_CHECK_INTERVAL,
+            acquire_timeout=settings.DB_POOL_ACQUIRE_TIMEOUT,
+        )
+        await self.pool.open()
+        target = "local SQLite database" if settings.IS_LOCAL else "Turso database (direct connection)"
+        print(f"✅ Connected to {target} (pool {settings.DB_POOL_MIN_SIZE}-{settings.DB_POOL_MAX_SIZE})")
 
         # Initialize schema manager and sync schema
-        self.schema_manager = SchemaManager(self.conn)
-        self.schema_manager.sync_schema()
+        async with self.pool.connection() as conn:
+            self.schema_manager = SchemaManager(conn.raw)
+            await self.pool.run(self.schema_manager.sync_schema)
 
     async def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
+        """Close all pooled connections"""
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+    async def ensure_hot_field(self, field_name: str) -> str:
+        """Create the indexed generated column for a hot form field; returns its name.
+
+        Building the index reads every registration, so writers wait for it.
+        Must not be called inside a transaction.
+        """
+        async with self._write_lock:
+            async with self.pool.connection() as conn:
+                manager = SchemaManager(conn.raw)
+                column = await self.pool.run(manager.ensure_hot_field, field_name)
+                await self.pool.run(conn.raw.commit)
+        return column
+
+    @asynccontextmanager
+    async def _connection(self):
+        """Yield the transaction's pinned connection, or check one out for a single statement"""
+        state = _current_transaction.get()
+        if state is None:
+            async with self.pool.connection() as conn:
+                yield conn
+            return
+
+        async with state.lock:
+            yield state.conn
+
+    @asynccontextmanager
+    async def _write_slot(self, write: bool = True):
+        """Hold the write lock for autocommit writes (transactions already hold it)"""
+        if not write or _current_transaction.get() is not None:
+            yield
+            return
+        async with self._write_lock:
+            yield
+
+    def add_query_listener(self, listener: QueryListener):
+        """Register a callback run on the event loop after every statement"""
+        self._query_listeners.append(listener)
+
+    def remove_query_listener(self, listener: QueryListener):
+        if listener in self._query_listeners:
+            self._query_listeners.remove(listener)
+
+    def _notify(self, query: str, params: Optional[list], started: float, rows: int):
+        elapsed = time.perf_counter() - started
+        for listener in self._query_listeners:
+            try:
+                listener(query, params, elapsed, rows)
+            except Exception:
+                logger.exception("Query listener failed")
 
     async def execute(self, query: str, params: list = None):
         """Execute a query"""
-        if params:
-            result = self.conn.execute(query, params)
-        else:
-            result = self.conn.execute(query)
         # Only auto-commit if not in a transaction
-        if not self._in_transaction:
-            self.conn.commit()
-        return result
+        commit = _current_transaction.get() is None
+        started = time.perf_counter()
+        rows = 0
+        try:
+            async with self._write_slot(_is_write(query)):
+                async with self._connection() as conn:
+                    result = await self.pool.run(_execute_sync, conn.raw, query, params, commit)
+            rows = len(result._rows) if result.description else max(result.rowcount, 0)
+            return result
+        finally:
+            if self._query_listeners:
+                self._notify(query, params, started, rows)
 
-    @contextmanager
-    def transaction(self):
-        """Context manager for database transactions.
+    async def executemany(self, query: str, params_seq: List[list]) -> int:
+        """Execute one statement for every parameter list in a single worker call"""
+        if not params_seq:
+            return 0
+        commit = _current_transaction.get() is None
+        started = time.perf_counter()
+        try:
+            async with self._write_slot():
+                async with self._connection() as conn:
+                    return await self.pool.run(_executemany_sync, conn.raw, query, params_seq, commit)
+        finally:
+            if self._query_listeners:
+                self._notify(query, None, started, len(params_seq))
+
+    async def insert_values(self, insert: str, rows: List[list], suffix: str = "") -> List[tuple]:
+        """Insert rows with multi-row VALUES statements, one per MAX_PARAMS values.
+
+        Unlike `executemany`, which runs the statement once per row, each
+        statement is one round trip to a remote database.
+        Returns the rows of a RETURNING `suffix`.
+        """
+        if not rows:
+            return []
+        width = len(rows[0])
+        per_statement = max(1, MAX_PARAMS // width)
+        returned = []
+        for start in range(0, len(rows), per_statement):
+            chunk = rows[start:start + per_statement]
+            values = ", ".join([f"({', '.join('?' * width)})"] * len(chunk))
+            result = await self.execute(
+                f"{insert} VALUES {values} {suffix}",
+                [value for row in chunk for value in row],
+            )
+            returned.extend(result.fetchall())
+        return returned
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Async context manager for database transactions.
 
         Usage:
-            with db.transaction():
+            async with db.transaction():
                 await db.execute("DELETE ...")
                 await db.execute("INSERT ...")
 
-        All operations within the block are committed together,
-        or rolled back if an exception occurs.
+        The block runs on one pooled connection bound to the current context,
+        so concurrent requests never share or commit each other's work. All
+        operations are committed together, or rolled back if an exception
+        occurs. Nested blocks become savepoints that roll back on their own.
+        Transactions take the write lock, so writers queue while reads on
+        other connections keep running.
         """
-        self._in_transaction = True
+        state = _current_transaction.get()
+        if state is not None:
+            async with self._savepoint(state):
+                yield
+            return
+
+        async with self._write_lock:
+            conn = await self.pool.acquire()
+            state = _TransactionState(conn)
+            token = _current_transaction.set(state)
+            broken = False
+            try:
+                await self.pool.run(conn.raw.execute, "BEGIN IMMEDIATE")
+                yield
+                await self.pool.run(conn.raw.commit)
+            except BaseException:
+                try:
+                    await self.pool.run(conn.raw.rollback)
+                except BaseException:
+                    broken = True
+                raise
+            finally:
+                _current_transaction.reset(token)
+                self.pool.release(conn, discard=broken)
+
+    @asynccontextmanager
+    async def _savepoint(self, state: _TransactionState):
+        """Nested transaction block inside an open transaction"""
+        state.depth += 1
+        name = f"sp_{state.depth}"
         try:
-            yield
-            self.conn.commit()
-        except Exception:
-            self.conn.rollback()
-            raise
+            async with state.lock:
+                await self.pool.run(state.conn.raw.execute, f"SAVEPOINT {name}")
+            try:
+                yield
+            except BaseException:
+                async with state.lock:
+                    await self.pool.run(state.conn.raw.execute, f"ROLLBACK TO SAVEPOINT {name}")
+                    await self.pool.run(state.conn.raw.execute, f"RELEASE SAVEPOINT {name}")
+                raise
+            async with state.lock:
+                await self.pool.run(state.conn.raw.execute, f"RELEASE SAVEPOINT {name}")
         finally:
-            self._in_transaction = False
+            state.depth -= 1
+
+    @staticmethod
+    def in_transaction() -> bool:
+        """Whether the current context is inside `transaction()`"""
+        return _current_transaction.get() is not None
 
     async def fetch_all(self, query: str, params: list = None):
         """Fetch all rows"""
-        if params:
-            cursor = self.conn.execute(query, params)
-        else:
-            cursor = self.conn.execute(query)
-
-        # Get column names
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
-
-        # Fetch all rows and convert to dicts
-        rows = cursor.fetchall()
-        return [dict(zip(columns, row)) for row in rows] if rows else []
+        started = time.perf_counter()
+        rows = []
+        try:
+            async with self._connection() as conn:
+                rows = await self.pool.run(_fetch_all_sync, conn.raw, query, params)
+            return rows
+        finally:
+            if self._query_listeners:
+                self._notify(query, params, started, len(rows))
 
     async def fetch_one(self, query: str, params: list = None):
         """Fetch one row"""
-        if params:
-            cursor = self.conn.execute(query, params)
+        started = time.perf_counter()
+        row = None
+        try:
+            async with self._connection() as conn:
+                row = await self.pool.run(_fetch_one_sync, conn.raw, query, params)
+            return row
+        finally:
+            if self._query_listeners:
+                self._notify(query, params, started, 1 if row else 0)
+
+
+class QueryProfiler:
+    """
+    Keeps the slowest statements and their query plans
+
+    While enabled it listens to every statement, keeping the `max_entries`
+    slowest. Statements slower than `slow_ms` get an EXPLAIN QUERY PLAN
+    (once per statement shape, in the background) so full table scans stand
+    out. When disabled it is not registered at all, so it costs nothing.
+    """
+
+    # Statements that EXPLAIN can't describe
+    _UNEXPLAINABLE = ("EXPLAIN", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+    def __init__(self, database: "Database", slow_ms: float = 100.0, max_entries: int = 50):
+        self.database = database
+        self.slow_ms = slow_ms
+        self.max_entries = max_entries
+        self.enabled = False
+        # Min-heap of (duration, sequence, entry), so the fastest kept entry is dropped first
+        self._slowest: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._sequence = itertools.count()
+        self._plans: Dict[str, Tuple[List[str], bool]] = {}
+        self._explaining: set = set()
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            self.database.add_query_listener(self.record)
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            self.database.remove_query_listener(self.record)
+
+    def reset(self):
+        self._slowest.clear()
+        self._plans.clear()
+
+    def record(self, query: str, params: Optional[list], elapsed: float, rows: int):
+        duration_ms = elapsed * 1000
+        if len(self._slowest) >= self.max_entries and duration_ms <= self._slowest[0][0]:
+            return
+
+        shape = normalize_query(query)
+        entry = {
+            "statement": shape,
+            "params_count": len(params) if params else 0,
+            "rows": rows,
+            "duration_ms": round(duration_ms, 3),
+            "at": datetime.utcnow().isoformat(),
+            "plan": None,
+            "full_scan": None,
+        }
+        item = (duration_ms, next(self._sequence), entry)
+        if len(self._slowest) < self.max_entries:
+            heapq.heappush(self._slowest, item)
         else:
-            cursor = self.conn.execute(query)
+            heapq.heapreplace(self._slowest, item)
 
-        # Get column names
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        if duration_ms >= self.slow_ms:
+            self._attach_plan(entry, query, params)
 
-        # Fetch one row and convert to dict
-        row = cursor.fetchone()
-        return dict(zip(columns, row)) if row else None
+    def _attach_plan(self, entry: Dict[str, Any], query: str, params: Optional[list]):
+        shape = entry["statement"]
+        if shape in self._plans:
+            entry["plan"], entry["full_scan"] = self._plans[shape]
+            return
+        if shape.upper().startswith(self._UNEXPLAINABLE) or shape in self._explaining:
+            return
+        if params is None and "?" in query:
+            return  # executemany: no single parameter list to plan with
+        self._explaining.add(shape)
+        # A fresh context, so the plan isn't run on a transaction's pinned connection
+        asyncio.get_running_loop().create_task(
+            self._explain(entry, shape, query, params), context=contextvars.Context()
+        )
+
+    async def _explain(self, entry: Dict[str, Any], shape: str, query: str, params: Optional[list]):
+        try:
+            rows = await self.database.fetch_all(f"EXPLAIN QUERY PLAN {query}", params)
+            plan = [row["detail"] for row in rows]
+            full_scan = any(is_full_scan(detail) for detail in plan)
+            self._plans[shape] = (plan, full_scan)
+            entry["plan"], entry["full_scan"] = plan, full_scan
+            for _, _, other in self._slowest:
+                if other["statement"] == shape and other["plan"] is None:
+                    other["plan"], other["full_scan"] = plan, full_scan
+        except Exception as e:
+            logger.debug(f"EXPLAIN QUERY PLAN failed for {shape}: {str(e)}")
+        finally:
+            self._explaining.discard(shape)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Slowest statements first"""
+        return {
+            "enabled": self.enabled,
+            "slow_ms": self.slow_ms,
+            "max_entries": self.max_entries,
+            "queries": [entry for _, _, entry in sorted(self._slowest, key=lambda item: item[0], reverse=True)],
+        }
 
 
 # Global database instance
-db = Database()
\ No newline at end of file
+db = Database()
+
+# Global query profiler (QUERY_PROFILER_ENABLED)
+query_profiler = QueryProfiler(db, settings.QUERY_PROFILER_SLOW_MS, settings.QUERY_PROFILER_MAX_ENTRIES)
+if settings.QUERY_PROFILER_ENABLED:
+    query_profiler.enable()
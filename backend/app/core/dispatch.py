@@ -0,0 +1,106 @@
+"""
+Concurrent dispatch helpers for outbound messaging
+Bounded worker pool with token-bucket rate limiting and retry with backoff
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+# Exceptions raised by a send that are worth another attempt: network and
+# socket failures (requests' transport errors derive from OSError) and
+# timeouts. Anything else is a bug and fails the item at once.
+TRANSIENT_ERRORS: Tuple[Type[BaseException], ...] = (OSError, asyncio.TimeoutError)
+
+
+class TokenBucket:
+    """Token bucket rate limiter: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+async def dispatch(
+    items: Sequence[Any],
+    send: Callable[[Any], Awaitable[Dict[str, Any]]],
+    concurrency: int = 8,
+    rate_limiter: Optional[TokenBucket] = None,
+    max_retries: int = 2,
+    backoff_base: float = 0.5,
+    backoff_max: float = 10.0,
+    retry_on: Tuple[Type[BaseException], ...] = TRANSIENT_ERRORS,
+) -> List[Dict[str, Any]]:
+    """
+    Send every item with at most `concurrency` sends in flight
+
+    Args:
+        items: Work items, passed one at a time to `send`
+        send: Coroutine returning a result dict with a "success" key; a
+            truthy "retryable" key marks a failure worth retrying
+        concurrency: Number of worker tasks
+        rate_limiter: Optional token bucket consulted before every attempt
+        max_retries: Extra attempts for retryable failures
+        backoff_base: First retry delay in seconds, doubled per attempt (with jitter)
+        backoff_max: Upper bound for a single retry delay
+        retry_on: Exception types raised by `send` that count as retryable
+
+    Returns:
+        Results in the same order as `items`
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    next_index = 0
+
+    async def send_with_retry(item: Any) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            if rate_limiter:
+                await rate_limiter.acquire()
+            try:
+                result = await send(item)
+            except Exception as e:
+                result = {"success": False, "error": str(e), "retryable": isinstance(e, retry_on)}
+
+            if result.get("success") or not result.get("retryable") or attempt >= max_retries:
+                result["attempts"] = attempt + 1
+                return result
+
+            delay = min(backoff_max, backoff_base * (2 ** attempt))
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            attempt += 1
+
+    async def worker():
+        nonlocal next_index
+        while next_index < len(items):
+            index = next_index
+            next_index += 1
+            results[index] = await send_with_retry(items[index])
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for task in workers:
+            task.cancel()
+        raise
+
+    return results
@@ -0,0 +1,55 @@
+"""
+Form answers
+A registration's dynamic form answers, flattened into rows of the indexed
+registration_answers table so filters and distinct-value lookups are SQL.
+Hot fields of large events can also get their own indexed generated column
+on registrations (see SchemaManager.ensure_hot_field)
+"""
+
+import hashlib
+import re
+from typing import Any, Dict, List, Tuple
+
+
+def form_answers(form_data: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """
+    (field_name, value) pairs stored for a registration
+
+    Values are stored as `str(value)`, the same text the field-values
+    endpoints return, so a value picked from that list matches exactly.
+    Empty answers are skipped.
+    """
+    return [(field_name, str(value)) for field_name, value in form_data.items() if value]
+
+
+def answer_rows(registration_id: str, event_id: str, form_data: Dict[str, Any]) -> List[list]:
+    """Parameters for inserting a registration's answers"""
+    return [
+        [registration_id, event_id, field_name, value]
+        for field_name, value in form_answers(form_data)
+    ]
+
+
+INSERT_ANSWER_SQL = """
+    INSERT INTO registration_answers (registration_id, event_id, field_name, value)
+    VALUES (?, ?, ?, ?)
+"""
+
+
+def json_path(field_name: str) -> str:
+    """
+    JSON path for a top-level form_data key, quoted so dots and brackets are safe
+
+    SQLite's JSON paths have no escape for a double quote inside a quoted
+    key, so such names are rejected (EventFieldCreate doesn't allow them).
+    """
+    if '"' in field_name:
+        raise ValueError(f"Form field names can't contain a double quote: {field_name}")
+    return '$."' + field_name + '"'
+
+
+def hot_field_column(field_name: str) -> str:
+    """Name of the generated registrations column holding a hot field's answer"""
+    slug = re.sub(r"[^a-z0-9]+", "_", field_name.lower()).strip("_")[:32]
+    digest = hashlib.sha1(field_name.encode()).hexdigest()[:8]
+    return f"ff_{slug}_{digest}" if slug else f"ff_{digest}"
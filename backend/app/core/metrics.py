@@ -0,0 +1,388 @@
+"""
+Application metrics
+Per-route latency histograms and per-request database usage, recorded by the
+request timing middleware and reported on the admin metrics endpoint, plus
+counters and histograms exported in Prometheus text format on /metrics
+"""
+
+import bisect
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from app.core.config import get_settings
+from app.core.database import db, normalize_query
+
+logger = logging.getLogger(__name__)
+request_logger = logging.getLogger("app.requests")
+
+settings = get_settings()
+
+# Upper bounds of the latency buckets, in milliseconds
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+LATENCY_BUCKETS_SECONDS = tuple(bound / 1000 for bound in LATENCY_BUCKETS_MS)
+
+# Distinct statement shapes tracked before the rest are counted as "other"
+MAX_STATEMENT_SHAPES = 500
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram; percentiles are interpolated within a bucket"""
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        # One extra bucket for values above the last bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(estimate, self.max)
+            seen += bucket_count
+        return self.max
+
+
+class RequestStats:
+    """Database usage of the request being handled"""
+
+    __slots__ = ("db_queries", "db_time")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+
+
+class RouteMetrics:
+    """Aggregates for one route (method plus path template)"""
+
+    __slots__ = ("latency", "errors", "db_queries", "db_time")
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.db_queries = 0
+        self.db_time = 0.0
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class RequestMetrics:
+    """Registry of per-route request metrics"""
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.started_at = time.time()
+
+    def begin(self) -> RequestStats:
+        """Start collecting database usage for the current request"""
+        stats = RequestStats()
+        _current_request.set(stats)
+        return stats
+
+    def observe(self, method: str, route: str, status_code: int, duration_ms: float, stats: RequestStats):
+        metrics = self._routes.get((method, route))
+        if metrics is None:
+            metrics = self._routes[(method, route)] = RouteMetrics()
+        metrics.latency.observe(duration_ms)
+        if status_code >= 500:
+            metrics.errors += 1
+        metrics.db_queries += stats.db_queries
+        metrics.db_time += stats.db_time
+
+    def routes(self) -> List[Tuple[Tuple[str, str], RouteMetrics]]:
+        """((method, route), metrics) for every route seen so far"""
+        return list(self._routes.items())
+
+    def reset(self):
+        self._routes.clear()
+        self.started_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Aggregated latency percentiles and database usage per route"""
+        routes: List[Dict[str, Any]] = []
+        for (method, route), metrics in self._routes.items():
+            latency = metrics.latency
+            routes.append({
+                "method": method,
+                "route": route,
+                "count": latency.count,
+                "errors": metrics.errors,
+                "mean_ms": round(latency.total / latency.count, 2),
+                "p50_ms": round(latency.percentile(0.5), 2),
+                "p90_ms": round(latency.percentile(0.9), 2),
+                "p99_ms": round(latency.percentile(0.99), 2),
+                "max_ms": round(latency.max, 2),
+                "db_queries_per_request": round(metrics.db_queries / latency.count, 2),
+                "db_ms_per_request": round(metrics.db_time * 1000 / latency.count, 2),
+            })
+        routes.sort(key=lambda r: r["count"] * r["mean_ms"], reverse=True)
+        return {
+            "since": self.started_at,
+            "requests": sum(r["count"] for r in routes),
+            "routes": routes,
+        }
+
+
+INF_BUCKET = 'le="+Inf"'
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def histogram_lines(
+    name: str,
+    label_names: Tuple[str, ...],
+    label_values: Tuple[str, ...],
+    histogram: "LatencyHistogram",
+    scale: float = 1.0,
+) -> List[str]:
+    """Prometheus bucket/sum/count samples for one histogram, with bounds multiplied by `scale`"""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.bounds, histogram.counts):
+        cumulative += count
+        le = f'le="{_number(bound * scale)}"'
+        lines.append(f"{name}_bucket{_labels(label_names, label_values, le)} {cumulative}")
+    lines.append(f"{name}_bucket{_labels(label_names, label_values, INF_BUCKET)} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(label_names, label_values)} {_number(histogram.total * scale)}")
+    lines.append(f"{name}_count{_labels(label_names, label_values)} {histogram.count}")
+    return lines
+
+
+class Counter:
+    """Monotonic counter, optionally labelled; safe to update from worker threads"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        # Unlabelled counters are exported as 0 before their first increment
+        self._values: Dict[Tuple[str, ...], float] = {} if labels else {(): 0.0}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def series(self) -> int:
+        return len(self._values)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Latency histogram in seconds, optionally labelled; safe to update from worker threads"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self._histograms: Dict[Tuple[str, ...], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, *label_values: str):
+        with self._lock:
+            histogram = self._histograms.get(label_values)
+            if histogram is None:
+                histogram = self._histograms[label_values] = LatencyHistogram(LATENCY_BUCKETS_SECONDS)
+            histogram.observe(seconds)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = list(self._histograms.items())
+        for label_values, histogram in items:
+            lines.extend(histogram_lines(self.name, self.label_names, label_values, histogram))
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics rendered on /metrics; collectors add samples computed at scrape time"""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[str]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception:
+                logger.exception("Metrics collector failed")
+        return "\n".join(lines) + "\n"
+
+
+def gauge_lines(name: str, help_text: str, value: float, metric_type: str = "gauge") -> List[str]:
+    """A single unlabelled sample computed at scrape time"""
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {_number(value)}"]
+
+
+metrics_registry = MetricsRegistry()
+
+db_queries_total = metrics_registry.counter(
+    "magpie_db_queries_total", "Database statements executed, by statement shape", ("statement",)
+)
+db_query_seconds_total = metrics_registry.counter(
+    "magpie_db_query_seconds_total", "Time spent in database statements, by statement shape", ("statement",)
+)
+db_query_duration = metrics_registry.histogram(
+    "magpie_db_query_duration_seconds", "Database statement latency"
+)
+provider_requests_total = metrics_registry.counter(
+    "magpie_provider_requests_total", "Outbound provider API calls", ("provider", "operation", "outcome")
+)
+provider_request_duration = metrics_registry.histogram(
+    "magpie_provider_request_duration_seconds", "Outbound provider API call latency", ("provider", "operation")
+)
+registrations_total = metrics_registry.counter(
+    "magpie_registrations_total", "Registrations created"
+)
+
+
+@contextmanager
+def provider_call(provider: str, operation: str) -> Iterator[None]:
+    """Time an outbound provider call; an exception counts it as an error"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    finally:
+        provider_request_duration.observe(time.perf_counter() - started, provider, operation)
+        provider_requests_total.inc(provider, operation, outcome)
+
+
+def _record_query(query: str, params: Optional[list], elapsed: float, rows: int):
+    stats = _current_request.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_time += elapsed
+
+    shape = normalize_query(query)
+    if db_queries_total.value(shape) == 0 and db_queries_total.series() >= MAX_STATEMENT_SHAPES:
+        shape = "other"
+    db_queries_total.inc(shape)
+    db_query_seconds_total.inc(shape, amount=elapsed)
+    db_query_duration.observe(elapsed)
+
+
+def _collect_http() -> List[str]:
+    name = "magpie_http_request_duration_seconds"
+    lines = [f"# HELP {name} HTTP request latency by route", f"# TYPE {name} histogram"]
+    errors = [
+        "# HELP magpie_http_request_errors_total HTTP requests answered with a 5xx status",
+        "# TYPE magpie_http_request_errors_total counter",
+    ]
+    for (method, route), metrics in request_metrics.routes():
+        lines.extend(histogram_lines(name, ("method", "route"), (method, route), metrics.latency, scale=0.001))
+        errors.append(f"magpie_http_request_errors_total{_labels(('method', 'route'), (method, route))} {metrics.errors}")
+    return lines + errors
+
+
+def _collect_cache() -> List[str]:
+    from app.core.cache import cache_store
+
+    stats = cache_store.counters
+    lines = []
+    for key in ("hits", "misses", "evictions", "expirations", "stale_hits", "coalesced", "refreshes"):
+        lines.extend(gauge_lines(f"magpie_cache_{key}_total", f"Cache {key.replace('_', ' ')}", stats[key], "counter"))
+    lookups = stats["hits"] + stats["misses"]
+    lines.extend(gauge_lines("magpie_cache_hit_ratio", "Cache hits over lookups since startup", stats["hits"] / lookups if lookups else 0))
+    lines.extend(gauge_lines("magpie_cache_entries", "Entries in the in-memory cache", cache_store.entry_count))
+    lines.extend(gauge_lines("magpie_cache_bytes", "Approximate size of the in-memory cache", cache_store.size_bytes))
+    return lines
+
+
+def render_metrics() -> str:
+    """Prometheus text exposition of this worker's metrics"""
+    return metrics_registry.render()
+
+
+def should_log_request(status_code: int, duration_ms: float) -> bool:
+    """Log every slow or failed request, and a sample of the rest"""
+    if status_code >= 500 or duration_ms >= settings.REQUEST_LOG_SLOW_MS:
+        return True
+    rate = settings.REQUEST_LOG_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def log_request(method: str, route: str, path: str, status_code: int, duration_ms: float, stats: RequestStats):
+    request_logger.info(json.dumps({
+        "event": "request",
+        "method": method,
+        "route": route,
+        "path": path,
+        "status": status_code,
+        "duration_ms": round(duration_ms, 2),
+        "db_queries": stats.db_queries,
+        "db_ms": round(stats.db_time * 1000, 2),
+    }))
+
+
+# Global request metrics
+request_metrics = RequestMetrics()
+db.add_query_listener(_record_query)
+metrics_registry.register_collector(_collect_http)
+metrics_registry.register_collector(_collect_cache)
@@ -4,8 +4,48 @@ Automatically syncs database schema with defined models
 """
 
 import json
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from dataclasses import dataclass
+from app.core.form_answers import INSERT_ANSWER_SQL, answer_rows, hot_field_column, json_path
+
+
+# The services' hot queries. After every sync their plans are checked, so a
+# query that would read a whole table shows up in the startup log.
+QUERY_SHAPES = [
+    "SELECT id FROM registrations WHERE event_id = ? AND email = ?",
+    "SELECT * FROM registrations WHERE id = ?",
+    "SELECT id, email, phone, form_data, is_checked_in, checked_in_at, created_at FROM registrations "
+    "WHERE event_id = ? ORDER BY created_at DESC, id DESC LIMIT ?",
+    "SELECT COUNT(*) AS count FROM registrations WHERE event_id = ?",
+    "SELECT * FROM user_profiles WHERE email = ? AND phone = ?",
+    "SELECT * FROM events WHERE is_active = 1 ORDER BY created_at DESC, rowid DESC LIMIT ?",
+    "SELECT * FROM event_fields WHERE event_id = ? ORDER BY field_order",
+    "SELECT DISTINCT value FROM registration_answers WHERE event_id = ? AND field_name = ? ORDER BY value",
+    "SELECT id, email, phone, form_data FROM registrations WHERE event_id = ? AND id IN "
+    "(SELECT registration_id FROM registration_answers WHERE event_id = ? AND field_name = ? AND value = ?)",
+    "SELECT field_name, value, count, checked_in_count FROM registration_facets "
+    "WHERE event_id = ? ORDER BY field_name, count DESC, value",
+    "SELECT * FROM qr_codes WHERE event_id = ? ORDER BY created_at DESC",
+    "SELECT id FROM outbox WHERE (status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP) "
+    "OR (status = 'sending' AND lease_until < CURRENT_TIMESTAMP) ORDER BY created_at, rowid LIMIT ?",
+    "SELECT id FROM jobs WHERE status IN ('pending', 'running') "
+    "AND (lease_until IS NULL OR lease_until < CURRENT_TIMESTAMP) ORDER BY created_at, rowid",
+    "SELECT * FROM jobs WHERE event_id = ? ORDER BY created_at DESC, rowid DESC LIMIT ?",
+    "SELECT jr.id FROM job_recipients jr JOIN registrations r ON r.id = jr.registration_id "
+    "WHERE jr.job_id = ? AND (jr.status = 'pending' OR (jr.status = 'sending' AND jr.lease_until < CURRENT_TIMESTAMP)) "
+    "ORDER BY jr.position LIMIT ?",
+    "SELECT id, origin, tags FROM cache_invalidations WHERE id > ? ORDER BY id LIMIT 500",
+]
+
+
+def is_full_scan(detail: str) -> bool:
+    """
+    Whether an EXPLAIN QUERY PLAN step reads a whole table or index
+
+    `SCAN t USING [COVERING] INDEX i` walks every entry of the index (e.g. an
+    unfiltered ORDER BY), so it counts too; only SEARCH steps are bounded.
+    """
+    return detail.startswith("SCAN") and "CONSTANT ROW" not in detail
 
 
 @dataclass
@@ -23,8 +63,22 @@ class Column:
 class Index:
     name: str
     table: str
-    columns: List[str]
+    columns: List[str]  # several for a composite index, in key order
     unique: bool = False
+    where: Optional[str] = None  # makes it a partial index over the matching rows only
+
+
+@dataclass
+class SchemaObject:
+    """A view or trigger; recreated whenever its definition changes"""
+    type: str  # 'VIEW' or 'TRIGGER'
+    name: str
+    body: str  # everything after "CREATE <type> <name>"
+
+    @property
+    def sql(self) -> str:
+        # The form SQLite keeps in sqlite_master (it drops IF NOT EXISTS)
+        return f"CREATE {self.type} {self.name} {self.body.strip()}"
 
 
 @dataclass
@@ -44,6 +98,12 @@ class SchemaManager:
     def __init__(self, conn):
         self.conn = conn
         self.schema_definitions = self._define_schema()
+        self.schema_objects = self._define_objects()
+        # Run once, right after the table is created, to fill it from existing data
+        self.backfills: Dict[str, Callable[[], None]] = {
+            'registration_answers': self._backfill_registration_answers,
+            'registration_facets': self._backfill_registration_facets,
+        }
 
     def _define_schema(self) -> Dict[str, Table]:
         """Define the expected database schema"""
@@ -80,6 +140,12 @@ class SchemaManager:
                     Column('is_required', 'INTEGER', nullable=True, default='0'),
                     Column('field_options', 'TEXT', nullable=True),
                     Column('field_order', 'INTEGER', nullable=True, default='0'),
+                    # Hot field: gets an indexed generated column on registrations
+                    Column('is_indexed', 'INTEGER', nullable=True, default='0'),
+                ],
+                indexes=[
+                    # An event's fields in form order
+                    Index('idx_event_fields_event', 'event_fields', ['event_id', 'field_order']),
                 ]
             ),
 
@@ -97,7 +163,42 @@ class SchemaManager:
                 ],
                 indexes=[
                     Index('idx_registrations_event', 'registrations', ['event_id']),
-                    Index('idx_registrations_email', 'registrations', ['email'])
+                    Index('idx_registrations_email', 'registrations', ['email']),
+                    Index('idx_registrations_event_created', 'registrations', ['event_id', 'created_at', 'id']),
+                    # One registration per email per event; also serves check-in by email
+                    Index('idx_registrations_event_email_unique', 'registrations', ['event_id', 'email'], unique=True),
+                ]
+            ),
+
+            'registration_answers': Table(
+                name='registration_answers',
+                columns=[
+                    Column('registration_id', 'TEXT', nullable=False, foreign_key='registrations(id) ON DELETE CASCADE'),
+                    Column('event_id', 'TEXT', nullable=False),
+                    Column('field_name', 'TEXT', nullable=False),
+                    Column('value', 'TEXT', nullable=False),  # str() of the form answer
+                ],
+                indexes=[
+                    # Covers subset filters and distinct values per field
+                    Index('idx_registration_answers_lookup', 'registration_answers',
+                          ['event_id', 'field_name', 'value', 'registration_id']),
+                    Index('idx_registration_answers_registration', 'registration_answers', ['registration_id']),
+                ]
+            ),
+
+            'registration_facets': Table(
+                name='registration_facets',
+                columns=[
+                    Column('event_id', 'TEXT', nullable=False),
+                    Column('field_name', 'TEXT', nullable=False),
+                    Column('value', 'TEXT', nullable=False),
+                    Column('count', 'INTEGER', nullable=False, default='0'),
+                    Column('checked_in_count', 'INTEGER', nullable=False, default='0'),
+                ],
+                indexes=[
+                    # Upsert target, and serves an event's facets in one range scan
+                    Index('idx_registration_facets_key', 'registration_facets',
+                          ['event_id', 'field_name', 'value'], unique=True),
                 ]
             ),
 
@@ -123,6 +224,9 @@ class SchemaManager:
                     Column('message', 'TEXT', nullable=False),
                     Column('qr_type', 'TEXT', nullable=True, default="'message'"),
                     Column('created_at', 'TEXT', nullable=True, default='CURRENT_TIMESTAMP'),
+                ],
+                indexes=[
+                    Index('idx_qr_codes_event', 'qr_codes', ['event_id', 'created_at']),
                 ]
             ),
 
@@ -153,6 +257,82 @@ class SchemaManager:
                 ]
             ),
 
+            'jobs': Table(
+                name='jobs',
+                columns=[
+                    Column('id', 'TEXT', nullable=False, primary_key=True),
+                    Column('event_id', 'TEXT', nullable=False),
+                    Column('job_type', 'TEXT', nullable=False),  # email_bulk or whatsapp_bulk
+                    Column('status', 'TEXT', nullable=False, default="'pending'"),
+                    Column('payload', 'TEXT', nullable=False),  # JSON send arguments
+                    Column('total', 'INTEGER', nullable=True, default='0'),
+                    Column('sent', 'INTEGER', nullable=True, default='0'),
+                    Column('failed', 'INTEGER', nullable=True, default='0'),
+                    Column('error', 'TEXT', nullable=True),
+                    Column('created_at', 'TEXT', nullable=True, default='CURRENT_TIMESTAMP'),
+                    Column('updated_at', 'TEXT', nullable=True, default='CURRENT_TIMESTAMP'),
+                    Column('started_at', 'TEXT', nullable=True),
+                    Column('finished_at', 'TEXT', nullable=True),
+                    Column('owner', 'TEXT', nullable=True),  # worker holding the job while running
+                    Column('lease_until', 'TEXT', nullable=True),  # owner's claim expires after this
+                ],
+                indexes=[
+                    Index('idx_jobs_status', 'jobs', ['status']),
+                    Index('idx_jobs_event', 'jobs', ['event_id', 'created_at']),
+                    # Jobs to resume at startup; finished jobs stay out of the index
+                    Index('idx_jobs_unfinished', 'jobs', ['status', 'created_at'],
+                          where="status IN ('pending', 'running')"),
+                ]
+            ),
+
+            'job_recipients': Table(
+                name='job_recipients',
+                columns=[
+                    Column('id', 'TEXT', nullable=False, primary_key=True),
+                    Column('job_id', 'TEXT', nullable=False, foreign_key='jobs(id) ON DELETE CASCADE'),
+                    Column('registration_id', 'TEXT', nullable=False),
+                    Column('position', 'INTEGER', nullable=False),
+                    Column('status', 'TEXT', nullable=False, default="'pending'"),  # pending, sending, sent, failed
+                    Column('message_id', 'TEXT', nullable=True),
+                    Column('error', 'TEXT', nullable=True),
+                    Column('updated_at', 'TEXT', nullable=True, default='CURRENT_TIMESTAMP'),
+                    Column('owner', 'TEXT', nullable=True),  # worker sending it (status sending)
+                    Column('lease_until', 'TEXT', nullable=True),
+                ],
+                indexes=[
+                    Index('idx_job_recipients_job_status', 'job_recipients', ['job_id', 'status', 'position'])
+                ]
+            ),
+
+            'outbox': Table(
+                name='outbox',
+                columns=[
+                    Column('id', 'TEXT', nullable=False, primary_key=True),
+                    Column('kind', 'TEXT', nullable=False),  # e.g. registration_confirmation
+                    Column('payload', 'TEXT', nullable=False),  # JSON handler arguments
+                    Column('status', 'TEXT', nullable=False, default="'pending'"),  # pending, sending, sent, failed
+                    Column('attempts', 'INTEGER', nullable=True, default='0'),
+                    Column('last_error', 'TEXT', nullable=True),
+                    Column('next_attempt_at', 'TEXT', nullable=True, default='CURRENT_TIMESTAMP'),
+                    Column('created_at', 'TEXT', nullable=True, default='CURRENT_TIMESTAMP'),
+                    Column('sent_at', 'TEXT', nullable=True),
+                    Column('lease_until', 'TEXT', nullable=True),  # a dispatcher's claim while sending
+                ],
+                indexes=[
+                    Index('idx_outbox_due', 'outbox', ['status', 'next_attempt_at'])
+                ]
+            ),
+
+            'cache_invalidations': Table(
+                name='cache_invalidations',
+                columns=[
+                    Column('id', 'INTEGER', nullable=False, primary_key=True),  # rowid, increases per message
+                    Column('origin', 'TEXT', nullable=False),  # publishing worker
+                    Column('tags', 'TEXT', nullable=False),  # JSON list of cache tags
+                    Column('created_at', 'TEXT', nullable=True, default='CURRENT_TIMESTAMP'),
+                ],
+            ),
+
             'test_migration': Table(
                 name='test_migration',
                 columns=[
@@ -168,6 +348,48 @@ class SchemaManager:
             ),
         }
 
+    def _define_objects(self) -> List[SchemaObject]:
+        """Views and triggers, created after the tables they use"""
+        return [
+            # A public registration in one statement: inserting a row here
+            # checks the event, then writes the registration, its answers,
+            # facet counts, auto-fill profile and confirmation email together.
+            # `answers` is the JSON object of form_answers() texts.
+            SchemaObject('VIEW', 'registration_submissions', """
+                AS SELECT
+                    NULL AS id, NULL AS event_id, NULL AS email, NULL AS phone,
+                    NULL AS form_data, NULL AS created_at, NULL AS answers, NULL AS profile_id,
+                    NULL AS message_id, NULL AS message_kind, NULL AS message_payload
+                WHERE 0
+            """),
+            SchemaObject('TRIGGER', 'registration_submissions_insert', """
+                INSTEAD OF INSERT ON registration_submissions
+                BEGIN
+                    SELECT RAISE(ABORT, 'event not found')
+                    WHERE NOT EXISTS (SELECT 1 FROM events WHERE id = NEW.event_id);
+                    SELECT RAISE(ABORT, 'registrations closed')
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM events WHERE id = NEW.event_id AND COALESCE(registrations_open, 1) = 1
+                    );
+                    INSERT INTO registrations (id, event_id, email, phone, form_data, created_at)
+                    VALUES (NEW.id, NEW.event_id, NEW.email, NEW.phone, NEW.form_data, NEW.created_at);
+                    INSERT INTO registration_answers (registration_id, event_id, field_name, value)
+                    SELECT NEW.id, NEW.event_id, key, value FROM json_each(NEW.answers);
+                    INSERT INTO registration_facets (event_id, field_name, value, count)
+                    SELECT NEW.event_id, key, value, 1 FROM json_each(NEW.answers) WHERE true
+                    ON CONFLICT (event_id, field_name, value) DO UPDATE SET count = count + 1;
+                    INSERT INTO user_profiles (id, email, phone, profile_data)
+                    VALUES (NEW.profile_id, NEW.email, NEW.phone, NEW.form_data)
+                    ON CONFLICT (email) DO UPDATE SET
+                        phone = excluded.phone,
+                        profile_data = excluded.profile_data,
+                        last_updated = CURRENT_TIMESTAMP;
+                    INSERT INTO outbox (id, kind, payload)
+                    VALUES (NEW.message_id, NEW.message_kind, NEW.message_payload);
+                END
+            """),
+        ]
+
     def get_existing_tables(self) -> Dict[str, List[Dict]]:
         """Get all existing tables and their columns from the database"""
         cursor = self.conn.execute(
@@ -274,12 +496,78 @@ class SchemaManager:
         unique = "UNIQUE " if index.unique else ""
         columns = ", ".join(index.columns)
         sql = f"CREATE {unique}INDEX IF NOT EXISTS {index.name} ON {index.table} ({columns})"
+        if index.where:
+            sql += f" WHERE {index.where}"
 
         try:
             self.conn.execute(sql)
             print(f"    ✅ Created index: {index.name}")
         except Exception as e:
-            print(f"    ℹ️  Index {index.name} might already exist")
+            if not index.unique:
+                print(f"    ⚠️  Could not create index {index.name}: {e}")
+                return
+            # Writes rely on the constraint (e.g. to reject duplicate
+            # registrations), so don't start without it
+            where = f" WHERE {index.where}" if index.where else ""
+            duplicates = self.conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM {index.table}{where} "
+                f"GROUP BY {columns} HAVING COUNT(*) > 1)"
+            ).fetchone()[0]
+            raise RuntimeError(
+                f"Could not create unique index {index.name}: {e}. "
+                f"{index.table} has {duplicates} duplicated ({columns}) keys; remove the duplicates and restart"
+            ) from e
+
+    def get_generated_columns(self, table_name: str) -> List[str]:
+        """Names of a table's generated columns (PRAGMA table_info leaves them out)"""
+        cursor = self.conn.execute(f"PRAGMA table_xinfo({table_name})")
+        # hidden is 2 for virtual and 3 for stored generated columns
+        return [row[1] for row in cursor.fetchall() if row[6] in (2, 3)]
+
+    def ensure_hot_field(self, field_name: str) -> str:
+        """
+        Give a form field a virtual generated column on registrations, indexed
+        with event_id, so filters on it don't scan every form_data blob.
+        Returns the column name. Does not commit.
+        """
+        column = hot_field_column(field_name)
+        if column not in self.get_generated_columns('registrations'):
+            print(f"  🔥 Adding hot field column: registrations.{column} ({field_name})")
+            path = "'" + json_path(field_name).replace("'", "''") + "'"
+            # No declared type, so comparisons behave exactly like json_extract()
+            self.conn.execute(
+                f"ALTER TABLE registrations ADD COLUMN {column} "
+                f"GENERATED ALWAYS AS (json_extract(form_data, {path})) VIRTUAL"
+            )
+        index = Index(f"idx_registrations_{column}", 'registrations', ['event_id', column])
+        if index.name not in {idx['name'] for idx in self.get_existing_indexes()}:
+            self.create_index(index)
+        return column
+
+    def sync_hot_fields(self):
+        """Make sure every field declared hot has its column and index"""
+        cursor = self.conn.execute("SELECT DISTINCT field_name FROM event_fields WHERE is_indexed = 1")
+        for row in cursor.fetchall():
+            try:
+                self.ensure_hot_field(row[0])
+            except ValueError as e:
+                print(f"  ⚠️  Skipping hot field: {e}")
+
+    def sync_objects(self):
+        """Create missing views and triggers, and recreate changed ones"""
+        for obj in self.schema_objects:
+            row = self.conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = ? AND name = ?",
+                [obj.type.lower(), obj.name],
+            ).fetchone()
+            if row and row[0] == obj.sql:
+                continue
+            if row:
+                print(f"  🔁 Updating {obj.type.lower()}: {obj.name}")
+                self.conn.execute(f"DROP {obj.type} IF EXISTS {obj.name}")
+            else:
+                print(f"  📋 Creating {obj.type.lower()}: {obj.name}")
+            self.conn.execute(f"CREATE {obj.type} IF NOT EXISTS {obj.name} {obj.body.strip()}")
 
     def drop_table(self, table_name: str):
         """Drop a table that's no longer in the schema"""
@@ -307,6 +595,8 @@ class SchemaManager:
             if table_name not in existing_tables:
                 # Create new table
                 self.create_table(table)
+                if table_name in self.backfills:
+                    self.backfills[table_name]()
             else:
                 # Check for missing columns
                 existing_columns = {col['name']: col for col in existing_tables[table_name]}
@@ -332,14 +622,78 @@ class SchemaManager:
         #     if table_name not in processed_tables:
         #         self.drop_table(table_name)
 
+        self.sync_objects()
+
+        # Generated columns for hot form fields
+        self.sync_hot_fields()
+
         # Insert default data if needed
         self._insert_default_data()
 
         # Commit all changes
         self.conn.commit()
 
+        self.report_query_plans()
+
         print("✅ Database schema sync completed!\n")
 
+    def report_query_plans(self, queries: Optional[List[str]] = None) -> List[str]:
+        """Print the queries whose plan still scans a whole table, and return them"""
+        queries = QUERY_SHAPES if queries is None else queries
+        scanning = []
+        for query in queries:
+            try:
+                # Unbound parameters plan as NULL, which doesn't change index choice
+                rows = self.conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+            except Exception as e:
+                print(f"  ⚠️  Could not plan query {query!r}: {e}")
+                continue
+            scans = [row[3] for row in rows if is_full_scan(row[3])]
+            if scans:
+                scanning.append(query)
+                print(f"  🐢 Full scan ({'; '.join(scans)}): {query}")
+
+        if scanning:
+            print(f"  ⚠️  {len(scanning)} of {len(queries)} hot queries scan a whole table")
+        else:
+            print(f"  🔎 All {len(queries)} hot queries use an index")
+        return scanning
+
+    def _backfill_registration_answers(self, batch_size: int = 500):
+        """Index the form answers of registrations created before the table existed"""
+        print("  📝 Backfilling registration_answers...")
+        # Paged by rowid so only one batch of form_data is held in memory
+        last_rowid, indexed = 0, 0
+        while True:
+            registrations = self.conn.execute(
+                "SELECT rowid, id, event_id, form_data FROM registrations WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                [last_rowid, batch_size],
+            ).fetchall()
+            if not registrations:
+                break
+            params = []
+            for _, registration_id, event_id, form_data in registrations:
+                try:
+                    params.extend(answer_rows(registration_id, event_id, json.loads(form_data or '{}')))
+                except (ValueError, AttributeError):
+                    continue  # not a JSON object; nothing to index
+            if params:
+                self.conn.executemany(INSERT_ANSWER_SQL, params)
+            last_rowid = registrations[-1][0]
+            indexed += len(registrations)
+        print(f"    ✅ Indexed answers of {indexed} registrations")
+
+    def _backfill_registration_facets(self):
+        """Count the answers of existing registrations (registration_answers is filled first)"""
+        print("  📝 Backfilling registration_facets...")
+        self.conn.execute("""
+            INSERT INTO registration_facets (event_id, field_name, value, count, checked_in_count)
+            SELECT a.event_id, a.field_name, a.value, COUNT(*), COALESCE(SUM(r.is_checked_in), 0)
+            FROM registration_answers a JOIN registrations r ON r.id = a.registration_id
+            GROUP BY a.event_id, a.field_name, a.value
+        """)
+        print("    ✅ Backfilled registration_facets")
+
     def _insert_default_data(self):
         """Insert default data for tables that need it"""
         # Check if branding_settings has default record
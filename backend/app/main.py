@@ -1,18 +1,27 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 from pathlib import Path
 import html
 import re
+import time
 
 from dotenv import load_dotenv
 load_dotenv()
 
 from app.core.config import get_settings
 from app.core.database import db
-from app.api import events, registrations, qr_codes, event_fields, branding, whatsapp, message_templates, email
+from app.core.cache import cache_store, get_or_set_cached
+from app.core.cache_bus import invalidation_bus
+from app.core.auth import jwks_cache
+from app.core.metrics import request_metrics, should_log_request, log_request, render_metrics
+from app.api import events, registrations, qr_codes, event_fields, branding, whatsapp, message_templates, email, jobs, admin
+from app.services.checkin_service import CheckInService, checkin_writer
+from app.services.event_service import EventService
+from app.services.job_service import job_worker
+from app.services.outbox_service import outbox_dispatcher
 
 settings = get_settings()
 
@@ -23,8 +32,23 @@ async def lifespan(app: FastAPI):
     # Startup
     await db.connect()
     print("✅ Database connected successfully")
+    await invalidation_bus.start()
+    await jwks_cache.start()
+    await job_worker.start()
+    await outbox_dispatcher.start()
+    await checkin_writer.start()
+    active_event = await EventService.get_active_event()
+    if active_event:
+        await CheckInService.warm(active_event.id)
+    cache_store.start_sweeper()
     yield
     # Shutdown
+    await cache_store.stop_sweeper()
+    await jwks_cache.stop()
+    await checkin_writer.stop()
+    await outbox_dispatcher.stop()
+    await job_worker.stop()
+    await invalidation_bus.stop()
     await db.close()
     print("👋 Database connection closed")
 
@@ -44,17 +68,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
-# Debug middleware to log auth headers
+# Request timing: per-route latency and database usage, with sampled structured logs
 @app.middleware("http")
-async def log_auth_middleware(request: Request, call_next):
-    if request.url.path.startswith("/api/events") and request.method != "OPTIONS":
-        auth_header = request.headers.get("Authorization", "")
-        print(f"DEBUG: Path: {request.url.path}, Auth header present: {bool(auth_header)}, Token prefix: {auth_header[:30] if auth_header else 'None'}")
-    response = await call_next(request)
-    return response
+async def request_timing_middleware(request: Request, call_next):
+    stats = request_metrics.begin()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        # Label by path template so /api/events/{event_id} is one series
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        request_metrics.observe(request.method, route_path, status_code, duration_ms, stats)
+        if should_log_request(status_code, duration_ms):
+            log_request(request.method, route_path, request.url.path, status_code, duration_ms, stats)
 
 # Include routers
 app.include_router(events.router, prefix="/api")
@@ -65,6 +100,8 @@ app.include_router(branding.router, prefix="/api")
 app.include_router(whatsapp.router, prefix="/api")
 app.include_router(message_templates.router)
 app.include_router(email.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 
 @app.get("/health")
@@ -73,6 +110,14 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus metrics for this worker (bearer METRICS_TOKEN required when set)"""
+    if settings.METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 # Static files setup for serving frontend
 # Check if frontend dist directory exists (for production deployment)
 frontend_dist_path = Path(__file__).parent.parent.parent / "frontend" / "dist"
@@ -82,24 +127,28 @@ if frontend_dist_path.exists():
     if assets_path.exists():
         app.mount("/assets", StaticFiles(directory=str(assets_path)), name="assets")
 
-    # Cache for OG-injected HTML (regenerated every 5 minutes or when event changes)
-    _og_cache = {"html": None, "event_id": None, "timestamp": 0}
+    # OG-injected HTML is cached for 5 minutes, or until the active event changes
+    OG_HTML_CACHE_KEY = "og_html"
+    OG_HTML_CACHE_TTL = 300
 
     async def get_og_injected_html() -> str:
         """Get index.html with dynamic OG tags, cached for performance"""
-        import time
+        from app.services.event_service import ACTIVE_EVENT_TAG, event_cache_tag
+
+        og = await get_or_set_cached(
+            OG_HTML_CACHE_KEY,
+            render_og_html,
+            OG_HTML_CACHE_TTL,
+            tags=lambda og: [ACTIVE_EVENT_TAG] + ([event_cache_tag(og["event_id"])] if og["event_id"] else []),
+        )
+        return og["html"]
+
+    async def render_og_html() -> dict:
+        """Render index.html with OG tags for the active event"""
         from app.services.event_service import EventService
 
         index_path = frontend_dist_path / "index.html"
-        current_time = time.time()
-        cache_ttl = 300  # 5 minutes
-
-        # Check if cache is still valid
-        if (
-            _og_cache["html"]
-            and current_time - _og_cache["timestamp"] < cache_ttl
-        ):
-            return _og_cache["html"]
+        event_id = None
 
         # Read base HTML
         html_content = index_path.read_text()
@@ -130,15 +179,11 @@ if frontend_dist_path.exists():
                 for pattern, replacement in replacements:
                     html_content = re.sub(pattern, replacement, html_content)
 
-                _og_cache["event_id"] = active_event.id
+                event_id = active_event.id
         except Exception:
             pass  # Use default HTML on error
 
-        # Update cache
-        _og_cache["html"] = html_content
-        _og_cache["timestamp"] = current_time
-
-        return html_content
+        return {"html": html_content, "event_id": event_id}
 
     # Catch-all route for SPA routing
     # This must be last to not override API routes
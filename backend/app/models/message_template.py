@@ -35,3 +35,4 @@ class WhatsAppBulkMessageRequest(BaseModel):
     send_to: str = Field(default="all", description="all or subset")
     filter_field: Optional[str] = None
     filter_value: Optional[str] = None
+    background: bool = Field(default=False, description="Queue as a background job and return its id")
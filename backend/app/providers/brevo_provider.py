@@ -3,9 +3,10 @@ Brevo (formerly Sendinblue) email provider implementation
 """
 
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import brevo_python
 from brevo_python.rest import ApiException
+from app.core.metrics import provider_call
 from .email_provider import EmailProvider
 
 logger = logging.getLogger(__name__)
@@ -14,6 +15,9 @@ logger = logging.getLogger(__name__)
 class BrevoEmailProvider(EmailProvider):
     """Brevo email provider implementation"""
 
+    # Message versions per request, well inside Brevo's per-request limits
+    MAX_BATCH_SIZE = 100
+
     def __init__(
         self,
         api_key: str,
@@ -108,7 +112,8 @@ class BrevoEmailProvider(EmailProvider):
                 send_smtp_email.text_content = text_content
 
             # Send email
-            api_response = self.api_instance.send_transac_email(send_smtp_email)
+            with provider_call("brevo", "send_email"):
+                api_response = self.api_instance.send_transac_email(send_smtp_email)
 
             # Brevo returns a response with message_id
             message_id = getattr(api_response, 'message_id', None)
@@ -143,6 +148,57 @@ class BrevoEmailProvider(EmailProvider):
                 "error": str(e)
             }
 
+    def _send_chunk(self, messages: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Send a batch as one request using Brevo message versions
+
+        Each version carries its own recipient, subject and HTML; the base
+        subject and HTML are required by the API and come from the first message.
+        """
+        if not self._configured or not self.api_instance:
+            raise RuntimeError("Brevo provider not configured (missing API key or initialization failed)")
+
+        send_smtp_email = brevo_python.SendSmtpEmail(
+            sender={
+                "name": self.from_name,
+                "email": self.from_email
+            },
+            subject=messages[0]["subject"],
+            html_content=messages[0]["html_content"],
+            message_versions=[
+                brevo_python.SendSmtpEmailMessageVersions(
+                    to=[{"email": message["to_email"]}],
+                    subject=message["subject"],
+                    html_content=message["html_content"],
+                    text_content=message.get("text_content")
+                )
+                for message in messages
+            ]
+        )
+
+        try:
+            with provider_call("brevo", "send_batch"):
+                api_response = self.api_instance.send_transac_email(send_smtp_email)
+        except ApiException as e:
+            error_msg = f"Status: {e.status}, Reason: {e.reason}"
+            if hasattr(e, 'body'):
+                error_msg += f", Body: {e.body}"
+            logger.error(f"Brevo: API error sending batch of {len(messages)} emails: {error_msg}")
+            raise RuntimeError(error_msg) from e
+
+        # One message id per version, in request order
+        message_ids = getattr(api_response, 'message_ids', None) or []
+        logger.info(f"Brevo: Batch of {len(messages)} emails sent")
+        return {
+            message["to_email"]: {
+                "success": True,
+                "message_id": message_ids[index] if index < len(message_ids) else None,
+                "to": message["to_email"],
+                "error": None
+            }
+            for index, message in enumerate(messages)
+        }
+
     def get_provider_name(self) -> str:
         """Get provider name"""
         return "Brevo"
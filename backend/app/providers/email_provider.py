@@ -4,12 +4,15 @@ Defines the contract that all email providers must implement
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 
 class EmailProvider(ABC):
     """Abstract base class for email providers"""
 
+    # Most messages sent in a single batch request
+    MAX_BATCH_SIZE = 100
+
     @abstractmethod
     def __init__(self, **config):
         """
@@ -52,6 +55,50 @@ class EmailProvider(ABC):
         """
         pass
 
+    def send_batch(self, messages: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Send many personalized emails, MAX_BATCH_SIZE messages per request
+
+        Args:
+            messages: Dicts with "to_email", "subject", "html_content" and
+                optionally "text_content"; one message per recipient
+
+        Returns:
+            Map of recipient email to a result with the same structure as
+            `send_email` returns
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(messages), self.MAX_BATCH_SIZE):
+            chunk = messages[start:start + self.MAX_BATCH_SIZE]
+            try:
+                results.update(self._send_chunk(chunk))
+            except Exception as e:
+                # The whole request failed, so every recipient in it did
+                for message in chunk:
+                    results[message["to_email"]] = {
+                        "success": False,
+                        "message_id": None,
+                        "to": message["to_email"],
+                        "error": str(e)
+                    }
+        return results
+
+    def _send_chunk(self, messages: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Send one batch request; providers with a batch API override this
+
+        The default sends the messages one by one.
+        """
+        return {
+            message["to_email"]: self.send_email(
+                to_email=message["to_email"],
+                subject=message["subject"],
+                html_content=message["html_content"],
+                text_content=message.get("text_content")
+            )
+            for message in messages
+        }
+
     @abstractmethod
     def get_provider_name(self) -> str:
         """
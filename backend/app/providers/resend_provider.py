@@ -3,8 +3,9 @@ Resend email provider implementation
 """
 
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import resend
+from app.core.metrics import provider_call
 from .email_provider import EmailProvider
 
 logger = logging.getLogger(__name__)
@@ -13,6 +14,9 @@ logger = logging.getLogger(__name__)
 class ResendEmailProvider(EmailProvider):
     """Resend email provider implementation"""
 
+    # Resend's batch endpoint accepts up to 100 emails per request
+    MAX_BATCH_SIZE = 100
+
     def __init__(self, api_key: str, from_email: str = "onboarding@resend.dev", **config):
         """
         Initialize Resend provider
@@ -69,12 +73,13 @@ class ResendEmailProvider(EmailProvider):
             sender = from_email or self.from_email
 
             # Send email
-            response = resend.Emails.send({
-                "from": sender,
-                "to": to_email,
-                "subject": subject,
-                "html": html_content
-            })
+            with provider_call("resend", "send_email"):
+                response = resend.Emails.send({
+                    "from": sender,
+                    "to": to_email,
+                    "subject": subject,
+                    "html": html_content
+                })
 
             if response and response.get('id'):
                 logger.info(f"Resend: Email sent to {to_email}, ID: {response['id']}")
@@ -102,6 +107,36 @@ class ResendEmailProvider(EmailProvider):
                 "error": str(e)
             }
 
+    def _send_chunk(self, messages: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Send a batch as one request to Resend's batch endpoint"""
+        if not self._configured:
+            raise RuntimeError("Resend provider not configured (missing API key)")
+
+        with provider_call("resend", "send_batch"):
+            response = resend.Batch.send([
+                {
+                    "from": self.from_email,
+                    "to": message["to_email"],
+                    "subject": message["subject"],
+                    "html": message["html_content"]
+                }
+                for message in messages
+            ])
+
+        # Created emails come back in request order
+        data = (response or {}).get('data') or []
+        logger.info(f"Resend: Batch of {len(messages)} emails sent")
+        results = {}
+        for index, message in enumerate(messages):
+            email_id = data[index].get('id') if index < len(data) else None
+            results[message["to_email"]] = {
+                "success": bool(email_id),
+                "message_id": email_id,
+                "to": message["to_email"],
+                "error": None if email_id else f"Failed to send email: {response}"
+            }
+        return results
+
     def get_provider_name(self) -> str:
         """Get provider name"""
         return "Resend"
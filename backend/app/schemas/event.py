@@ -1,22 +1,24 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 
 
 class EventFieldCreate(BaseModel):
     """Schema for creating event field"""
 
-    field_name: str
+    field_name: str = Field(..., pattern=r'^[^"]*$')  # no double quotes: see json_path()
     field_type: str  # text, email, phone, select, textarea, checkbox, radio
     field_label: str
     is_required: bool = False
     field_options: Optional[str] = None  # JSON string for select/radio options
     field_order: int = 0
+    is_indexed: bool = False  # hot field: gets an indexed generated column on registrations
 
 
 class EventFieldResponse(EventFieldCreate):
     """Schema for event field response"""
 
+    field_name: str  # without the create pattern: fields stored before it must still load
     id: str
     event_id: str
 
@@ -66,3 +68,18 @@ class EventResponse(BaseModel):
     created_at: str
     updated_at: str
     fields: List[EventFieldResponse] = []
+
+
+class FacetValue(BaseModel):
+    """How many registrations gave one answer to a field"""
+
+    value: str
+    count: int
+    checked_in_count: int
+
+
+class EventFacetsResponse(BaseModel):
+    """Answer distributions for an event's form fields, most common first"""
+
+    event_id: str
+    fields: Dict[str, List[FacetValue]]
@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class JobResponse(BaseModel):
+    """Schema for background job status and progress"""
+
+    id: str
+    event_id: str
+    job_type: str  # email_bulk or whatsapp_bulk
+    status: str  # pending, running, completed, failed, cancelled
+    total: int
+    sent: int
+    failed: int
+    pending: int  # recipients not attempted yet
+    error: Optional[str]
+    created_at: str
+    updated_at: Optional[str]
+    started_at: Optional[str]
+    finished_at: Optional[str]
+
+
+class JobRecipientResponse(BaseModel):
+    """Schema for the delivery state of one job recipient"""
+
+    registration_id: str
+    email: Optional[str]
+    phone: Optional[str]
+    status: str  # pending, sending, sent, failed
+    message_id: Optional[str]
+    error: Optional[str]
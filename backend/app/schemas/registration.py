@@ -1,5 +1,8 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+# Ten-digit mobile number
+PHONE_PATTERN = r"^\d{10}$"
 
 
 class RegistrationCreate(BaseModel):
@@ -7,7 +10,7 @@ class RegistrationCreate(BaseModel):
 
     event_id: str
     email: EmailStr
-    phone: str = Field(..., pattern=r"^\d{10}$")
+    phone: str = Field(..., pattern=PHONE_PATTERN)
     form_data: Dict[str, Any]  # Dynamic form data based on event fields
 
 
@@ -42,3 +45,22 @@ class ManualCheckInRequest(BaseModel):
     """Schema for manual check-in toggle request"""
 
     check_in: bool
+
+
+class RegistrationImportError(BaseModel):
+    """A row that couldn't be imported"""
+
+    row: int  # CSV line or NDJSON line number, starting at 1
+    email: Optional[str] = None
+    error: str
+
+
+class RegistrationImportResponse(BaseModel):
+    """Outcome of a bulk registration import"""
+
+    event_id: str
+    total: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    errors: List[RegistrationImportError] = []
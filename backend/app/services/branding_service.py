@@ -1,32 +1,40 @@
 from typing import Optional
 from app.core.database import db
 from app.models.branding import BrandingSettings, BrandingUpdate
-from app.core.cache import get_cached, set_cached, invalidate_cache, generate_cache_key
+from app.core.cache import get_or_set_cached, invalidate_tags
 from datetime import datetime
 
 # Cache configuration
 BRANDING_CACHE_KEY = "branding:default"
+BRANDING_CACHE_TAG = "branding"
 BRANDING_CACHE_TTL = 6 * 60 * 60  # 6 hours (in seconds)
+BRANDING_STALE_TTL = 60  # serve the old copy this long after expiry while refreshing
 
 
 class BrandingService:
     @staticmethod
     async def get_branding() -> Optional[BrandingSettings]:
         """Get current branding settings (cached)"""
-        # Try to get from cache first
-        cached_branding = await get_cached(BRANDING_CACHE_KEY)
+        # On a miss only one request queries the database; the rest wait for it
+        cached_branding = await get_or_set_cached(
+            BRANDING_CACHE_KEY,
+            BrandingService._load_branding,
+            BRANDING_CACHE_TTL,
+            stale_ttl=BRANDING_STALE_TTL,
+            tags=[BRANDING_CACHE_TAG],
+        )
         if cached_branding:
             return BrandingSettings(**cached_branding)
+        return None
 
-        # Cache miss - fetch from database
+    @staticmethod
+    async def _load_branding() -> Optional[dict]:
+        """Fetch branding settings from the database (as a dict for caching)"""
         result = await db.fetch_one(
             "SELECT * FROM branding_settings WHERE id = 'default'"
         )
         if result:
-            branding = BrandingSettings(**result)
-            # Store in cache (convert to dict for serialization)
-            await set_cached(BRANDING_CACHE_KEY, branding.model_dump(), BRANDING_CACHE_TTL)
-            return branding
+            return BrandingSettings(**result).model_dump()
         return None
 
     @staticmethod
@@ -72,6 +80,6 @@ class BrandingService:
         await db.execute(query, values)
 
         # Invalidate the cache so next request fetches fresh data
-        await invalidate_cache(BRANDING_CACHE_KEY)
+        await invalidate_tags(BRANDING_CACHE_TAG)
 
         return await BrandingService.get_branding()
@@ -0,0 +1,347 @@
+"""
+Door check-in service
+Scans are answered from an in-memory index of each event's registrations, and
+the check-ins are written to the database in batches just after (write-behind).
+Check-ins and undos are published on the invalidation bus so the other
+workers' indexes follow.
+"""
+
+import asyncio
+import itertools
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from app.core.cache_bus import invalidation_bus
+from app.core.config import get_settings
+from app.core.database import db, sql_timestamp
+from app.core.metrics import gauge_lines, metrics_registry
+from app.services.facet_service import FacetService
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Invalidation bus tags carrying a registration's new check-in state
+CHECKED_IN_TAG = "checked-in:"
+CHECKED_OUT_TAG = "checked-out:"
+
+
+class CheckInEntry:
+    """A registration as seen by the door scanner"""
+
+    __slots__ = ("id", "event_id", "email", "checked_in")
+
+    def __init__(self, id: str, event_id: str, email: str, checked_in: bool):
+        self.id = id
+        self.event_id = event_id
+        self.email = email
+        self.checked_in = checked_in
+
+
+class CheckInIndex:
+    """
+    Email -> registration lookup for the most recently used events
+
+    Only events that were loaded (see CheckInService.warm) are indexed; the
+    least recently used event is dropped beyond CHECKIN_INDEX_MAX_EVENTS.
+    Registrations made by other processes aren't seen until the event is
+    reloaded, so a miss must be confirmed against the database. Check-in
+    state changed by other processes arrives over the invalidation bus.
+    """
+
+    def __init__(self, max_events: int):
+        self.max_events = max_events
+        self._events: "OrderedDict[str, Dict[str, CheckInEntry]]" = OrderedDict()
+        self._by_id: Dict[str, CheckInEntry] = {}
+
+    def get_event(self, event_id: str) -> Optional[Dict[str, CheckInEntry]]:
+        """The event's entries by email, or None if it isn't loaded"""
+        entries = self._events.get(event_id)
+        if entries is not None:
+            self._events.move_to_end(event_id)
+        return entries
+
+    def load(self, event_id: str, entries: List[CheckInEntry]):
+        """Replace the event's entries"""
+        self.drop(event_id)
+        self._events[event_id] = {entry.email: entry for entry in entries}
+        for entry in entries:
+            self._by_id[entry.id] = entry
+        while len(self._events) > self.max_events:
+            self.drop(next(iter(self._events)))
+
+    def add(self, event_id: str, registration_id: str, email: str, checked_in: bool = False):
+        """Index a registration, if its event is loaded"""
+        entries = self._events.get(event_id)
+        if entries is None:
+            return
+        entry = CheckInEntry(registration_id, event_id, email, checked_in)
+        entries[email] = entry
+        self._by_id[registration_id] = entry
+
+    def set_checked_in(self, registration_id: str, checked_in: bool):
+        entry = self._by_id.get(registration_id)
+        if entry is not None:
+            entry.checked_in = checked_in
+
+    def remove(self, registration_id: str):
+        entry = self._by_id.pop(registration_id, None)
+        if entry is not None:
+            self._events.get(entry.event_id, {}).pop(entry.email, None)
+
+    def drop(self, event_id: str):
+        """Forget an event's entries"""
+        for entry in (self._events.pop(event_id, None) or {}).values():
+            self._by_id.pop(entry.id, None)
+
+    def clear(self):
+        self._events.clear()
+        self._by_id.clear()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+
+class CheckInWriter:
+    """
+    Background task that writes buffered check-ins to the database
+
+    Check-ins are flushed every CHECKIN_FLUSH_INTERVAL seconds, or as soon as
+    CHECKIN_FLUSH_BATCH_SIZE are waiting, in one UPDATE per batch. A batch
+    that fails to write stays buffered and is retried. Pending check-ins are
+    flushed on stop; a crash loses at most the last interval's scans.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, str] = {}  # registration id -> checked_in_at
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def add(self, registration_id: str, checked_in_at: str):
+        """Buffer a check-in (only while running)"""
+        self._pending.setdefault(registration_id, checked_in_at)
+        if len(self._pending) >= settings.CHECKIN_FLUSH_BATCH_SIZE and self._wakeup is not None:
+            self._wakeup.set()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def is_pending(self, registration_id: str) -> bool:
+        return registration_id in self._pending
+
+    def discard(self, registration_id: str) -> bool:
+        """Drop a buffered check-in that hasn't been written yet"""
+        return self._pending.pop(registration_id, None) is not None
+
+    async def start(self):
+        """Start buffering and flushing check-ins"""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer after flushing pending check-ins"""
+        task, self._task = self._task, None
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Failed to flush %d pending check-ins", self.pending_count)
+        self._wakeup = None
+        self._flush_lock = None
+
+    async def _run(self):
+        # Checked as well as cancelled: wait_for() can swallow a cancellation
+        # that arrives just as the wakeup is set
+        while self._task is not None:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.CHECKIN_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Check-in flush failed; retrying")
+
+    async def flush(self) -> int:
+        """Write every buffered check-in; returns how many changed a registration"""
+        if self._flush_lock is None:
+            return await self._flush_pending()
+        # Serialized so a caller that waits on flush() sees in-flight batches written too
+        async with self._flush_lock:
+            return await self._flush_pending()
+
+    async def _flush_pending(self) -> int:
+        written = 0
+        while self._pending:
+            batch = dict(itertools.islice(self._pending.items(), settings.CHECKIN_FLUSH_BATCH_SIZE))
+            for registration_id in batch:
+                del self._pending[registration_id]
+            try:
+                written += len(await write_check_ins(batch))
+            except BaseException:
+                for registration_id, checked_in_at in batch.items():
+                    self._pending.setdefault(registration_id, checked_in_at)
+                raise
+        return written
+
+
+async def write_check_ins(checked_in_at: Dict[str, str]) -> List[str]:
+    """Check in registrations by id in one statement, with their facet counts.
+
+    Returns the ids that weren't already checked in, and publishes them to
+    the other workers.
+    """
+    values = ", ".join(["(?, ?)"] * len(checked_in_at))
+    async with db.transaction():
+        result = await db.execute(
+            f"""
+            UPDATE registrations
+            SET is_checked_in = 1, checked_in_at = v.column2
+            FROM (VALUES {values}) AS v
+            WHERE registrations.id = v.column1 AND registrations.is_checked_in = 0
+            RETURNING registrations.id
+            """,
+            [value for item in checked_in_at.items() for value in item],
+        )
+        ids = [row[0] for row in result.fetchall()]
+        if ids:
+            await FacetService.record_check_ins(ids, 1)
+    await publish_check_ins(ids, True)
+    return ids
+
+
+async def publish_check_ins(registration_ids: List[str], checked_in: bool):
+    """Tell the other workers' indexes about changed check-in state"""
+    if registration_ids:
+        prefix = CHECKED_IN_TAG if checked_in else CHECKED_OUT_TAG
+        await invalidation_bus.publish([prefix + registration_id for registration_id in registration_ids])
+
+
+async def apply_remote_check_ins(tags: List[str]):
+    """Apply check-in state published by another worker to the local index"""
+    for tag in tags:
+        if tag.startswith(CHECKED_IN_TAG):
+            checkin_index.set_checked_in(tag[len(CHECKED_IN_TAG):], True)
+        elif tag.startswith(CHECKED_OUT_TAG):
+            registration_id = tag[len(CHECKED_OUT_TAG):]
+            # A scan buffered here since is still going to be written
+            if not checkin_writer.is_pending(registration_id):
+                checkin_index.set_checked_in(registration_id, False)
+
+
+checkin_index = CheckInIndex(settings.CHECKIN_INDEX_MAX_EVENTS)
+checkin_writer = CheckInWriter()
+invalidation_bus.subscribe(apply_remote_check_ins)
+
+
+class CheckInService:
+    """Service for scanner check-ins"""
+
+    @staticmethod
+    async def warm(event_id: str):
+        """Load an event's registrations into the check-in index"""
+        rows = await db.fetch_all(
+            "SELECT id, email, is_checked_in FROM registrations WHERE event_id = ?",
+            [event_id],
+        )
+        checkin_index.load(
+            event_id,
+            [
+                CheckInEntry(
+                    row["id"],
+                    event_id,
+                    row["email"],
+                    bool(row["is_checked_in"]) or checkin_writer.is_pending(row["id"]),
+                )
+                for row in rows
+            ],
+        )
+
+    @staticmethod
+    async def check_in(event_id: str, email: str) -> Optional[bool]:
+        """Check in a registration by email.
+
+        Returns True if it was checked in now, False if it already was, or None
+        if the email isn't registered for the event.
+        """
+        entries = checkin_index.get_event(event_id)
+        if entries is None:
+            event = await db.fetch_one("SELECT is_active FROM events WHERE id = ?", [event_id])
+            if event is None:
+                return None
+            # Only the active event is loaded, so scans for other ids (the
+            # endpoint is public) can't evict the event at the door
+            if not event["is_active"]:
+                return await CheckInService._check_in_by_email(event_id, email)
+            await CheckInService.warm(event_id)
+            entries = checkin_index.get_event(event_id)
+
+        entry = entries.get(email)
+        if entry is None:
+            # Possibly registered by another process since the event was loaded
+            return await CheckInService._check_in_by_email(event_id, email)
+        if entry.checked_in:
+            return False
+
+        entry.checked_in = True
+        if checkin_writer.running:
+            checkin_writer.add(entry.id, sql_timestamp())
+            return True
+        try:
+            return bool(await write_check_ins({entry.id: sql_timestamp()}))
+        except BaseException:
+            entry.checked_in = False
+            raise
+
+    @staticmethod
+    async def _check_in_by_email(event_id: str, email: str) -> Optional[bool]:
+        async with db.transaction():
+            result = await db.execute(
+                """
+                UPDATE registrations
+                SET is_checked_in = 1, checked_in_at = CURRENT_TIMESTAMP
+                WHERE event_id = ? AND email = ? AND is_checked_in = 0
+                RETURNING id
+                """,
+                [event_id, email],
+            )
+            row = result.fetchone()
+            if row:
+                await FacetService.record_check_ins([row[0]], 1)
+        if row:
+            checkin_index.add(event_id, row[0], email, checked_in=True)
+            await publish_check_ins([row[0]], True)
+            return True
+
+        reg = await db.fetch_one(
+            "SELECT id FROM registrations WHERE event_id = ? AND email = ?",
+            [event_id, email],
+        )
+        if not reg:
+            return None
+        checkin_index.add(event_id, reg["id"], email, checked_in=True)
+        return False
+
+
+def _collect_checkin_metrics():
+    return (
+        gauge_lines("magpie_checkin_index_registrations", "Registrations held in the check-in index", len(checkin_index))
+        + gauge_lines("magpie_checkin_pending_writes", "Check-ins waiting to be written", checkin_writer.pending_count)
+    )
+
+
+metrics_registry.register_collector(_collect_checkin_metrics)
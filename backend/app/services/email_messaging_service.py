@@ -3,10 +3,13 @@ Email messaging service for bulk email sending
 Handles bulk email sending to event registrants using configured provider
 """
 
+import asyncio
+import json
 import logging
 from typing import List, Dict, Any, Optional
 from app.core.database import db
 from app.providers import get_email_provider
+from app.services.registration_service import RegistrationService
 
 logger = logging.getLogger(__name__)
 
@@ -56,6 +59,157 @@ class EmailMessagingService:
                 "error": str(e)
             }
 
+    @staticmethod
+    async def get_target_registrations(
+        event_id: str,
+        send_to: str = "all",
+        filter_field: Optional[str] = None,
+        filter_value: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Registrations of an event (with the event name) that a bulk send should reach"""
+        query = """
+            SELECT r.id, r.email, r.phone, r.form_data, e.name as event_name
+            FROM registrations r
+            JOIN events e ON r.event_id = e.id
+            WHERE r.event_id = ?
+        """
+        params = [event_id]
+
+        if send_to == "subset":
+            if not (filter_field and filter_value):
+                return []
+            # Indexed lookup of matching answers instead of parsing every form_data
+            query += """
+            AND r.id IN (
+                SELECT registration_id FROM registration_answers
+                WHERE event_id = ? AND field_name = ? AND value = ?
+            )
+            """
+            params += [event_id, filter_field, filter_value]
+        elif send_to != "all":
+            return []
+
+        return await db.fetch_all(query + " ORDER BY r.created_at DESC", params)
+
+    @staticmethod
+    def personalize_message(
+        message: str,
+        registration: Dict[str, Any],
+        template_variables: Optional[Dict[str, str]] = None
+    ) -> str:
+        """Substitute template variables, form answers, email and phone into a message"""
+        form_data = json.loads(registration.get('form_data', '{}'))
+
+        # Personalize message
+        personalized_message = message
+
+        # Replace template variables
+        if template_variables:
+            for var_name, var_value in template_variables.items():
+                personalized_message = personalized_message.replace(
+                    f"{{{{{var_name}}}}}",
+                    str(var_value)
+                )
+
+        # Replace form data variables
+        for field_name, field_value in form_data.items():
+            if field_value:
+                personalized_message = personalized_message.replace(
+                    f"{{{{{field_name}}}}}",
+                    str(field_value)
+                )
+
+        # Also replace email and phone from registration
+        personalized_message = personalized_message.replace("{{email}}", registration.get('email', ''))
+        personalized_message = personalized_message.replace("{{phone}}", registration.get('phone', '') or '')
+
+        return personalized_message
+
+    @staticmethod
+    def render_html(event_name: str, personalized_message: str) -> str:
+        """Wrap a message in the MagPie email header and footer"""
+        # Create HTML content with header and footer
+        return f"""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <!-- Header -->
+            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                        border-radius: 10px 10px 0 0; padding: 30px; text-align: center;">
+                <h1 style="color: white; margin: 0; font-size: 28px;">MagPie Events</h1>
+                <p style="color: rgba(255,255,255,0.9); margin: 10px 0 0 0; font-size: 16px;">
+                    {event_name}
+                </p>
+            </div>
+
+            <!-- Main Content -->
+            <div style="background: white; padding: 30px; border-left: 1px solid #e5e7eb;
+                        border-right: 1px solid #e5e7eb;">
+                <div style="white-space: pre-wrap; line-height: 1.6; color: #374151;">
+{personalized_message}
+                </div>
+            </div>
+
+            <!-- Footer -->
+            <div style="background: #f9fafb; padding: 20px; border: 1px solid #e5e7eb;
+                        border-radius: 0 0 10px 10px; text-align: center;">
+                <p style="color: #6b7280; font-size: 14px; margin: 0;">
+                    Thank you for registering with MagPie Event Platform
+                </p>
+                <p style="color: #9ca3af; font-size: 12px; margin: 10px 0 0 0;">
+                    © 2024 MagPie Events. All rights reserved.
+                </p>
+            </div>
+        </div>
+        """
+
+    async def send_to_registrations(
+        self,
+        registrations: List[Dict[str, Any]],
+        subject: str,
+        message: str,
+        template_variables: Optional[Dict[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Personalize and send an email to each registration
+
+        Messages go out through the provider's batch API (one request per
+        MAX_BATCH_SIZE recipients) on a worker thread, since provider calls block.
+
+        Returns:
+            One result per registration, in the same order
+        """
+        messages = [
+            {
+                "to_email": reg.get('email', ''),
+                "subject": subject,
+                "html_content": self.render_html(
+                    reg.get('event_name', 'Event'),
+                    self.personalize_message(message, reg, template_variables)
+                )
+            }
+            for reg in registrations
+        ]
+
+        loop = asyncio.get_running_loop()
+        try:
+            sent = await loop.run_in_executor(None, self.provider.send_batch, messages)
+        except Exception as e:
+            sent = {}
+            logger.error(f"Error sending email batch: {str(e)}")
+
+        results = []
+        for reg in registrations:
+            email = reg.get('email', '')
+            result = sent.get(email) or {"success": False, "message_id": None, "error": "No result from email provider"}
+            results.append({
+                "registration_id": reg.get('id'),
+                "email": email,
+                "success": result['success'],
+                "message_id": result.get('message_id'),
+                "error": result.get('error')
+            })
+
+        return results
+
     async def send_bulk_emails(
         self,
         event_id: str,
@@ -82,129 +236,20 @@ class EmailMessagingService:
             Summary of sent emails (success, failed, total)
         """
         try:
-            # Get registrations from database with event name
-            registrations = await db.fetch_all(
-                """
-                SELECT r.id, r.email, r.phone, r.form_data, e.name as event_name
-                FROM registrations r
-                JOIN events e ON r.event_id = e.id
-                WHERE r.event_id = ?
-                ORDER BY r.created_at DESC
-                """,
-                [event_id]
+            registrations = await self.get_target_registrations(
+                event_id, send_to, filter_field, filter_value
             )
 
-            if not registrations:
-                return {
-                    "total": 0,
-                    "sent": 0,
-                    "failed": 0,
-                    "results": []
-                }
-
-            # Filter registrations if needed
-            filtered_registrations = []
-            for reg in registrations:
-                # Parse form_data JSON
-                import json
-                form_data = json.loads(reg.get('form_data', '{}'))
-
-                # Add to list based on filter
-                if send_to == "all":
-                    filtered_registrations.append(reg)
-                elif send_to == "subset" and filter_field and filter_value:
-                    if form_data.get(filter_field) == filter_value:
-                        filtered_registrations.append(reg)
-
             # Send emails
-            results = []
-            sent_count = 0
-            failed_count = 0
-
-            for reg in filtered_registrations:
-                # Parse form_data for this registration
-                import json
-                form_data = json.loads(reg.get('form_data', '{}'))
-
-                # Personalize message
-                personalized_message = message
-
-                # Replace template variables
-                if template_variables:
-                    for var_name, var_value in template_variables.items():
-                        personalized_message = personalized_message.replace(
-                            f"{{{{{var_name}}}}}",
-                            str(var_value)
-                        )
-
-                # Replace form data variables
-                for field_name, field_value in form_data.items():
-                    if field_value:
-                        personalized_message = personalized_message.replace(
-                            f"{{{{{field_name}}}}}",
-                            str(field_value)
-                        )
-
-                # Also replace email and phone from registration
-                personalized_message = personalized_message.replace("{{email}}", reg.get('email', ''))
-                personalized_message = personalized_message.replace("{{phone}}", reg.get('phone', '') or '')
-
-                # Create HTML content with header and footer
-                html_content = f"""
-                <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <!-- Header -->
-                    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                                border-radius: 10px 10px 0 0; padding: 30px; text-align: center;">
-                        <h1 style="color: white; margin: 0; font-size: 28px;">MagPie Events</h1>
-                        <p style="color: rgba(255,255,255,0.9); margin: 10px 0 0 0; font-size: 16px;">
-                            {reg.get('event_name', 'Event')}
-                        </p>
-                    </div>
-
-                    <!-- Main Content -->
-                    <div style="background: white; padding: 30px; border-left: 1px solid #e5e7eb;
-                                border-right: 1px solid #e5e7eb;">
-                        <div style="white-space: pre-wrap; line-height: 1.6; color: #374151;">
-{personalized_message}
-                        </div>
-                    </div>
-
-                    <!-- Footer -->
-                    <div style="background: #f9fafb; padding: 20px; border: 1px solid #e5e7eb;
-                                border-radius: 0 0 10px 10px; text-align: center;">
-                        <p style="color: #6b7280; font-size: 14px; margin: 0;">
-                            Thank you for registering with MagPie Event Platform
-                        </p>
-                        <p style="color: #9ca3af; font-size: 12px; margin: 10px 0 0 0;">
-                            © 2024 MagPie Events. All rights reserved.
-                        </p>
-                    </div>
-                </div>
-                """
-
-                # Send email
-                result = self.send_email(
-                    to_email=reg.get('email', ''),
-                    subject=subject,
-                    html_content=html_content
-                )
-
-                if result['success']:
-                    sent_count += 1
-                else:
-                    failed_count += 1
-
-                results.append({
-                    "email": reg.get('email', ''),
-                    "success": result['success'],
-                    "message_id": result.get('message_id'),
-                    "error": result.get('error')
-                })
+            results = await self.send_to_registrations(
+                registrations, subject, message, template_variables
+            )
+            sent_count = sum(1 for result in results if result['success'])
 
             return {
-                "total": len(filtered_registrations),
+                "total": len(registrations),
                 "sent": sent_count,
-                "failed": failed_count,
+                "failed": len(results) - sent_count,
                 "results": results
             }
 
@@ -228,27 +273,7 @@ class EmailMessagingService:
             List of distinct values
         """
         try:
-            query = """
-                SELECT form_data
-                FROM registrations
-                WHERE event_id = ?
-            """
-            result = await db.execute(query, [event_id])
-            rows = result.fetchall()
-
-            # Extract unique values for the field
-            values = set()
-            import json
-            for row in rows:
-                # Row is a tuple, form_data is the first element
-                form_data_json = row[0] if row else None
-                if form_data_json:
-                    form_data = json.loads(form_data_json)
-                    value = form_data.get(field_name)
-                    if value and value != '':
-                        values.add(str(value))
-
-            return sorted(list(values))
+            return await RegistrationService.get_answer_values(event_id, field_name)
 
         except Exception as e:
             logger.error(f"Error getting field values: {str(e)}")
@@ -1,7 +1,10 @@
 import uuid
 import json
-from typing import List, Optional
+import base64
+from typing import Any, Dict, List, Optional, Tuple
 from app.core.database import db
+from app.core.cache import cached, invalidate_tags
+from app.services.checkin_service import CheckInService, checkin_index
 from app.schemas.event import (
     EventCreate,
     EventUpdate,
@@ -9,6 +12,86 @@ from app.schemas.event import (
     EventFieldResponse,
 )
 
+# Event reads are invalidated on every write; the TTL only bounds staleness
+# from writes made outside this service
+EVENT_CACHE_TTL = 300  # 5 minutes (in seconds)
+EVENT_STALE_TTL = 30
+
+# Cache tag for whichever event is active; per-event entries are tagged event:<id>
+ACTIVE_EVENT_TAG = "events:active"
+
+REGISTRATION_COLUMNS = (
+    "id",
+    "email",
+    "phone",
+    "form_data",
+    "is_checked_in",
+    "checked_in_at",
+    "created_at",
+)
+
+
+def event_cache_tag(event_id: str) -> str:
+    """Cache tag for entries derived from one event"""
+    return f"event:{event_id}"
+
+
+def _encode_cursor(created_at: str, registration_id: str) -> str:
+    raw = json.dumps([created_at, registration_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, registration_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(created_at), str(registration_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _like_prefix(prefix: str) -> str:
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
+
+
+def _parse_projection(fields: Optional[List[str]]) -> Tuple[List[str], List[str]]:
+    """Split a `fields` projection into SQL columns and form_data keys"""
+    if not fields:
+        return list(REGISTRATION_COLUMNS), []
+
+    # id and created_at are always selected: they make up the cursor
+    columns = ["id", "created_at"]
+    form_keys = []
+    for field in fields:
+        if field.startswith("form_data."):
+            form_keys.append(field[len("form_data."):])
+            field = "form_data"
+        if field not in REGISTRATION_COLUMNS:
+            raise ValueError(f"Unknown field: {field}")
+        if field not in columns:
+            columns.append(field)
+    return columns, form_keys
+
+
+def _registration_row(row: dict, fields: Optional[List[str]], form_keys: List[str]) -> dict:
+    """Shape a registrations row for the API, honouring the projection"""
+    result = {}
+    for column in REGISTRATION_COLUMNS:
+        if column not in row:
+            continue
+        if fields and column not in fields and not (column == "form_data" and form_keys):
+            continue
+        value = row[column]
+        if column == "form_data":
+            value = json.loads(value)
+            if form_keys and "form_data" not in fields:
+                value = {key: value[key] for key in form_keys if key in value}
+        elif column == "is_checked_in":
+            value = bool(value)
+        result[column] = value
+    return result
+
 
 class EventService:
     """Service for event management"""
@@ -18,77 +101,52 @@ class EventService:
         """Create a new event"""
         event_id = str(uuid.uuid4())
 
-        # Insert event
-        await db.execute(
-            """
-            INSERT INTO events (id, name, description, date, time, venue,
-                              venue_address, venue_map_link, is_active, registrations_open)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-            [
-                event_id,
-                event_data.name,
-                event_data.description,
-                event_data.date,
-                event_data.time,
-                event_data.venue,
-                event_data.venue_address,
-                event_data.venue_map_link,
-                1 if event_data.is_active else 0,
-                1 if event_data.registrations_open else 0,
-            ],
-        )
-
-        # Insert event fields
-        for field in event_data.fields:
-            field_id = str(uuid.uuid4())
+        # Insert event and its fields in one transaction
+        async with db.transaction():
             await db.execute(
                 """
-                INSERT INTO event_fields (id, event_id, field_name, field_type,
-                                        field_label, is_required, field_options, field_order)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO events (id, name, description, date, time, venue,
+                                  venue_address, venue_map_link, is_active, registrations_open)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
                 [
-                    field_id,
                     event_id,
-                    field.field_name,
-                    field.field_type,
-                    field.field_label,
-                    1 if field.is_required else 0,
-                    field.field_options,
-                    field.field_order,
+                    event_data.name,
+                    event_data.description,
+                    event_data.date,
+                    event_data.time,
+                    event_data.venue,
+                    event_data.venue_address,
+                    event_data.venue_map_link,
+                    1 if event_data.is_active else 0,
+                    1 if event_data.registrations_open else 0,
                 ],
             )
+            await EventService._insert_fields(event_id, event_data.fields)
+
+        await EventService._ensure_hot_fields(event_data.fields)
+        if event_data.is_active:
+            await invalidate_tags(ACTIVE_EVENT_TAG)
+            await CheckInService.warm(event_id)
 
         return await EventService.get_event(event_id)
 
     @staticmethod
-    async def get_event(event_id: str) -> Optional[EventResponse]:
-        """Get event by ID"""
-        event = await db.fetch_one("SELECT * FROM events WHERE id = ?", [event_id])
-        if not event:
-            return None
-
-        # Get event fields
-        fields_rows = await db.fetch_all(
-            "SELECT * FROM event_fields WHERE event_id = ? ORDER BY field_order",
-            [event_id],
+    def _field_response(row: dict) -> EventFieldResponse:
+        return EventFieldResponse(
+            id=row["id"],
+            event_id=row["event_id"],
+            field_name=row["field_name"],
+            field_type=row["field_type"],
+            field_label=row["field_label"],
+            is_required=bool(row["is_required"]),
+            field_options=row["field_options"],
+            field_order=row["field_order"],
+            is_indexed=bool(row.get("is_indexed")),
         )
 
-        fields = [
-            EventFieldResponse(
-                id=row["id"],
-                event_id=row["event_id"],
-                field_name=row["field_name"],
-                field_type=row["field_type"],
-                field_label=row["field_label"],
-                is_required=bool(row["is_required"]),
-                field_options=row["field_options"],
-                field_order=row["field_order"],
-            )
-            for row in fields_rows
-        ]
-
+    @staticmethod
+    def _event_response(event: dict, fields: List[EventFieldResponse]) -> EventResponse:
         return EventResponse(
             id=event["id"],
             name=event["name"],
@@ -106,25 +164,97 @@ class EventService:
         )
 
     @staticmethod
-    async def get_all_events() -> List[EventResponse]:
-        """Get all events"""
-        events = await db.fetch_all("SELECT * FROM events ORDER BY created_at DESC")
-        result = []
-        for event in events:
-            event_response = await EventService.get_event(event["id"])
-            if event_response:
-                result.append(event_response)
-        return result
+    async def _load_events(
+        where: str = "",
+        params: Optional[list] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> List[EventResponse]:
+        """Load events with their fields in two queries.
+
+        Selects the matching events, then every field for those events in a
+        single IN query, and groups the fields in memory.
+        """
+        # rowid breaks ties between events created within the same second
+        query = f"SELECT * FROM events {where} ORDER BY created_at DESC, rowid DESC"
+        params = list(params or [])
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+
+        events = await db.fetch_all(query, params)
+        if not events:
+            return []
+
+        event_ids = [event["id"] for event in events]
+        placeholders = ", ".join("?" for _ in event_ids)
+        fields_rows = await db.fetch_all(
+            f"SELECT * FROM event_fields WHERE event_id IN ({placeholders}) ORDER BY field_order",
+            event_ids,
+        )
+
+        fields_by_event = {event_id: [] for event_id in event_ids}
+        for row in fields_rows:
+            fields_by_event[row["event_id"]].append(EventService._field_response(row))
+
+        return [
+            EventService._event_response(event, fields_by_event[event["id"]])
+            for event in events
+        ]
+
+    @staticmethod
+    async def _invalidate_event(event_id: str) -> None:
+        """Drop cached reads that include this event"""
+        await invalidate_tags(event_cache_tag(event_id))
+
+    @staticmethod
+    @cached(
+        "event",
+        ttl=EVENT_CACHE_TTL,
+        key=lambda event_id: event_id,
+        stale_ttl=EVENT_STALE_TTL,
+        tags=lambda event, event_id: [event_cache_tag(event_id)],
+    )
+    async def get_event(event_id: str) -> Optional[EventResponse]:
+        """Get event by ID (cached)"""
+        events = await EventService._load_events("WHERE id = ?", [event_id])
+        return events[0] if events else None
 
     @staticmethod
+    async def get_all_events(limit: Optional[int] = None, offset: int = 0) -> List[EventResponse]:
+        """Get all events, newest first, optionally one page at a time"""
+        return await EventService._load_events(limit=limit, offset=offset)
+
+    @staticmethod
+    @cached(
+        "event_active",
+        ttl=EVENT_CACHE_TTL,
+        stale_ttl=EVENT_STALE_TTL,
+        tags=lambda event: [ACTIVE_EVENT_TAG, event_cache_tag(event.id)],
+    )
     async def get_active_event() -> Optional[EventResponse]:
-        """Get currently active event"""
-        event = await db.fetch_one(
-            "SELECT * FROM events WHERE is_active = 1 ORDER BY created_at DESC LIMIT 1"
-        )
+        """Get currently active event (cached)"""
+        events = await EventService._load_events("WHERE is_active = 1", limit=1)
+        return events[0] if events else None
+
+    @staticmethod
+    @cached(
+        "event_fields",
+        ttl=EVENT_CACHE_TTL,
+        key=lambda event_id: event_id,
+        stale_ttl=EVENT_STALE_TTL,
+        tags=lambda fields, event_id: [event_cache_tag(event_id)],
+    )
+    async def get_event_fields(event_id: str) -> Optional[List[EventFieldResponse]]:
+        """Get an event's fields in form order, or None if the event doesn't exist (cached)"""
+        event = await db.fetch_one("SELECT id FROM events WHERE id = ?", [event_id])
         if not event:
             return None
-        return await EventService.get_event(event["id"])
+        rows = await db.fetch_all(
+            "SELECT * FROM event_fields WHERE event_id = ? ORDER BY field_order",
+            [event_id],
+        )
+        return [EventService._field_response(row) for row in rows]
 
     @staticmethod
     async def update_event(event_id: str, event_data: EventUpdate) -> Optional[EventResponse]:
@@ -166,6 +296,11 @@ class EventService:
             params.append(event_id)
             query = f"UPDATE events SET {', '.join(update_fields)} WHERE id = ?"
             await db.execute(query, params)
+            await EventService._invalidate_event(event_id)
+            if event_data.is_active is not None:
+                await invalidate_tags(ACTIVE_EVENT_TAG)
+            if event_data.is_active:
+                await CheckInService.warm(event_id)
 
         return await EventService.get_event(event_id)
 
@@ -179,17 +314,31 @@ class EventService:
         new_status = 0 if event["is_active"] else 1
 
         # If activating, deactivate all other events
+        changed = [event_id]
         if new_status == 1:
-            await db.execute("UPDATE events SET is_active = 0 WHERE id != ?", [event_id])
+            result = await db.execute(
+                "UPDATE events SET is_active = 0 WHERE id != ? AND is_active = 1 RETURNING id",
+                [event_id],
+            )
+            changed.extend(row[0] for row in result.fetchall())
 
         await db.execute("UPDATE events SET is_active = ? WHERE id = ?", [new_status, event_id])
 
+        await invalidate_tags(ACTIVE_EVENT_TAG, *(event_cache_tag(changed_id) for changed_id in changed))
+        if new_status == 1:
+            # Load the door scanner's index before the first scan arrives
+            await CheckInService.warm(event_id)
+
         return await EventService.get_event(event_id)
 
     @staticmethod
     async def delete_event(event_id: str) -> bool:
         """Delete event"""
-        await db.execute("DELETE FROM events WHERE id = ?", [event_id])
+        async with db.transaction():
+            await db.execute("DELETE FROM events WHERE id = ?", [event_id])
+            await db.execute("DELETE FROM registration_facets WHERE event_id = ?", [event_id])
+        await EventService._invalidate_event(event_id)
+        checkin_index.drop(event_id)
         return True
 
     @staticmethod
@@ -218,6 +367,7 @@ class EventService:
                     "is_required": field.is_required,
                     "field_options": field.field_options,
                     "field_order": field.field_order,
+                    "is_indexed": field.is_indexed,
                 }
                 for field in source_event.fields
             ],
@@ -228,23 +378,79 @@ class EventService:
     @staticmethod
     async def get_event_registrations(event_id: str) -> List[dict]:
         """Get all registrations for an event"""
-        registrations = await db.fetch_all(
-            "SELECT * FROM registrations WHERE event_id = ? ORDER BY created_at DESC",
-            [event_id],
+        page = await EventService.get_event_registrations_page(event_id)
+        return page["registrations"]
+
+    @staticmethod
+    async def get_event_registrations_page(
+        event_id: str,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        checked_in: Optional[bool] = None,
+        email_prefix: Optional[str] = None,
+        phone_prefix: Optional[str] = None,
+        form_filters: Optional[Dict[str, str]] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Get one page of an event's registrations, newest first.
+
+        Pages are keyset-based on (created_at, id): pass the returned
+        `next_cursor` back as `cursor` to continue. Filters are applied in SQL,
+        and `fields` limits the returned keys (`form_data.<name>` selects a
+        single form answer).
+
+        Raises:
+            ValueError: If the cursor or a field name is invalid
+        """
+        conditions = ["event_id = ?"]
+        params: List[Any] = [event_id]
+
+        if cursor:
+            created_at, registration_id = _decode_cursor(cursor)
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend([created_at, registration_id])
+        if checked_in is not None:
+            conditions.append("is_checked_in = ?")
+            params.append(1 if checked_in else 0)
+        if email_prefix:
+            conditions.append("email LIKE ? ESCAPE '\\'")
+            params.append(_like_prefix(email_prefix))
+        if phone_prefix:
+            conditions.append("phone LIKE ? ESCAPE '\\'")
+            params.append(_like_prefix(phone_prefix))
+        for field_name, value in (form_filters or {}).items():
+            # Matched against the str() of each answer, like the bulk-send filters and
+            # field-values lists; json_extract() would miss numeric and boolean answers
+            conditions.append(
+                "id IN (SELECT registration_id FROM registration_answers "
+                "WHERE event_id = ? AND field_name = ? AND value = ?)"
+            )
+            params.extend([event_id, field_name, value])
+
+        columns, form_keys = _parse_projection(fields)
+        query = (
+            f"SELECT {', '.join(columns)} FROM registrations "
+            f"WHERE {' AND '.join(conditions)} "
+            "ORDER BY created_at DESC, id DESC"
         )
+        if limit is not None:
+            # Fetch one extra row to know whether another page exists
+            query += " LIMIT ?"
+            params.append(limit + 1)
 
-        return [
-            {
-                "id": reg["id"],
-                "email": reg["email"],
-                "phone": reg["phone"],
-                "form_data": json.loads(reg["form_data"]),
-                "is_checked_in": bool(reg["is_checked_in"]),
-                "checked_in_at": reg["checked_in_at"],
-                "created_at": reg["created_at"],
-            }
-            for reg in registrations
-        ]
+        rows = await db.fetch_all(query, params)
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+        return {
+            "registrations": [
+                _registration_row(row, fields, form_keys) for row in rows
+            ],
+            "next_cursor": next_cursor,
+        }
 
     @staticmethod
     async def update_event_fields(event_id: str, fields: List) -> Optional[List[EventFieldResponse]]:
@@ -259,35 +465,51 @@ class EventService:
 
         # Use transaction to make delete + insert atomic
         # This prevents race conditions when multiple save requests arrive
-        with db.transaction():
+        async with db.transaction():
             # Delete existing fields
             await db.execute("DELETE FROM event_fields WHERE event_id = ?", [event_id])
 
             # Insert new fields
-            for field in fields:
-                field_id = str(uuid.uuid4())
-                await db.execute(
-                    """
-                    INSERT INTO event_fields (id, event_id, field_name, field_type,
-                                            field_label, is_required, field_options, field_order)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                    [
-                        field_id,
-                        event_id,
-                        field.field_name,
-                        field.field_type,
-                        field.field_label,
-                        1 if field.is_required else 0,
-                        field.field_options,
-                        field.field_order,
-                    ],
-                )
+            await EventService._insert_fields(event_id, fields)
+
+        await EventService._ensure_hot_fields(fields)
+        await EventService._invalidate_event(event_id)
 
         # Return updated fields
         event = await EventService.get_event(event_id)
         return event.fields if event else []
 
+    @staticmethod
+    async def _insert_fields(event_id: str, fields: List) -> None:
+        """Insert event fields with a single batched statement"""
+        await db.executemany(
+            """
+            INSERT INTO event_fields (id, event_id, field_name, field_type,
+                                    field_label, is_required, field_options, field_order, is_indexed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+            [
+                [
+                    str(uuid.uuid4()),
+                    event_id,
+                    field.field_name,
+                    field.field_type,
+                    field.field_label,
+                    1 if field.is_required else 0,
+                    field.field_options,
+                    field.field_order,
+                    1 if field.is_indexed else 0,
+                ]
+                for field in fields
+            ],
+        )
+
+    @staticmethod
+    async def _ensure_hot_fields(fields: List) -> None:
+        """Create the indexed registrations columns for fields declared hot"""
+        for field_name in sorted({field.field_name for field in fields if field.is_indexed}):
+            await db.ensure_hot_field(field_name)
+
     @staticmethod
     async def add_event_field(event_id: str, field) -> Optional[EventFieldResponse]:
         """Add a single field to an event"""
@@ -307,8 +529,8 @@ class EventService:
         await db.execute(
             """
             INSERT INTO event_fields (id, event_id, field_name, field_type,
-                                    field_label, is_required, field_options, field_order)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                                    field_label, is_required, field_options, field_order, is_indexed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
             [
                 field_id,
@@ -319,8 +541,11 @@ class EventService:
                 1 if field.is_required else 0,
                 field.field_options,
                 next_order,
+                1 if field.is_indexed else 0,
             ],
         )
+        await EventService._ensure_hot_fields([field])
+        await EventService._invalidate_event(event_id)
 
         return EventFieldResponse(
             id=field_id,
@@ -331,6 +556,7 @@ class EventService:
             is_required=field.is_required,
             field_options=field.field_options,
             field_order=next_order,
+            is_indexed=field.is_indexed,
         )
 
     @staticmethod
@@ -340,4 +566,5 @@ class EventService:
             "DELETE FROM event_fields WHERE id = ? AND event_id = ?",
             [field_id, event_id]
         )
+        await EventService._invalidate_event(event_id)
         return True
@@ -0,0 +1,94 @@
+"""
+Registration facet service
+Per-event answer counts kept up to date as registrations are created, checked
+in and deleted, so dashboard breakdowns never scan the registrations
+"""
+
+from typing import Dict, List, Mapping, Optional, Tuple
+from app.core.database import db
+from app.schemas.event import EventFacetsResponse, FacetValue
+
+
+class FacetService:
+    """Service for materialized registration facet counts"""
+
+    @staticmethod
+    async def add_counts(event_id: str, counts: Mapping[Tuple[str, str], int]) -> None:
+        """Add pre-aggregated (field_name, value) counts, e.g. for a batch of imported registrations"""
+        # Keys are unique, so one multi-row upsert never updates a row twice
+        await db.insert_values(
+            "INSERT INTO registration_facets (event_id, field_name, value, count)",
+            [[event_id, field_name, value, count] for (field_name, value), count in counts.items()],
+            "ON CONFLICT (event_id, field_name, value) DO UPDATE SET count = count + excluded.count",
+        )
+
+    @staticmethod
+    async def record_check_in(registration_id: str, delta: int) -> None:
+        """Move a registration's answers into (+1) or out of (-1) the checked-in counts"""
+        await FacetService.record_check_ins([registration_id], delta)
+
+    @staticmethod
+    async def record_check_ins(registration_ids: List[str], delta: int) -> None:
+        """Move several registrations' answers into (+1) or out of (-1) the checked-in counts"""
+        placeholders = ", ".join("?" * len(registration_ids))
+        await db.execute(
+            f"""
+            UPDATE registration_facets SET checked_in_count = checked_in_count + ? * (
+                SELECT COUNT(*) FROM registration_answers a
+                WHERE a.registration_id IN ({placeholders})
+                  AND a.event_id = registration_facets.event_id
+                  AND a.field_name = registration_facets.field_name
+                  AND a.value = registration_facets.value
+            )
+            WHERE (event_id, field_name, value) IN (
+                SELECT event_id, field_name, value FROM registration_answers
+                WHERE registration_id IN ({placeholders})
+            )
+            """,
+            [delta, *registration_ids, *registration_ids],
+        )
+
+    @staticmethod
+    async def remove_registration(registration_id: str, event_id: str, was_checked_in: bool) -> None:
+        """Uncount a registration's answers (call before its registration_answers rows are deleted)"""
+        await db.execute(
+            """
+            UPDATE registration_facets
+            SET count = count - 1, checked_in_count = checked_in_count - ?
+            WHERE (event_id, field_name, value) IN (
+                SELECT event_id, field_name, value FROM registration_answers
+                WHERE registration_id = ?
+            )
+            """,
+            [1 if was_checked_in else 0, registration_id],
+        )
+        await db.execute(
+            "DELETE FROM registration_facets WHERE event_id = ? AND count <= 0",
+            [event_id],
+        )
+
+    @staticmethod
+    async def get_facets(event_id: str) -> Optional[EventFacetsResponse]:
+        """Answer distributions for every field of an event, or None if the event doesn't exist"""
+        event = await db.fetch_one("SELECT id FROM events WHERE id = ?", [event_id])
+        if not event:
+            return None
+
+        rows = await db.fetch_all(
+            """
+            SELECT field_name, value, count, checked_in_count FROM registration_facets
+            WHERE event_id = ?
+            ORDER BY field_name, count DESC, value
+            """,
+            [event_id],
+        )
+        fields: Dict[str, List[FacetValue]] = {}
+        for row in rows:
+            fields.setdefault(row["field_name"], []).append(
+                FacetValue(
+                    value=row["value"],
+                    count=row["count"],
+                    checked_in_count=row["checked_in_count"],
+                )
+            )
+        return EventFacetsResponse(event_id=event_id, fields=fields)
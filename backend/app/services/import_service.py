@@ -0,0 +1,310 @@
+"""
+Registration import service
+Bulk-loads attendee lists (CSV or NDJSON) into an event in batched transactions
+"""
+
+import csv
+import functools
+import io
+import json
+import re
+import uuid
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from pydantic import EmailStr, TypeAdapter, ValidationError
+from app.core.database import db
+from app.core.form_answers import answer_rows
+from app.core.metrics import registrations_total
+from app.schemas.event import EventFieldResponse
+from app.schemas.registration import (
+    PHONE_PATTERN,
+    RegistrationCreate,
+    RegistrationImportError,
+    RegistrationImportResponse,
+)
+from app.services.checkin_service import checkin_index
+from app.services.event_service import EventService
+from app.services.facet_service import FacetService
+from app.services.outbox_service import OutboxService, outbox_dispatcher
+from app.services.registration_service import CONFIRMATION_EMAIL, PROFILE_UPSERT_CONFLICT
+
+# Field types whose answer must be one of the field's options
+CHOICE_FIELD_TYPES = ("select", "dropdown", "radio")
+
+_EMAIL_ADAPTER = TypeAdapter(EmailStr)
+
+# Unquoted ASCII local part (RFC 5322 dot-atom) and a domain
+_SIMPLE_EMAIL_RE = re.compile(
+    r"([A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*)@([A-Za-z0-9.-]+)"
+)
+
+_PHONE_RE = re.compile(PHONE_PATTERN)
+
+
+class ImportService:
+    """Service for bulk registration imports"""
+
+    # Registrations inserted per transaction
+    BATCH_SIZE = 500
+    # Row errors returned in the response; the rest are only counted
+    MAX_ERRORS = 1000
+
+    @staticmethod
+    async def import_registrations(
+        event_id: str,
+        data: bytes,
+        format: str = "csv",
+        send_confirmations: bool = False,
+    ) -> Optional[RegistrationImportResponse]:
+        """Import registrations into an event, or None if the event doesn't exist.
+
+        Rows are validated against the event's fields. Emails already
+        registered for the event (or repeated in the file) are skipped as
+        duplicates. Valid rows are inserted BATCH_SIZE at a time, each batch in
+        one transaction with its answers, facet counts and profile upserts.
+
+        Raises:
+            ValueError: If the file can't be decoded
+        """
+        fields = await EventService.get_event_fields(event_id)
+        if fields is None:
+            return None
+
+        try:
+            text = data.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ValueError("File must be UTF-8 encoded")
+
+        rows = _parse_ndjson(text) if format == "ndjson" else _parse_csv(text, fields)
+        options = _field_options(fields)
+
+        result = RegistrationImportResponse(event_id=event_id)
+        seen_emails = set()
+        batch: List[Tuple[int, RegistrationCreate]] = []
+        for row_number, row in rows:
+            result.total += 1
+            try:
+                registration = _validate(event_id, row, fields, options)
+            except ValueError as e:
+                _add_error(result, row_number, row, str(e))
+                continue
+
+            if registration.email in seen_emails:
+                result.duplicates += 1
+                continue
+            seen_emails.add(registration.email)
+
+            batch.append((row_number, registration))
+            if len(batch) >= ImportService.BATCH_SIZE:
+                await ImportService._insert_batch(event_id, batch, send_confirmations, result)
+                batch = []
+
+        if batch:
+            await ImportService._insert_batch(event_id, batch, send_confirmations, result)
+
+        if send_confirmations and result.imported:
+            outbox_dispatcher.notify()
+        return result
+
+    @staticmethod
+    async def _insert_batch(
+        event_id: str,
+        batch: List[Tuple[int, RegistrationCreate]],
+        send_confirmations: bool,
+        result: RegistrationImportResponse,
+    ) -> None:
+        ids = {str(uuid.uuid4()): registration for _, registration in batch}
+
+        async with db.transaction():
+            # Emails already registered are skipped by the unique (event_id, email) index
+            inserted = await db.insert_values(
+                "INSERT INTO registrations (id, event_id, email, phone, form_data)",
+                [
+                    [registration_id, event_id, registration.email, registration.phone,
+                     json.dumps(registration.form_data)]
+                    for registration_id, registration in ids.items()
+                ],
+                "ON CONFLICT (event_id, email) DO NOTHING RETURNING id",
+            )
+            created = [(row[0], ids[row[0]]) for row in inserted]
+            if created:
+                answers = []
+                for registration_id, registration in created:
+                    answers.extend(answer_rows(registration_id, event_id, registration.form_data))
+                await db.insert_values(
+                    "INSERT INTO registration_answers (registration_id, event_id, field_name, value)",
+                    answers,
+                )
+                await FacetService.add_counts(
+                    event_id, Counter((field_name, value) for _, _, field_name, value in answers)
+                )
+
+                await db.insert_values(
+                    "INSERT INTO user_profiles (id, email, phone, profile_data)",
+                    [
+                        [str(uuid.uuid4()), registration.email, registration.phone,
+                         json.dumps(registration.form_data)]
+                        for _, registration in created
+                    ],
+                    PROFILE_UPSERT_CONFLICT,
+                )
+                if send_confirmations:
+                    await OutboxService.enqueue_many(
+                        CONFIRMATION_EMAIL,
+                        [
+                            {
+                                "event_id": event_id,
+                                "email": registration.email,
+                                "form_data": registration.form_data,
+                            }
+                            for _, registration in created
+                        ],
+                    )
+
+        for registration_id, registration in created:
+            checkin_index.add(event_id, registration_id, registration.email)
+        result.imported += len(created)
+        result.duplicates += len(batch) - len(created)
+        registrations_total.inc(amount=len(created))
+
+
+def _parse_csv(text: str, fields: List[EventFieldResponse]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (row number, {field_name: value}) for each CSV row.
+
+    Headers may be field names or field labels (as written by the CSV export),
+    in any case. Columns that aren't event fields, email or phone are ignored.
+    """
+    names = {}
+    for field in fields:
+        names[field.field_label.strip().lower()] = field.field_name
+        names[field.field_name.lower()] = field.field_name
+    names.update({"email": "email", "phone": "phone"})
+
+    reader = csv.reader(io.StringIO(text))
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [names.get(column.strip().lower()) for column in header]
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue  # blank line
+        yield reader.line_num, {
+            name: value.strip()
+            for name, value in zip(columns, values)
+            if name is not None
+        }
+
+
+def _parse_ndjson(text: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (line number, object) for each NDJSON line.
+
+    A line is either flat ({"email": ..., "phone": ..., "<field>": ...}) or
+    shaped like the NDJSON export ({"email": ..., "phone": ..., "form_data": {...}}).
+    Lines that aren't valid JSON are yielded as None, to be reported.
+    """
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        if isinstance(row, dict) and isinstance(row.get("form_data"), dict):
+            row = {**row["form_data"], "email": row.get("email"), "phone": row.get("phone")}
+        yield line_number, row
+
+
+def _validate(
+    event_id: str,
+    row: Any,
+    fields: List[EventFieldResponse],
+    options: Dict[str, List[str]],
+) -> RegistrationCreate:
+    """Check a row against the event's fields and build its registration.
+
+    Applies the same rules as RegistrationCreate, without re-running its
+    email validation (see _normalize_email).
+
+    Raises:
+        ValueError: Describing everything wrong with the row
+    """
+    if not isinstance(row, dict):
+        raise ValueError("Not a JSON object")
+
+    problems = []
+    email = None
+    try:
+        email = _normalize_email(row.get("email"))
+    except ValidationError as e:
+        problems.append(f"email: {e.errors()[0]['msg']}")
+    phone = str(row.get("phone") or "")
+    if not _PHONE_RE.fullmatch(phone):
+        problems.append(f"phone: should match pattern '{PHONE_PATTERN}'")
+
+    form_data = {}
+    for field in fields:
+        value = row.get(field.field_name)
+        if value is None or value == "":
+            if field.is_required:
+                problems.append(f"{field.field_name}: required")
+            continue
+        if field.field_name in options and str(value) not in options[field.field_name]:
+            problems.append(f"{field.field_name}: '{value}' is not one of the options")
+        form_data[field.field_name] = value
+
+    if problems:
+        raise ValueError("; ".join(problems))
+    return RegistrationCreate.model_construct(
+        event_id=event_id, email=email, phone=phone, form_data=form_data
+    )
+
+
+def _field_options(fields: List[EventFieldResponse]) -> Dict[str, List[str]]:
+    """Allowed answers of each choice field that declares its options"""
+    options = {}
+    for field in fields:
+        if field.field_type not in CHOICE_FIELD_TYPES or not field.field_options:
+            continue
+        try:
+            values = json.loads(field.field_options)
+        except ValueError:
+            continue
+        if isinstance(values, list):
+            options[field.field_name] = [str(value) for value in values]
+    return options
+
+
+def _normalize_email(email: Any) -> str:
+    """The address EmailStr would produce, validating each domain only once.
+
+    Full validation spends most of its time on the domain (IDNA checks), and
+    an attendee list has few distinct domains. Plain ASCII addresses have
+    their local part checked here and their domain validated once; anything
+    else goes through full validation.
+
+    Raises:
+        ValidationError: If the address is invalid
+    """
+    if isinstance(email, str):
+        match = _SIMPLE_EMAIL_RE.fullmatch(email)
+        if match and len(match.group(1)) <= 64 and len(email) <= 254:
+            domain = _normalized_domain(match.group(2))
+            if domain is not None:
+                return f"{match.group(1)}@{domain}"
+    return _EMAIL_ADAPTER.validate_python(email)
+
+
+@functools.lru_cache(maxsize=4096)
+def _normalized_domain(domain: str) -> Optional[str]:
+    """Normalized form of a valid domain, or None to fall back to full validation"""
+    try:
+        return _EMAIL_ADAPTER.validate_python(f"x@{domain}").split("@", 1)[1]
+    except ValidationError:
+        return None
+
+
+def _add_error(result: RegistrationImportResponse, row_number: int, row: Any, error: str) -> None:
+    result.failed += 1
+    if len(result.errors) < ImportService.MAX_ERRORS:
+        email = row.get("email") if isinstance(row, dict) else None
+        result.errors.append(RegistrationImportError(row=row_number, email=email, error=error))
@@ -0,0 +1,416 @@
+"""
+Background job service
+Persists bulk email/WhatsApp sends as jobs and works through them in-process
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from typing import Any, Dict, List, Optional
+from app.core.config import get_settings
+from app.core.database import db
+from app.schemas.job import JobResponse, JobRecipientResponse
+from app.services.email_messaging_service import EmailMessagingService
+from app.services.whatsapp_service import WhatsAppService
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Service used to send each job type; constructed when the job runs
+JOB_SENDERS = {
+    "email_bulk": EmailMessagingService,
+    "whatsapp_bulk": WhatsAppService,
+}
+
+
+class JobService:
+    """Service for creating and inspecting background jobs"""
+
+    @staticmethod
+    def _job_response(row: dict) -> JobResponse:
+        return JobResponse(
+            id=row["id"],
+            event_id=row["event_id"],
+            job_type=row["job_type"],
+            status=row["status"],
+            total=row["total"] or 0,
+            sent=row["sent"] or 0,
+            failed=row["failed"] or 0,
+            pending=(row["total"] or 0) - (row["sent"] or 0) - (row["failed"] or 0),
+            error=row["error"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+        )
+
+    @staticmethod
+    async def create_job(
+        event_id: str,
+        job_type: str,
+        payload: Dict[str, Any],
+        registration_ids: List[str],
+    ) -> JobResponse:
+        """
+        Create a pending job with a snapshot of its recipients
+
+        Args:
+            event_id: Event the job sends for
+            job_type: Key of JOB_SENDERS
+            payload: Keyword arguments for the sender's `send_to_registrations`
+            registration_ids: Recipients, in send order
+        """
+        if job_type not in JOB_SENDERS:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        job_id = str(uuid.uuid4())
+        async with db.transaction():
+            await db.execute(
+                """
+                INSERT INTO jobs (id, event_id, job_type, status, payload, total)
+                VALUES (?, ?, ?, 'pending', ?, ?)
+                """,
+                [job_id, event_id, job_type, json.dumps(payload), len(registration_ids)],
+            )
+            # Multi-row INSERTs: one round trip per few thousand recipients, not per recipient
+            await db.insert_values(
+                "INSERT INTO job_recipients (id, job_id, registration_id, position)",
+                [
+                    [str(uuid.uuid4()), job_id, registration_id, position]
+                    for position, registration_id in enumerate(registration_ids)
+                ],
+            )
+
+        return await JobService.get_job(job_id)
+
+    @staticmethod
+    async def get_job(job_id: str) -> Optional[JobResponse]:
+        """Get a job with its progress counters"""
+        row = await db.fetch_one("SELECT * FROM jobs WHERE id = ?", [job_id])
+        return JobService._job_response(row) if row else None
+
+    @staticmethod
+    async def list_jobs(event_id: Optional[str] = None, limit: int = 50) -> List[JobResponse]:
+        """List jobs, newest first, optionally for one event"""
+        if event_id:
+            rows = await db.fetch_all(
+                "SELECT * FROM jobs WHERE event_id = ? ORDER BY created_at DESC, rowid DESC LIMIT ?",
+                [event_id, limit],
+            )
+        else:
+            rows = await db.fetch_all(
+                "SELECT * FROM jobs ORDER BY created_at DESC, rowid DESC LIMIT ?",
+                [limit],
+            )
+        return [JobService._job_response(row) for row in rows]
+
+    @staticmethod
+    async def get_job_recipients(
+        job_id: str,
+        status: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> List[JobRecipientResponse]:
+        """Delivery state of a job's recipients in send order"""
+        query = """
+            SELECT jr.registration_id, r.email, r.phone, jr.status, jr.message_id, jr.error
+            FROM job_recipients jr
+            LEFT JOIN registrations r ON r.id = jr.registration_id
+            WHERE jr.job_id = ?
+        """
+        params: List[Any] = [job_id]
+        if status:
+            query += " AND jr.status = ?"
+            params.append(status)
+        query += " ORDER BY jr.position LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        rows = await db.fetch_all(query, params)
+        return [JobRecipientResponse(**row) for row in rows]
+
+    @staticmethod
+    async def cancel_job(job_id: str) -> Optional[JobResponse]:
+        """
+        Cancel a pending or running job
+
+        A running job stops after the batch it is currently sending.
+        Finished jobs are returned unchanged.
+        """
+        await db.execute(
+            """
+            UPDATE jobs
+            SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status IN ('pending', 'running')
+            """,
+            [job_id],
+        )
+        return await JobService.get_job(job_id)
+
+    @staticmethod
+    async def finish_job(job_id: str, status: str, error: Optional[str] = None, owner: Optional[str] = None):
+        """Move an active job to a final status (a cancellation is never overwritten).
+
+        With `owner`, only while that worker still holds the job.
+        """
+        query = """
+            UPDATE jobs
+            SET status = ?, error = ?, finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP,
+                owner = NULL, lease_until = NULL
+            WHERE id = ? AND status IN ('pending', 'running')
+        """
+        params = [status, error, job_id]
+        if owner is not None:
+            query += " AND owner = ?"
+            params.append(owner)
+        await db.execute(query, params)
+
+
+class JobWorker:
+    """
+    In-process worker pool for background jobs
+
+    Every app process runs a worker, so a job is claimed before it is
+    worked: the claiming worker becomes its owner with a lease of
+    JOB_LEASE_SECONDS, renewed after every batch. Other workers skip a job
+    while its lease is live and take it over once it has expired (its owner
+    died), checking for such jobs every JOB_POLL_INTERVAL seconds.
+
+    Jobs are sent in batches. A batch's recipients are claimed (status
+    sending) under the job's lease before they are sent, and their results
+    and the job's counters are committed together, so a job resumes from
+    its first unsent recipient. Only a batch interrupted mid-send by a crash
+    may be sent again, by the worker that takes the job over.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: set = set()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, concurrency: Optional[int] = None):
+        """Start the worker tasks and re-queue jobs left unfinished by the last run"""
+        if self._tasks:
+            return
+
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._work())
+            for _ in range(concurrency or settings.JOB_WORKER_CONCURRENCY)
+        ]
+
+        resumable = await self._submit_claimable()
+        if resumable:
+            print(f"🔁 Resuming {resumable} background job(s)")
+        self._tasks.append(asyncio.create_task(self._poll()))
+
+    async def _submit_claimable(self) -> int:
+        """Queue unfinished jobs that no live worker holds"""
+        rows = await db.fetch_all(
+            """
+            SELECT id FROM jobs
+            WHERE status IN ('pending', 'running')
+              AND (lease_until IS NULL OR lease_until < CURRENT_TIMESTAMP)
+            ORDER BY created_at, rowid
+            """
+        )
+        for row in rows:
+            self.submit(row["id"])
+        return len(rows)
+
+    async def _poll(self):
+        """Pick up jobs whose owner stopped renewing its lease"""
+        while True:
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+            try:
+                await self._submit_claimable()
+            except Exception:
+                logger.exception("Polling for abandoned jobs failed")
+
+    async def stop(self):
+        """Stop the workers; interrupted jobs stay active and resume on the next start"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._queue = None
+        self._queued.clear()
+
+    def submit(self, job_id: str):
+        """Queue a job for the workers (no-op until `start()`, which picks it up from the table)"""
+        if self._queue is None or job_id in self._queued:
+            return
+        self._queued.add(job_id)
+        self._queue.put_nowait(job_id)
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self.run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Background job {job_id} failed")
+                await JobService.finish_job(job_id, "failed", str(e), owner=self.worker_id)
+
+    async def _claim_job(self, job_id: str) -> Optional[dict]:
+        """Take (or renew) ownership of an active job, or None if another worker holds it"""
+        result = await db.execute(
+            """
+            UPDATE jobs
+            SET status = 'running', owner = ?, lease_until = datetime('now', ?),
+                started_at = COALESCE(started_at, CURRENT_TIMESTAMP), updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+              AND (status = 'pending'
+                   OR (status = 'running'
+                       AND (owner = ? OR lease_until IS NULL OR lease_until < CURRENT_TIMESTAMP)))
+            RETURNING *
+            """,
+            [self.worker_id, _lease(), job_id, self.worker_id],
+        )
+        row = result.fetchone()
+        return dict(zip([column[0] for column in result.description], row)) if row else None
+
+    async def _renew_lease(self, job_id: str) -> bool:
+        """Extend our lease; False once the job was cancelled or taken over"""
+        result = await db.execute(
+            """
+            UPDATE jobs SET lease_until = datetime('now', ?), updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND owner = ? AND status = 'running'
+            """,
+            [_lease(), job_id, self.worker_id],
+        )
+        return result.rowcount > 0
+
+    async def _claim_batch(self, job_id: str) -> List[dict]:
+        """Claim the next recipients to send (status sending) and load them"""
+        async with db.transaction():
+            # A sending recipient whose lease expired was claimed by a worker that died mid-batch.
+            # Recipient leases end with the job lease they were claimed under.
+            claimed = await db.execute(
+                """
+                UPDATE job_recipients
+                SET status = 'sending', owner = ?, updated_at = CURRENT_TIMESTAMP,
+                    lease_until = (SELECT lease_until FROM jobs WHERE id = ?)
+                WHERE id IN (
+                    SELECT jr.id FROM job_recipients jr
+                    JOIN registrations r ON r.id = jr.registration_id
+                    WHERE jr.job_id = ?
+                      AND (jr.status = 'pending'
+                           OR (jr.status = 'sending' AND jr.lease_until < CURRENT_TIMESTAMP))
+                    ORDER BY jr.position
+                    LIMIT ?
+                )
+                RETURNING id
+                """,
+                [self.worker_id, job_id, job_id, settings.JOB_BATCH_SIZE],
+            )
+            ids = [row[0] for row in claimed.fetchall()]
+        if not ids:
+            return []
+        return await db.fetch_all(
+            f"""
+            SELECT jr.id AS recipient_id, r.id, r.email, r.phone, r.form_data, e.name AS event_name
+            FROM job_recipients jr
+            JOIN registrations r ON r.id = jr.registration_id
+            JOIN events e ON e.id = r.event_id
+            WHERE jr.id IN ({", ".join("?" * len(ids))})
+            ORDER BY jr.position
+            """,
+            ids,
+        )
+
+    async def run_job(self, job_id: str):
+        """Claim a job and send every unsent recipient, batch by batch"""
+        job = await self._claim_job(job_id)
+        if not job:
+            return  # finished, cancelled or held by another worker
+
+        try:
+            sender = JOB_SENDERS[job["job_type"]]()
+        except ValueError as e:
+            # Provider credentials missing
+            await JobService.finish_job(job_id, "failed", str(e), owner=self.worker_id)
+            return
+
+        payload = json.loads(job["payload"])
+        while True:
+            batch = await self._claim_batch(job_id)
+            if not batch:
+                break
+
+            results = await sender.send_to_registrations(batch, **payload)
+            await self._record_batch(job_id, batch, results, self.worker_id)
+            if not await self._renew_lease(job_id):
+                return  # cancelled, or our lease lapsed and another worker took over
+
+        async with db.transaction():
+            # Whatever is still unsent lost its registration after the job was queued
+            orphaned = await db.execute(
+                """
+                UPDATE job_recipients
+                SET status = 'failed', error = 'Registration no longer exists', updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = ? AND status IN ('pending', 'sending')
+                """,
+                [job_id],
+            )
+            if orphaned.rowcount:
+                await db.execute(
+                    "UPDATE jobs SET failed = failed + ? WHERE id = ?",
+                    [orphaned.rowcount, job_id],
+                )
+            await JobService.finish_job(job_id, "completed", owner=self.worker_id)
+
+    @staticmethod
+    async def _record_batch(job_id: str, batch: List[dict], results: List[dict], owner: str):
+        """Checkpoint a sent batch: recipient outcomes and job counters in one transaction.
+
+        Only recipients still claimed by `owner` are recorded and counted.
+        """
+        outcomes = [
+            [
+                recipient["recipient_id"],
+                "sent" if result["success"] else "failed",
+                result.get("message_id") or result.get("message_sid"),
+                result.get("error"),
+            ]
+            for recipient, result in zip(batch, results)
+        ]
+        async with db.transaction():
+            recorded = await db.execute(
+                f"""
+                UPDATE job_recipients
+                SET status = v.column2, message_id = v.column3, error = v.column4,
+                    updated_at = CURRENT_TIMESTAMP, owner = NULL, lease_until = NULL
+                FROM (VALUES {", ".join(["(?, ?, ?, ?)"] * len(outcomes))}) AS v
+                WHERE job_recipients.id = v.column1 AND job_recipients.owner = ?
+                  AND job_recipients.status = 'sending'
+                RETURNING job_recipients.status
+                """,
+                [value for outcome in outcomes for value in outcome] + [owner],
+            )
+            statuses = [row[0] for row in recorded.fetchall()]
+            sent = statuses.count("sent")
+            await db.execute(
+                """
+                UPDATE jobs
+                SET sent = sent + ?, failed = failed + ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                """,
+                [sent, len(statuses) - sent, job_id],
+            )
+
+
+def _lease() -> str:
+    """datetime() modifier for a new lease's expiry"""
+    return f"+{settings.JOB_LEASE_SECONDS} seconds"
+
+
+# Global worker instance
+job_worker = JobWorker()
@@ -0,0 +1,180 @@
+"""
+Transactional outbox
+Side effects (like confirmation emails) are written as rows in the same
+transaction as the data change and delivered later by a background dispatcher
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.core.config import get_settings
+from app.core.database import db
+from app.core.dispatch import dispatch
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Handlers return True once the message is delivered
+OutboxHandler = Callable[[Dict[str, Any]], Awaitable[bool]]
+
+
+class OutboxService:
+    """Service for writing outbox messages"""
+
+    @staticmethod
+    async def enqueue(kind: str, payload: Dict[str, Any]) -> str:
+        """
+        Add a message to the outbox
+
+        Call inside the `db.transaction()` that makes the change the message is
+        about, so the message exists if and only if the change is committed.
+        """
+        message_id = str(uuid.uuid4())
+        await db.execute(
+            "INSERT INTO outbox (id, kind, payload) VALUES (?, ?, ?)",
+            [message_id, kind, json.dumps(payload)],
+        )
+        return message_id
+
+    @staticmethod
+    async def enqueue_many(kind: str, payloads: List[Dict[str, Any]]) -> int:
+        """Add one message per payload in multi-row statements (same rules as `enqueue`)"""
+        rows = [[str(uuid.uuid4()), kind, json.dumps(payload)] for payload in payloads]
+        await db.insert_values("INSERT INTO outbox (id, kind, payload)", rows)
+        return len(rows)
+
+
+class OutboxDispatcher:
+    """
+    Background task that delivers due outbox messages
+
+    Every app process runs a dispatcher, so due messages are claimed
+    (status sending, leased for OUTBOX_LEASE_SECONDS) in one statement before
+    they are delivered, and each is handed to exactly one dispatcher. Failed
+    deliveries are retried with exponential backoff until
+    OUTBOX_MAX_ATTEMPTS is reached. Delivery is at-least-once: a message
+    whose dispatcher died mid-send is claimed again once its lease expires.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, OutboxHandler] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def register(self, kind: str, handler: OutboxHandler):
+        """Register the delivery handler for a message kind"""
+        self._handlers[kind] = handler
+
+    def notify(self):
+        """Wake the dispatcher after new messages were committed"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        """Start delivering; messages left over from the last run go first"""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the dispatcher; undelivered messages stay pending"""
+        task, self._task = self._task, None
+        self._wakeup = None
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.dispatch_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                processed = 0
+
+            if processed:
+                continue  # keep draining the backlog
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass  # poll for retries that have become due
+            self._wakeup.clear()
+
+    async def dispatch_due(self) -> int:
+        """Claim and deliver one batch of due messages; returns how many were attempted"""
+        # Messages left sending by a dispatcher that died are due again once their lease expires
+        claimed = await db.execute(
+            """
+            UPDATE outbox SET status = 'sending', lease_until = datetime('now', ?)
+            WHERE id IN (
+                SELECT id FROM outbox
+                WHERE (status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+                   OR (status = 'sending' AND lease_until < CURRENT_TIMESTAMP)
+                ORDER BY created_at, rowid
+                LIMIT ?
+            )
+            RETURNING id, kind, payload, attempts
+            """,
+            [f"+{settings.OUTBOX_LEASE_SECONDS} seconds", settings.OUTBOX_BATCH_SIZE],
+        )
+        columns = [column[0] for column in claimed.description]
+        rows = [dict(zip(columns, row)) for row in claimed.fetchall()]
+        if rows:
+            await dispatch(rows, self._deliver, concurrency=settings.OUTBOX_CONCURRENCY, max_retries=0)
+        return len(rows)
+
+    async def _deliver(self, row: dict) -> Dict[str, Any]:
+        attempts = (row["attempts"] or 0) + 1
+        handler = self._handlers.get(row["kind"])
+        error = None
+
+        if handler is None:
+            delivered, error = False, f"No handler registered for {row['kind']}"
+        else:
+            try:
+                delivered = await handler(json.loads(row["payload"]))
+                if not delivered:
+                    error = "Delivery failed"
+            except Exception as e:
+                delivered, error = False, str(e)
+
+        if delivered:
+            await db.execute(
+                """
+                UPDATE outbox
+                SET status = 'sent', attempts = ?, last_error = NULL, sent_at = CURRENT_TIMESTAMP,
+                    lease_until = NULL
+                WHERE id = ?
+                """,
+                [attempts, row["id"]],
+            )
+        elif attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            logger.error(f"Giving up on outbox message {row['id']} after {attempts} attempts: {error}")
+            await db.execute(
+                "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ?, lease_until = NULL WHERE id = ?",
+                [attempts, error, row["id"]],
+            )
+        else:
+            delay = min(settings.OUTBOX_RETRY_MAX_DELAY, settings.OUTBOX_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+            await db.execute(
+                """
+                UPDATE outbox
+                SET status = 'pending', attempts = ?, last_error = ?, next_attempt_at = datetime('now', ?),
+                    lease_until = NULL
+                WHERE id = ?
+                """,
+                [attempts, error, f"+{int(delay)} seconds", row["id"]],
+            )
+
+        return {"success": delivered, "error": error}
+
+
+# Global dispatcher instance
+outbox_dispatcher = OutboxDispatcher()
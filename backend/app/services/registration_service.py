@@ -1,17 +1,54 @@
+import asyncio
+import functools
 import uuid
 import json
 import logging
-from typing import Optional
-from app.core.database import db
+from typing import List, Optional
+from app.core.database import db, sql_timestamp
+from app.core.form_answers import form_answers
+from app.core.metrics import registrations_total
 from app.schemas.registration import (
     RegistrationCreate,
     RegistrationResponse,
     UserProfileResponse,
 )
+from app.services.checkin_service import CheckInService, checkin_index, checkin_writer, publish_check_ins
 from app.services.email_service import email_service
+from app.services.facet_service import FacetService
+from app.services.outbox_service import outbox_dispatcher
 
 logger = logging.getLogger(__name__)
 
+# Outbox message kind for registration confirmation emails
+CONFIRMATION_EMAIL = "registration_confirmation"
+
+# Profile kept for auto-fill: the latest answers given with this email
+PROFILE_UPSERT_CONFLICT = """
+    ON CONFLICT (email) DO UPDATE SET
+        phone = excluded.phone,
+        profile_data = excluded.profile_data,
+        last_updated = CURRENT_TIMESTAMP
+"""
+UPSERT_PROFILE_SQL = (
+    "INSERT INTO user_profiles (id, email, phone, profile_data) VALUES (?, ?, ?, ?)"
+    + PROFILE_UPSERT_CONFLICT
+)
+
+# Columns of a RegistrationResponse
+REGISTRATION_RETURNING = "id, event_id, email, phone, form_data, is_checked_in, checked_in_at, created_at"
+
+
+class DuplicateRegistrationError(Exception):
+    """The email is already registered for the event"""
+
+
+class EventNotFoundError(Exception):
+    """The event to register for doesn't exist"""
+
+
+class RegistrationsClosedError(Exception):
+    """The event isn't taking registrations"""
+
 
 class RegistrationService:
     """Service for registration management"""
@@ -20,40 +57,88 @@ class RegistrationService:
     async def create_registration(
         registration_data: RegistrationCreate,
     ) -> RegistrationResponse:
-        """Create a new registration"""
-        registration_id = str(uuid.uuid4())
+        """Create a new registration
 
-        # Insert registration
-        await db.execute(
-            """
-            INSERT INTO registrations (id, event_id, email, phone, form_data)
-            VALUES (?, ?, ?, ?, ?)
-        """,
-            [
-                registration_id,
-                registration_data.event_id,
-                registration_data.email,
-                registration_data.phone,
-                json.dumps(registration_data.form_data),
-            ],
-        )
+        Raises:
+            EventNotFoundError: If the event doesn't exist
+            RegistrationsClosedError: If the event isn't taking registrations
+            DuplicateRegistrationError: If the email already registered for the event
+        """
+        registration_id = str(uuid.uuid4())
+        created_at = sql_timestamp()
+        form_data = json.dumps(registration_data.form_data)
+        answers = dict(form_answers(registration_data.form_data))
+
+        # One autocommit statement: the registration_submissions trigger checks
+        # the event is open, then writes the registration, its answers and facet
+        # counts, the auto-fill profile and the queued confirmation email together.
+        # The unique (event_id, email) index rejects duplicates, even concurrent ones.
+        try:
+            await db.execute(
+                """
+                INSERT INTO registration_submissions (
+                    id, event_id, email, phone, form_data, created_at, answers,
+                    profile_id, message_id, message_kind, message_payload
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                [
+                    registration_id,
+                    registration_data.event_id,
+                    registration_data.email,
+                    registration_data.phone,
+                    form_data,
+                    created_at,
+                    json.dumps(answers),
+                    str(uuid.uuid4()),
+                    str(uuid.uuid4()),
+                    CONFIRMATION_EMAIL,
+                    json.dumps(
+                        {
+                            "event_id": registration_data.event_id,
+                            "email": registration_data.email,
+                            "form_data": registration_data.form_data,
+                        }
+                    ),
+                ],
+            )
+        except ValueError as e:
+            message = str(e)
+            if "event not found" in message:
+                raise EventNotFoundError(registration_data.event_id) from e
+            if "registrations closed" in message:
+                raise RegistrationsClosedError(registration_data.event_id) from e
+            if "UNIQUE constraint failed" in message:
+                raise DuplicateRegistrationError(registration_data.email) from e
+            raise
+
+        outbox_dispatcher.notify()
+        registrations_total.inc()
+        checkin_index.add(registration_data.event_id, registration_id, registration_data.email)
 
-        # Update or create user profile for auto-fill feature
-        await RegistrationService.update_user_profile(
-            registration_data.email,
-            registration_data.phone,
-            registration_data.form_data,
+        return RegistrationResponse(
+            id=registration_id,
+            event_id=registration_data.event_id,
+            email=registration_data.email,
+            phone=registration_data.phone,
+            form_data=registration_data.form_data,
+            is_checked_in=False,
+            checked_in_at=None,
+            created_at=created_at,
         )
 
-        # Send confirmation email
-        await RegistrationService._send_confirmation_email(
-            registration_data.event_id,
-            registration_data.email,
-            registration_data.form_data,
+    @staticmethod
+    def _registration_response(reg: dict) -> RegistrationResponse:
+        return RegistrationResponse(
+            id=reg["id"],
+            event_id=reg["event_id"],
+            email=reg["email"],
+            phone=reg["phone"],
+            form_data=json.loads(reg["form_data"]),
+            is_checked_in=bool(reg["is_checked_in"]),
+            checked_in_at=reg["checked_in_at"],
+            created_at=reg["created_at"],
         )
 
-        return await RegistrationService.get_registration(registration_id)
-
     @staticmethod
     async def get_event_registration_status(event_id: str) -> Optional[dict]:
         """Get event registration status by event ID."""
@@ -73,21 +158,25 @@ class RegistrationService:
     async def get_registration(registration_id: str) -> Optional[RegistrationResponse]:
         """Get registration by ID"""
         reg = await db.fetch_one(
-            "SELECT * FROM registrations WHERE id = ?", [registration_id]
+            f"SELECT {REGISTRATION_RETURNING} FROM registrations WHERE id = ?", [registration_id]
         )
         if not reg:
             return None
 
-        return RegistrationResponse(
-            id=reg["id"],
-            event_id=reg["event_id"],
-            email=reg["email"],
-            phone=reg["phone"],
-            form_data=json.loads(reg["form_data"]),
-            is_checked_in=bool(reg["is_checked_in"]),
-            checked_in_at=reg["checked_in_at"],
-            created_at=reg["created_at"],
+        return RegistrationService._registration_response(reg)
+
+    @staticmethod
+    async def get_answer_values(event_id: str, field_name: str) -> List[str]:
+        """Distinct non-empty answers to a form field across an event's registrations, sorted"""
+        rows = await db.fetch_all(
+            """
+            SELECT DISTINCT value FROM registration_answers
+            WHERE event_id = ? AND field_name = ?
+            ORDER BY value
+            """,
+            [event_id, field_name],
         )
+        return [row["value"] for row in rows]
 
     @staticmethod
     async def get_user_profile(
@@ -118,56 +207,19 @@ class RegistrationService:
         email: str, phone: str, form_data: dict
     ) -> None:
         """Update or create user profile"""
-        profile_id = str(uuid.uuid4())
-
-        # Check if profile exists
-        existing = await db.fetch_one(
-            "SELECT id FROM user_profiles WHERE email = ?", [email]
+        await db.execute(
+            UPSERT_PROFILE_SQL,
+            [str(uuid.uuid4()), email, phone, json.dumps(form_data)],
         )
 
-        if existing:
-            # Update existing profile
-            await db.execute(
-                """
-                UPDATE user_profiles
-                SET phone = ?, profile_data = ?, last_updated = CURRENT_TIMESTAMP
-                WHERE email = ?
-            """,
-                [phone, json.dumps(form_data), email],
-            )
-        else:
-            # Create new profile
-            await db.execute(
-                """
-                INSERT INTO user_profiles (id, email, phone, profile_data)
-                VALUES (?, ?, ?, ?)
-            """,
-                [profile_id, email, phone, json.dumps(form_data)],
-            )
-
     @staticmethod
-    async def check_in_user(event_id: str, email: str) -> bool:
-        """Check in a user for an event"""
-        # Find registration
-        reg = await db.fetch_one(
-            "SELECT id FROM registrations WHERE event_id = ? AND email = ?",
-            [event_id, email],
-        )
-
-        if not reg:
-            return False
-
-        # Update check-in status
-        await db.execute(
-            """
-            UPDATE registrations
-            SET is_checked_in = 1, checked_in_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """,
-            [reg["id"]],
-        )
+    async def check_in_user(event_id: str, email: str) -> Optional[bool]:
+        """Check in a user for an event from a scan.
 
-        return True
+        Returns True if checked in now, False if already checked in, or None if
+        the email isn't registered for the event.
+        """
+        return await CheckInService.check_in(event_id, email)
 
     @staticmethod
     async def check_in_registration_by_id(
@@ -182,26 +234,62 @@ class RegistrationService:
         if not reg:
             return None
 
-        if check_in:
-            await db.execute(
-                """
-                UPDATE registrations
-                SET is_checked_in = 1, checked_in_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """,
+        await RegistrationService._set_checked_in(registration_id, check_in)
+        return await RegistrationService.get_registration(registration_id)
+
+    @staticmethod
+    async def _set_checked_in(registration_id: str, check_in: bool) -> None:
+        """Update check-in status, keeping facet counts in step when it actually changes"""
+        # Write any buffered scan first, so an undo isn't overtaken by it
+        await checkin_writer.flush()
+        async with db.transaction():
+            if check_in:
+                result = await db.execute(
+                    """
+                    UPDATE registrations
+                    SET is_checked_in = 1, checked_in_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND is_checked_in = 0
+                """,
+                    [registration_id],
+                )
+            else:
+                result = await db.execute(
+                    """
+                    UPDATE registrations
+                    SET is_checked_in = 0, checked_in_at = NULL
+                    WHERE id = ? AND is_checked_in = 1
+                """,
+                    [registration_id],
+                )
+            changed = result.rowcount > 0
+            if changed:
+                await FacetService.record_check_in(registration_id, 1 if check_in else -1)
+        checkin_index.set_checked_in(registration_id, check_in)
+        if changed:
+            await publish_check_ins([registration_id], check_in)
+
+    @staticmethod
+    async def delete_registration(registration_id: str) -> bool:
+        """Delete a registration and its indexed answers"""
+        async with db.transaction():
+            reg = await db.fetch_one(
+                "SELECT event_id, is_checked_in FROM registrations WHERE id = ?",
                 [registration_id],
             )
-        else:
+            if not reg:
+                return False
+
+            await FacetService.remove_registration(
+                registration_id, reg["event_id"], bool(reg["is_checked_in"])
+            )
             await db.execute(
-                """
-                UPDATE registrations
-                SET is_checked_in = 0, checked_in_at = NULL
-                WHERE id = ?
-            """,
+                "DELETE FROM registration_answers WHERE registration_id = ?",
                 [registration_id],
             )
-
-        return await RegistrationService.get_registration(registration_id)
+            await db.execute("DELETE FROM registrations WHERE id = ?", [registration_id])
+        checkin_writer.discard(registration_id)
+        checkin_index.remove(registration_id)
+        return True
 
     @staticmethod
     async def is_user_registered(event_id: str, email: str) -> bool:
@@ -215,8 +303,8 @@ class RegistrationService:
     @staticmethod
     async def _send_confirmation_email(
         event_id: str, email: str, form_data: dict
-    ) -> None:
-        """Send registration confirmation email"""
+    ) -> bool:
+        """Send registration confirmation email (outbox handler; False means retry later)"""
         try:
             # Get full event details for email
             event = await db.fetch_one(
@@ -226,7 +314,7 @@ class RegistrationService:
 
             if not event:
                 logger.warning(f"Event {event_id} not found for confirmation email")
-                return
+                return True  # nothing left to confirm
 
             event_name = event["name"]
 
@@ -250,21 +338,33 @@ class RegistrationService:
             # Get user's name from form_data
             name = form_data.get("name", form_data.get("full_name", "Participant"))
 
-            # Send confirmation email (non-blocking, don't fail registration if email fails)
-            success = email_service.send_registration_confirmation(
-                to_email=email,
-                name=name,
-                event_name=event_name,
-                registration_data=form_data,
-                event_details=event_details,
-                field_labels=field_labels,
+            # The provider call blocks, so run it on a worker thread
+            loop = asyncio.get_running_loop()
+            success = await loop.run_in_executor(
+                None,
+                functools.partial(
+                    email_service.send_registration_confirmation,
+                    to_email=email,
+                    name=name,
+                    event_name=event_name,
+                    registration_data=form_data,
+                    event_details=event_details,
+                    field_labels=field_labels,
+                ),
             )
 
             if success:
                 logger.info(f"Confirmation email sent to {email} for event {event_name}")
             else:
                 logger.warning(f"Failed to send confirmation email to {email}")
+            return success
 
         except Exception as e:
-            # Log error but don't fail the registration
             logger.error(f"Error sending confirmation email to {email}: {str(e)}")
+            return False
+
+
+outbox_dispatcher.register(
+    CONFIRMATION_EMAIL,
+    lambda payload: RegistrationService._send_confirmation_email(**payload),
+)
@@ -6,15 +6,26 @@ Handles bulk messaging to event registrants
 import os
 import re
 import json
+import asyncio
 from typing import List, Dict, Any, Optional
 from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
+from app.core.config import get_settings
 from app.core.database import db
+from app.core.dispatch import TRANSIENT_ERRORS, TokenBucket, dispatch
+from app.core.metrics import provider_call
+from app.services.registration_service import RegistrationService
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+settings = get_settings()
+
+# Shared by every bulk send in the process, so concurrent jobs and successive
+# batches together stay within the sender's Twilio throughput
+send_rate_limiter = TokenBucket(settings.WHATSAPP_MESSAGES_PER_SECOND)
+
 
 class WhatsAppService:
     """Service for WhatsApp messaging via Twilio"""
@@ -64,11 +75,12 @@ class WhatsAppService:
             formatted_number = self.format_phone_number(to_number)
 
             # Send message via Twilio
-            twilio_message = self.client.messages.create(
-                from_=self.whatsapp_number,
-                body=message,
-                to=formatted_number
-            )
+            with provider_call("twilio", "send_message"):
+                twilio_message = self.client.messages.create(
+                    from_=self.whatsapp_number,
+                    body=message,
+                    to=formatted_number
+                )
 
             return {
                 "success": True,
@@ -84,7 +96,9 @@ class WhatsAppService:
                 "message_sid": None,
                 "status": "failed",
                 "to": to_number,
-                "error": str(e)
+                "error": str(e),
+                # Rate limited or Twilio-side failure: worth another attempt
+                "retryable": e.status == 429 or (e.status or 0) >= 500
             }
         except Exception as e:
             return {
@@ -92,8 +106,104 @@ class WhatsAppService:
                 "message_sid": None,
                 "status": "failed",
                 "to": to_number,
-                "error": f"Unexpected error: {str(e)}"
+                "error": f"Unexpected error: {str(e)}",
+                # Network failures only; anything else won't succeed on retry
+                "retryable": isinstance(e, TRANSIENT_ERRORS)
+            }
+
+    async def send_message_async(self, to_number: str, message: str) -> Dict[str, Any]:
+        """Send a single WhatsApp message on a worker thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.send_message, to_number, message)
+
+    @staticmethod
+    async def get_target_registrations(
+        event_id: str,
+        filter_field: Optional[str] = None,
+        filter_value: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Registrations of an event that a bulk send should reach, newest first"""
+        query = """
+            SELECT id, email, phone, form_data
+            FROM registrations
+            WHERE event_id = ?
+        """
+        params = [event_id]
+
+        # Filter registrations if filter_field and filter_value are provided
+        if filter_field and filter_value:
+            query += """
+            AND id IN (
+                SELECT registration_id FROM registration_answers
+                WHERE event_id = ? AND field_name = ? AND value = ?
+            )
+            """
+            params += [event_id, filter_field, filter_value]
+
+        return await db.fetch_all(query + " ORDER BY created_at DESC", params)
+
+    @staticmethod
+    def personalize_message(
+        message: str,
+        form_data: Dict[str, Any],
+        template_variables: Optional[Dict[str, str]] = None
+    ) -> str:
+        """Substitute global template variables, then the registrant's own answers"""
+        personalized_message = message
+
+        # First apply global template variables
+        if template_variables:
+            for var_name, var_value in template_variables.items():
+                personalized_message = personalized_message.replace(f"{{{{{var_name}}}}}", str(var_value))
+
+        # Then apply per-user variables from form_data
+        for field_name, field_value in form_data.items():
+            personalized_message = personalized_message.replace(f"{{{{{field_name}}}}}", str(field_value))
+
+        return personalized_message
+
+    async def send_to_registrations(
+        self,
+        registrations: List[Dict[str, Any]],
+        message: str,
+        template_variables: Optional[Dict[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Personalize and send a message to each registration concurrently
+
+        Returns:
+            One result per registration, in the same order
+        """
+        # Personalize every message up front, then send them concurrently
+        outgoing = []
+        for reg in registrations:
+            form_data = json.loads(reg.get('form_data', '{}'))
+            outgoing.append((
+                reg.get('phone', ''),
+                self.personalize_message(message, form_data, template_variables)
+            ))
+
+        send_results = await dispatch(
+            outgoing,
+            lambda item: self.send_message_async(*item),
+            concurrency=settings.WHATSAPP_SEND_CONCURRENCY,
+            rate_limiter=send_rate_limiter,
+            max_retries=settings.WHATSAPP_SEND_MAX_RETRIES,
+        )
+
+        return [
+            {
+                "registration_id": reg['id'],
+                "email": reg['email'],
+                "phone": phone,
+                # A send that raised only carries success/error
+                "success": result.get('success', False),
+                "status": result.get('status', 'failed'),
+                "message_sid": result.get('message_sid'),
+                "error": result.get('error')
             }
+            for reg, (phone, _), result in zip(registrations, outgoing, send_results)
+        ]
 
     async def send_bulk_messages(
         self,
@@ -116,16 +226,7 @@ class WhatsAppService:
         Returns:
             Dict with summary of sent messages (success, failed, total)
         """
-        # Get all registrations for the event
-        registrations = await db.fetch_all(
-            """
-            SELECT id, email, phone, form_data
-            FROM registrations
-            WHERE event_id = ?
-            ORDER BY created_at DESC
-            """,
-            [event_id]
-        )
+        registrations = await self.get_target_registrations(event_id, filter_field, filter_value)
 
         if not registrations:
             return {
@@ -134,76 +235,27 @@ class WhatsAppService:
                 "sent": 0,
                 "failed": 0,
                 "results": [],
-                "error": "No registrations found for this event"
+                "error": self.no_recipients_error(filter_field, filter_value)
             }
 
-        # Filter registrations if filter_field and filter_value are provided
-        if filter_field and filter_value:
-            filtered_registrations = []
-            for reg in registrations:
-                form_data = json.loads(reg.get('form_data', '{}'))
-                if form_data.get(filter_field) == filter_value:
-                    filtered_registrations.append(reg)
-            registrations = filtered_registrations
-
-        if not registrations:
-            return {
-                "success": False,
-                "total": 0,
-                "sent": 0,
-                "failed": 0,
-                "results": [],
-                "error": f"No registrations found matching filter: {filter_field}={filter_value}"
-            }
-
-        # Send messages to all filtered registrants
-        results = []
-        sent_count = 0
-        failed_count = 0
-
-        for reg in registrations:
-            phone = reg.get('phone', '')
-            form_data = json.loads(reg.get('form_data', '{}'))
-
-            # Prepare message with variable substitution
-            personalized_message = message
-
-            # First apply global template variables
-            if template_variables:
-                for var_name, var_value in template_variables.items():
-                    personalized_message = personalized_message.replace(f"{{{{{var_name}}}}}", str(var_value))
-
-            # Then apply per-user variables from form_data
-            for field_name, field_value in form_data.items():
-                personalized_message = personalized_message.replace(f"{{{{{field_name}}}}}", str(field_value))
-
-            # Send message
-            result = self.send_message(phone, personalized_message)
-
-            # Track result
-            if result['success']:
-                sent_count += 1
-            else:
-                failed_count += 1
-
-            # Store result with registration info
-            results.append({
-                "registration_id": reg['id'],
-                "email": reg['email'],
-                "phone": phone,
-                "status": result['status'],
-                "message_sid": result['message_sid'],
-                "error": result['error']
-            })
+        results = await self.send_to_registrations(registrations, message, template_variables)
+        sent_count = sum(1 for result in results if result['success'])
 
         return {
             "success": True,
             "total": len(registrations),
             "sent": sent_count,
-            "failed": failed_count,
+            "failed": len(results) - sent_count,
             "results": results
         }
 
+    @staticmethod
+    def no_recipients_error(filter_field: Optional[str] = None, filter_value: Optional[str] = None) -> str:
+        """Error message used when a bulk send matches nobody"""
+        if filter_field and filter_value:
+            return f"No registrations found matching filter: {filter_field}={filter_value}"
+        return "No registrations found for this event"
+
     async def get_event_registrants_count(self, event_id: str) -> int:
         """Get count of registrants for an event"""
         result = await db.fetch_one(
@@ -214,20 +266,4 @@ class WhatsAppService:
 
     async def get_distinct_field_values(self, event_id: str, field_name: str) -> List[str]:
         """Get distinct values for a field from all registrations of an event"""
-        registrations = await db.fetch_all(
-            """
-            SELECT form_data
-            FROM registrations
-            WHERE event_id = ?
-            """,
-            [event_id]
-        )
-
-        distinct_values = set()
-        for reg in registrations:
-            form_data = json.loads(reg.get('form_data', '{}'))
-            value = form_data.get(field_name)
-            if value:
-                distinct_values.add(str(value))
-
-        return sorted(list(distinct_values))
+        return await RegistrationService.get_answer_values(event_id, field_name)
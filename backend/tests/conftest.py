@@ -5,9 +5,12 @@ import libsql
 from fastapi.testclient import TestClient
 from httpx import AsyncClient
 from app.main import app
-from app.core.database import db
+from app.core.database import db, Database
+from app.core.cache import cache_store
+from app.core.connection_pool import ConnectionPool
 from app.core.schema_manager import SchemaManager
 from app.core.auth import clerk_auth, AuthenticatedUser
+from app.services.checkin_service import checkin_index
 
 # Set test environment
 os.environ["TESTING"] = "1"
@@ -38,10 +41,16 @@ def test_db_connection():
 
 
 @pytest.fixture
-async def test_db(test_db_connection, monkeypatch):
+async def test_db(test_db_connection):
     """Provide test database with clean state for each test"""
     # Clear all tables before each test
     tables = [
+        "job_recipients",
+        "jobs",
+        "outbox",
+        "cache_invalidations",
+        "registration_facets",
+        "registration_answers",
         "registrations",
         "event_fields",
         "qr_codes",
@@ -56,6 +65,11 @@ async def test_db(test_db_connection, monkeypatch):
 
     test_db_connection.commit()
 
+    # Rows were deleted behind the services' backs, so drop anything cached
+    # (in this process only: there are no other workers to tell)
+    await cache_store.clear_all()
+    checkin_index.clear()
+
     # Insert default branding settings (required for branding API tests)
     test_db_connection.execute("""
         INSERT INTO branding_settings (id, site_title, site_headline, logo_url, text_style, theme, updated_at)
@@ -63,45 +77,15 @@ async def test_db(test_db_connection, monkeypatch):
     """)
     test_db_connection.commit()
 
-    # Override the global db instance
-    original_conn = db.conn
-    db.conn = test_db_connection
-
-    # Mock execute and fetch methods to avoid sync issues
-    async def mock_execute(query, params=None):
-        if params:
-            result = test_db_connection.execute(query, params)
-        else:
-            result = test_db_connection.execute(query)
-        test_db_connection.commit()
-        return result
-
-    async def mock_fetch_all(query, params=None):
-        if params:
-            cursor = test_db_connection.execute(query, params)
-        else:
-            cursor = test_db_connection.execute(query)
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
-        rows = cursor.fetchall()
-        return [dict(zip(columns, row)) for row in rows] if rows else []
-
-    async def mock_fetch_one(query, params=None):
-        if params:
-            cursor = test_db_connection.execute(query, params)
-        else:
-            cursor = test_db_connection.execute(query)
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
-        row = cursor.fetchone()
-        return dict(zip(columns, row)) if row else None
-
-    monkeypatch.setattr(db, "execute", mock_execute)
-    monkeypatch.setattr(db, "fetch_all", mock_fetch_all)
-    monkeypatch.setattr(db, "fetch_one", mock_fetch_one)
+    # Point the global db instance at a pool over the test database
+    original_pool = db.pool
+    db.pool = ConnectionPool(Database.local_connection_factory(TEST_DB_PATH), min_size=1, max_size=4)
 
     yield test_db_connection
 
-    # Restore original connection
-    db.conn = original_conn
+    # Restore original pool
+    await db.pool.close()
+    db.pool = original_pool
 
 
 @pytest.fixture
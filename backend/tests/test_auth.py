@@ -0,0 +1,103 @@
+"""Tests for Clerk token verification caching"""
+import time
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jwt import PyJWKSet
+from jwt.algorithms import RSAAlgorithm
+from unittest.mock import Mock
+from app.core import auth
+from app.core.auth import JWKSCache, VerifiedTokenCache, clerk_auth
+
+
+def _signing_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+    return private_key, jwk
+
+
+def _token(private_key, kid, exp_in=3600):
+    claims = {"sub": "user_1", "sid": "sess_1", "exp": int(time.time()) + exp_in}
+    return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+def _credentials(token):
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+@pytest.fixture
+def clerk_keys(monkeypatch):
+    """Fake Clerk JWKS endpoint serving whatever keys are in the returned list"""
+    keys = []
+    client = Mock()
+    client.get_jwk_set.side_effect = lambda refresh=False: PyJWKSet.from_dict({"keys": list(keys)})
+    monkeypatch.setattr(auth, "jwks_cache", JWKSCache(client, refresh_interval=600, min_refresh_interval=0))
+    monkeypatch.setattr(auth, "token_cache", VerifiedTokenCache(max_entries=10))
+    return keys, client
+
+
+class TestClerkAuth:
+    """Test the JWKS cache and the verified-token cache"""
+
+    async def test_token_verified_once_then_cached(self, clerk_keys, monkeypatch):
+        """Test that repeated requests with one token skip key lookup and RS256 verification"""
+        keys, client = clerk_keys
+        private_key, jwk = _signing_key("kid-1")
+        keys.append(jwk)
+        token = _token(private_key, "kid-1")
+
+        decode = Mock(wraps=jwt.decode)
+        monkeypatch.setattr(auth.jwt, "decode", decode)
+
+        for _ in range(3):
+            user = await clerk_auth(_credentials(token))
+            assert user.user_id == "user_1"
+
+        assert decode.call_count == 1
+        assert client.get_jwk_set.call_count == 1
+        assert auth.token_cache.stats == {"hits": 2, "misses": 1}
+
+    async def test_unknown_kid_refreshes_keys(self, clerk_keys):
+        """Test that a rotated signing key is picked up without a restart"""
+        keys, client = clerk_keys
+        old_key, old_jwk = _signing_key("kid-old")
+        keys.append(old_jwk)
+        await auth.jwks_cache.refresh()
+
+        new_key, new_jwk = _signing_key("kid-new")
+        keys.append(new_jwk)
+        user = await clerk_auth(_credentials(_token(new_key, "kid-new")))
+
+        assert user.session_id == "sess_1"
+        assert client.get_jwk_set.call_count == 2
+
+    async def test_expired_and_forged_tokens_rejected(self, clerk_keys):
+        """Test that caching never lets an invalid token through"""
+        keys, _ = clerk_keys
+        private_key, jwk = _signing_key("kid-1")
+        keys.append(jwk)
+
+        with pytest.raises(HTTPException) as exc:
+            await clerk_auth(_credentials(_token(private_key, "kid-1", exp_in=-10)))
+        assert exc.value.detail == "Token has expired"
+
+        forger, _ = _signing_key("kid-1")
+        with pytest.raises(HTTPException) as exc:
+            await clerk_auth(_credentials(_token(forger, "kid-1")))
+        assert exc.value.status_code == 401
+        assert len(auth.token_cache) == 0
+
+    def test_cached_claims_expire_with_token(self):
+        """Test that a cached token is dropped at its exp"""
+        cache = VerifiedTokenCache(max_entries=10)
+        cache.set("live", {"sub": "a", "exp": time.time() + 60})
+        cache.set("dead", {"sub": "b", "exp": time.time() - 1})
+        cache.set("no-exp", {"sub": "c"})
+
+        assert cache.get("live")["sub"] == "a"
+        assert cache.get("dead") is None
+        assert cache.get("no-exp") is None
+        assert len(cache) == 1
@@ -0,0 +1,365 @@
+"""Tests for the in-memory cache store"""
+import asyncio
+import pytest
+from app.core.cache import CacheStore
+
+
+class TestCacheStore:
+    """Test LRU eviction, memory bounds, expiry and stats"""
+
+    async def test_lru_eviction_by_entry_count(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = CacheStore(max_entries=2)
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        assert await cache.get("a") == 1  # "b" is now least recently used
+        await cache.set("c", 3)
+
+        assert await cache.get("b") is None
+        assert await cache.get("a") == 1
+        assert await cache.get("c") == 3
+        assert cache.get_stats()["evictions"] == 1
+
+    async def test_eviction_by_bytes(self):
+        """Test that the byte budget is enforced and tracked"""
+        cache = CacheStore(max_bytes=100)
+        await cache.set("a", "x" * 40)
+        await cache.set("b", "y" * 40)
+        await cache.set("c", "z" * 40)
+
+        stats = cache.get_stats()
+        assert stats["total_keys"] == 2
+        assert stats["bytes"] <= 100
+        assert await cache.get("a") is None
+
+        # Values that can never fit are not stored at all
+        await cache.set("huge", "h" * 500)
+        assert await cache.get("huge") is None
+        assert cache.get_stats()["rejected"] == 1
+
+        await cache.clear_all()
+        assert cache.get_stats()["bytes"] == 0
+
+    async def test_sweeper_purges_unread_expired_entries(self):
+        """Test that expired keys are removed even if never read again"""
+        cache = CacheStore(sweep_interval=0.01)
+        await cache.set("short", 1, ttl_seconds=0)
+        await cache.set("long", 2, ttl_seconds=60)
+
+        cache.start_sweeper()
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            await cache.stop_sweeper()
+
+        stats = cache.get_stats()
+        assert stats["keys"] == ["long"]
+        assert stats["expirations"] == 1
+
+    async def test_hit_miss_counters(self):
+        """Test hit/miss accounting"""
+        cache = CacheStore()
+        await cache.set("a", {"name": "MagPie"})
+        await cache.get("a")
+        await cache.get("missing")
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+
+    async def test_invalidate_tags_drops_only_dependent_entries(self):
+        """Test the tag -> keys index"""
+        cache = CacheStore()
+        await cache.set("event:1", "one", tags=["event:1"])
+        await cache.set("event_fields:1", ["name"], tags=["event:1"])
+        await cache.set("event_active", "one", tags=["events:active", "event:1"])
+        await cache.set("event:2", "two", tags=["event:2"])
+
+        assert await cache.invalidate_tags("event:1") == 3
+        assert cache.get_stats()["keys"] == ["event:2"]
+        assert cache.get_stats()["tags"] == 1
+
+        # Entries leaving by eviction or delete leave the index too
+        await cache.delete("event:2")
+        assert cache.get_stats()["tags"] == 0
+        assert await cache.invalidate_tags("event:2") == 0
+
+    async def test_tags_derived_from_loaded_value(self):
+        """Test that get_or_set can tag an entry from its value"""
+        cache = CacheStore()
+
+        async def loader():
+            return {"id": "42"}
+
+        await cache.get_or_set("event_active", loader, tags=lambda event: [f"event:{event['id']}"])
+        assert await cache.invalidate_tags("event:42") == 1
+        assert await cache.get("event_active") is None
+
+
+class TestCacheLoading:
+    """Test single-flight loading and stale-while-revalidate"""
+
+    async def test_concurrent_misses_share_one_load(self):
+        """Test that only one coroutine runs the loader for a missing key"""
+        cache = CacheStore()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"title": "MagPie"}
+
+        results = await asyncio.gather(*(cache.get_or_set("branding", loader) for _ in range(20)))
+
+        assert calls == 1
+        assert all(r == {"title": "MagPie"} for r in results)
+        assert cache.get_stats()["coalesced"] == 19
+
+    async def test_loader_errors_reach_every_waiter(self):
+        """Test that a failed load is not cached and is raised to all waiters"""
+        cache = CacheStore()
+
+        async def loader():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("db down")
+
+        results = await asyncio.gather(
+            *(cache.get_or_set("k", loader) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert await cache.get("k") is None
+
+    async def test_stale_value_served_while_refreshing(self):
+        """Test stale-while-revalidate"""
+        cache = CacheStore()
+        await cache.set("k", "old", ttl_seconds=0, stale_ttl=60)
+        await asyncio.sleep(0.001)
+
+        async def loader():
+            return "new"
+
+        assert await cache.get_or_set("k", loader, ttl_seconds=60, stale_ttl=60) == "old"
+        await asyncio.sleep(0)  # let the background refresh run
+        await asyncio.sleep(0)
+        assert await cache.get_or_set("k", loader) == "new"
+        assert cache.get_stats()["refreshes"] == 1
+
+    async def test_refresh_started_in_transaction_runs_outside_it(self, test_db):
+        """Test that a background refresh doesn't inherit the caller's transaction connection"""
+        from app.core.database import db
+
+        cache = CacheStore()
+        await cache.set("k", "old", ttl_seconds=0, stale_ttl=60)
+        await asyncio.sleep(0.001)
+        seen = []
+
+        async def loader():
+            seen.append(db.in_transaction())
+            return "new"
+
+        async with db.transaction():
+            assert await cache.get_or_set("k", loader, ttl_seconds=60, stale_ttl=60) == "old"
+        await asyncio.gather(*cache._background)
+        assert seen == [False]
+
+    async def test_invalidation_during_load_is_not_overwritten(self):
+        """Test that a value loaded before an invalidation isn't stored"""
+        cache = CacheStore()
+
+        async def loader():
+            await cache.delete("k")  # e.g. an update lands mid-load
+            return "outdated"
+
+        assert await cache.get_or_set("k", loader) == "outdated"
+        assert await cache.get("k") is None
+
+
+class TestCachedDecorator:
+    """Test the @cached read-through decorator"""
+
+    async def test_results_cached_per_key_and_invalidated(self):
+        """Test caching by key function and explicit invalidation"""
+        from app.core.cache import cached
+
+        calls = []
+
+        @cached("test_item", ttl=60, key=lambda item_id, verbose=False: item_id)
+        async def load_item(item_id, verbose=False):
+            calls.append(item_id)
+            return {"id": item_id}
+
+        assert await load_item("a") == {"id": "a"}
+        assert await load_item("a", verbose=True) == {"id": "a"}
+        assert await load_item("b") == {"id": "b"}
+        assert calls == ["a", "b"]
+        assert load_item.cache_key("a") == "test_item:a"
+
+        await load_item.invalidate("a")
+        await load_item("a")
+        assert calls == ["a", "b", "a"]
+
+    async def test_tags_from_arguments_and_result(self):
+        """Test that the tags callable receives the result and the call arguments"""
+        from app.core.cache import cached, invalidate_tags
+
+        calls = []
+
+        @cached("test_owner", ttl=60, tags=lambda item, item_id: [f"owner:{item['owner']}"])
+        async def load_owned(item_id):
+            calls.append(item_id)
+            return {"id": item_id, "owner": "x"}
+
+        await load_owned("a")
+        await load_owned("b")
+        assert await invalidate_tags("owner:x") == 2
+        await load_owned("a")
+        assert calls == ["a", "b", "a"]
+
+
+class TestEventCaching:
+    """Test that cached event reads are invalidated by event writes"""
+
+    def test_active_event_reflects_updates(self, client, sample_event_data):
+        """Test update, field changes and toggling invalidate the active event"""
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        assert client.get("/api/events/active").json()["name"] == "Test Event"
+
+        client.patch(f"/api/events/{event_id}/", json={"name": "Renamed"})
+        assert client.get("/api/events/active").json()["name"] == "Renamed"
+        assert client.get(f"/api/events/{event_id}").json()["name"] == "Renamed"
+
+        client.post(f"/api/events/{event_id}/fields/", json={
+            "field_name": "college",
+            "field_type": "text",
+            "field_label": "College",
+            "is_required": False,
+        })
+        assert [f["field_name"] for f in client.get("/api/events/active").json()["fields"]] == ["college"]
+        assert len(client.get(f"/api/events/{event_id}/fields/").json()) == 1
+
+        client.post(f"/api/events/{event_id}/toggle/")
+        assert client.get(f"/api/events/{event_id}").json()["is_active"] is False
+        assert client.get("/api/events/active").status_code == 404
+
+    def test_activating_event_refreshes_previously_active_one(self, client, sample_event_data):
+        """Test that toggling one event on refreshes the cached copy of the one it replaced"""
+        first = client.post("/api/events/", json=sample_event_data).json()["id"]
+        second = client.post("/api/events/", json={**sample_event_data, "is_active": False}).json()["id"]
+        assert client.get(f"/api/events/{first}").json()["is_active"] is True
+
+        client.post(f"/api/events/{second}/toggle/")
+        assert client.get(f"/api/events/{first}").json()["is_active"] is False
+        assert client.get("/api/events/active").json()["id"] == second
+
+
+class TestInvalidationBus:
+    """Test propagation of invalidations between workers"""
+
+    async def test_database_backend_delivers_to_other_workers(self, test_db):
+        """Test that a worker applies another worker's invalidations, not its own"""
+        from app.core.cache_bus import DatabaseInvalidationBackend, InvalidationBus
+
+        received = {"a": [], "b": []}
+        workers = {}
+        for name in received:
+            backend = DatabaseInvalidationBackend(poll_interval=60)
+            bus = InvalidationBus(backend)
+
+            async def listener(tags, name=name):
+                received[name].append(tags)
+
+            bus.subscribe(listener)
+            await bus.start()
+            workers[name] = (bus, backend)
+
+        try:
+            await workers["a"][0].publish(["event:1", "events:active"])
+            assert await workers["b"][1].poll() == 1
+            assert await workers["a"][1].poll() == 0
+            assert await workers["b"][1].poll() == 0
+        finally:
+            for bus, _ in workers.values():
+                await bus.stop()
+
+        assert received == {"a": [], "b": [["event:1", "events:active"]]}
+
+    async def test_database_backend_backs_off_when_idle(self, test_db):
+        """Test that empty polls stretch the interval and a publish resets it"""
+        from app.core.cache_bus import DatabaseInvalidationBackend, InvalidationBackend
+
+        with pytest.raises(TypeError):
+            InvalidationBackend()
+
+        backend = DatabaseInvalidationBackend(poll_interval=1, max_poll_interval=4)
+        await backend.start("me", lambda tags: None)
+        try:
+            delays = []
+            for _ in range(4):
+                await backend.poll()
+                delays.append(backend.delay)
+            assert delays == [2, 4, 4, 4]
+
+            await backend.publish("other", ["branding"])
+            assert backend.delay == 1
+        finally:
+            await backend.stop()
+
+    async def test_remote_invalidation_clears_local_cache(self, test_db):
+        """Test that tags published elsewhere drop the matching entries here"""
+        from app.core.cache import cache_store
+        from app.core.cache_bus import DatabaseInvalidationBackend, InvalidationBus, invalidation_bus
+
+        backend = DatabaseInvalidationBackend(poll_interval=60)
+        await backend.start(invalidation_bus.origin, invalidation_bus._deliver)
+        try:
+            await cache_store.set("branding:default", {"site_title": "Old"}, tags=["branding"])
+            await InvalidationBus(backend).publish(["branding"])
+            await backend.poll()
+        finally:
+            await backend.stop()
+
+        assert await cache_store.get("branding:default") is None
+
+    async def test_key_and_prefix_invalidations_reach_other_workers(self, test_db, monkeypatch):
+        """Test that key, prefix and clear-all invalidations are published and applied like tags"""
+        from app.core.cache import (
+            CLEAR_MESSAGE, KEY_MESSAGE, PREFIX_MESSAGE, cache_store, clear_all_cache,
+            invalidate_cache, invalidate_cache_pattern,
+        )
+        from app.core.cache_bus import DatabaseInvalidationBackend, InvalidationBackend, InvalidationBus, invalidation_bus
+
+        class RecordingBackend(InvalidationBackend):
+            def __init__(self):
+                self.published = []
+
+            async def publish(self, origin, tags):
+                self.published.extend(tags)
+
+        recording = RecordingBackend()
+        monkeypatch.setattr(invalidation_bus, "backend", recording)
+        await invalidate_cache("event:1")
+        await invalidate_cache_pattern("registrations:")
+        await clear_all_cache()
+        assert recording.published == [KEY_MESSAGE + "event:1", PREFIX_MESSAGE + "registrations:", CLEAR_MESSAGE]
+        monkeypatch.undo()
+
+        backend = DatabaseInvalidationBackend(poll_interval=60)
+        await backend.start(invalidation_bus.origin, invalidation_bus._deliver)
+        try:
+            for key in ("event:1", "event:2", "registrations:1", "registrations:2"):
+                await cache_store.set(key, key)
+            other_worker = InvalidationBus(backend)
+            await other_worker.publish([KEY_MESSAGE + "event:1", PREFIX_MESSAGE + "registrations:"])
+            await backend.poll()
+            assert [await cache_store.get(key) for key in ("event:1", "event:2", "registrations:1")] == [
+                None, "event:2", None,
+            ]
+
+            await other_worker.publish([CLEAR_MESSAGE])
+            await backend.poll()
+            assert await cache_store.get("event:2") is None
+        finally:
+            await backend.stop()
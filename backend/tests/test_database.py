@@ -1,9 +1,14 @@
 """Tests for database functionality including local SQLite"""
+import asyncio
+import json
 import os
 import pytest
 import libsql
+from app.core.form_answers import hot_field_column, json_path
 from app.core.schema_manager import SchemaManager
 from app.core.config import Settings
+from app.core.connection_pool import ConnectionPool, PoolTimeoutError
+from app.core.database import Database
 
 
 class TestDatabase:
@@ -74,4 +79,400 @@ class TestDatabase:
         monkeypatch.setenv("TWILIO_WHATSAPP_NUMBER", "")
         # Force reload settings without .env file
         settings = Settings(_env_file=None)
-        assert settings.IS_LOCAL is False
\ No newline at end of file
+        assert settings.IS_LOCAL is False
+
+
+class _BrokenConnection:
+    """Stand-in for a connection whose remote stream has gone away"""
+
+    def execute(self, *args):
+        raise ValueError("stream closed")
+
+    def close(self):
+        pass
+
+
+class TestConnectionPool:
+    """Test the connection pool and the database layer built on it"""
+
+    @pytest.fixture
+    def pool_db_path(self, tmp_path):
+        return str(tmp_path / "pool_test.db")
+
+    async def test_open_creates_min_size_connections(self, pool_db_path):
+        """Test that opening the pool pre-creates min_size connections"""
+        pool = ConnectionPool(lambda: libsql.connect(pool_db_path), min_size=2, max_size=4)
+        await pool.open()
+
+        stats = pool.get_stats()
+        assert stats["size"] == 2
+        assert stats["idle"] == 2
+
+        await pool.close()
+
+    async def test_acquire_waits_when_pool_is_exhausted(self, pool_db_path):
+        """Test that checkouts beyond max_size wait for a release"""
+        pool = ConnectionPool(lambda: libsql.connect(pool_db_path), min_size=0, max_size=2)
+        first = await pool.acquire()
+        second = await pool.acquire()
+
+        waiter = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        assert pool.get_stats()["waiting"] == 1
+
+        pool.release(first)
+        third = await asyncio.wait_for(waiter, 1)
+        assert third is first
+        assert pool.get_stats()["size"] == 2
+
+        pool.release(second)
+        pool.release(third)
+        await pool.close()
+
+    async def test_acquire_times_out(self, pool_db_path):
+        """Test that acquire raises once the timeout elapses"""
+        pool = ConnectionPool(
+            lambda: libsql.connect(pool_db_path), min_size=0, max_size=1, acquire_timeout=0.05
+        )
+        conn = await pool.acquire()
+
+        with pytest.raises(PoolTimeoutError):
+            await pool.acquire()
+
+        pool.release(conn)
+        await pool.close()
+
+    async def test_idle_connections_are_evicted(self, pool_db_path):
+        """Test that idle connections above min_size are closed"""
+        pool = ConnectionPool(
+            lambda: libsql.connect(pool_db_path), min_size=1, max_size=3, idle_timeout=0.01
+        )
+        conns = [await pool.acquire() for _ in range(3)]
+        for conn in conns:
+            pool.release(conn)
+        assert pool.get_stats()["size"] == 3
+
+        await asyncio.sleep(0.05)
+        conn = await pool.acquire()
+        assert pool.get_stats()["size"] == 1
+
+        pool.release(conn)
+        await pool.close()
+
+    async def test_unhealthy_connection_is_replaced(self, pool_db_path):
+        """Test that a connection failing its health check is discarded"""
+        pool = ConnectionPool(
+            lambda: libsql.connect(pool_db_path), min_size=0, max_size=2, health_check_interval=0
+        )
+        conn = await pool.acquire()
+        conn.raw = _BrokenConnection()
+        pool.release(conn)
+
+        fresh = await pool.acquire()
+        assert fresh is not conn
+        assert pool.get_stats()["health_check_failures"] == 1
+        assert (await pool.run(lambda: fresh.raw.execute("SELECT 1").fetchall())) == [(1,)]
+
+        pool.release(fresh)
+        await pool.close()
+
+    async def test_database_queries_run_through_pool(self, pool_db_path):
+        """Test that Database keeps its query API on top of the pool"""
+        database = Database()
+        database.pool = ConnectionPool(lambda: libsql.connect(pool_db_path), min_size=1, max_size=4)
+
+        await database.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        result = await database.execute("INSERT INTO items (name) VALUES (?)", ["first"])
+        assert result.rowcount == 1
+
+        rows = await asyncio.gather(
+            *[database.fetch_one("SELECT name FROM items WHERE id = ?", [1]) for _ in range(8)]
+        )
+        assert all(row == {"name": "first"} for row in rows)
+        assert database.pool.get_stats()["size"] <= 4
+        assert await database.fetch_all("SELECT * FROM items") == [{"id": 1, "name": "first"}]
+
+        await database.close()
+
+
+class TestTransactions:
+    """Test context-scoped transactions on pooled connections"""
+
+    @pytest.fixture
+    async def database(self, tmp_path):
+        database = Database()
+        database.pool = ConnectionPool(
+            Database.local_connection_factory(str(tmp_path / "tx_test.db")), min_size=1, max_size=4
+        )
+        await database.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        yield database
+        await database.close()
+
+    async def test_transaction_commits_together(self, database):
+        """Test that statements in a transaction are committed on exit"""
+        async with database.transaction():
+            assert database.in_transaction()
+            await database.execute("INSERT INTO items (name) VALUES (?)", ["a"])
+            await database.executemany("INSERT INTO items (name) VALUES (?)", [["b"], ["c"]])
+
+        assert not database.in_transaction()
+        rows = await database.fetch_all("SELECT name FROM items ORDER BY id")
+        assert [row["name"] for row in rows] == ["a", "b", "c"]
+
+    async def test_transaction_rolls_back_on_error(self, database):
+        """Test that an exception rolls back every statement in the block"""
+        with pytest.raises(RuntimeError):
+            async with database.transaction():
+                await database.execute("INSERT INTO items (name) VALUES (?)", ["a"])
+                raise RuntimeError("boom")
+
+        assert await database.fetch_all("SELECT * FROM items") == []
+
+    async def test_nested_transaction_uses_savepoint(self, database):
+        """Test that a failing nested block only undoes its own statements"""
+        async with database.transaction():
+            await database.execute("INSERT INTO items (name) VALUES (?)", ["outer"])
+            with pytest.raises(RuntimeError):
+                async with database.transaction():
+                    await database.execute("INSERT INTO items (name) VALUES (?)", ["inner"])
+                    raise RuntimeError("boom")
+            await database.execute("INSERT INTO items (name) VALUES (?)", ["after"])
+
+        rows = await database.fetch_all("SELECT name FROM items ORDER BY id")
+        assert [row["name"] for row in rows] == ["outer", "after"]
+
+    async def test_concurrent_writer_is_not_pulled_into_transaction(self, database):
+        """Test that another task's writes commit independently of an open transaction"""
+        inside = asyncio.Event()
+
+        async def failing_transaction():
+            async with database.transaction():
+                await database.execute("INSERT INTO items (name) VALUES (?)", ["rolled back"])
+                inside.set()
+                await asyncio.sleep(0.05)
+                raise RuntimeError("boom")
+
+        async def independent_write():
+            await inside.wait()
+            assert not database.in_transaction()
+            await database.execute("INSERT INTO items (name) VALUES (?)", ["committed"])
+
+        results = await asyncio.gather(
+            failing_transaction(), independent_write(), return_exceptions=True
+        )
+
+        assert isinstance(results[0], RuntimeError)
+        rows = await database.fetch_all("SELECT name FROM items")
+        assert [row["name"] for row in rows] == ["committed"]
+
+
+class TestSchemaBackfill:
+    """Test backfills that run when a derived table is first created"""
+
+    def test_registration_answers_backfilled(self, tmp_path):
+        """Test that answers of existing registrations are indexed"""
+        conn = libsql.connect(str(tmp_path / "backfill.db"))
+        SchemaManager(conn).sync_schema()
+        conn.execute(
+            "INSERT INTO events (id, name, date, time, venue) VALUES ('e1', 'Event', '2025-01-01', '10:00', 'Hall')"
+        )
+        conn.execute(
+            """
+            INSERT INTO registrations (id, event_id, email, phone, form_data) VALUES
+            ('r1', 'e1', 'a@example.com', '1', '{"college": "MIT", "year": 3, "notes": ""}'),
+            ('r2', 'e1', 'b@example.com', '2', '{"college": "IIT"}')
+            """
+        )
+        # Simulate a database from before the tables existed
+        conn.execute("DROP TABLE registration_answers")
+        conn.execute("DROP TABLE registration_facets")
+        conn.commit()
+
+        SchemaManager(conn).sync_schema()
+
+        rows = conn.execute(
+            "SELECT registration_id, field_name, value FROM registration_answers ORDER BY registration_id, field_name"
+        ).fetchall()
+        assert [tuple(row) for row in rows] == [
+            ("r1", "college", "MIT"),
+            ("r1", "year", "3"),
+            ("r2", "college", "IIT"),
+        ]
+        facets = conn.execute(
+            "SELECT field_name, value, count FROM registration_facets ORDER BY field_name, value"
+        ).fetchall()
+        assert [tuple(row) for row in facets] == [
+            ("college", "IIT", 1),
+            ("college", "MIT", 1),
+            ("year", "3", 1),
+        ]
+        conn.close()
+
+    def test_hot_field_gets_indexed_generated_column(self, tmp_path):
+        """Test that a field declared hot is filterable through an index on registrations"""
+        conn = libsql.connect(str(tmp_path / "hot.db"))
+        SchemaManager(conn).sync_schema()
+        conn.execute(
+            "INSERT INTO events (id, name, date, time, venue) VALUES ('e1', 'Event', '2025-01-01', '10:00', 'Hall')"
+        )
+        conn.execute(
+            """
+            INSERT INTO event_fields (id, event_id, field_name, field_type, field_label, is_indexed)
+            VALUES ('f1', 'e1', 'Where''s college?', 'text', 'College', 1)
+            """
+        )
+        conn.execute(
+            """
+            INSERT INTO registrations (id, event_id, email, phone, form_data) VALUES
+            ('r1', 'e1', 'a@example.com', '1', '{"Where''s college?": "MIT"}'),
+            ('r2', 'e1', 'b@example.com', '2', '{"Where''s college?": "IIT"}')
+            """
+        )
+        conn.commit()
+
+        # Hot columns are (re)created on every sync, e.g. for a fresh worker
+        manager = SchemaManager(conn)
+        manager.sync_schema()
+        column = hot_field_column("Where's college?")
+        assert manager.get_generated_columns('registrations') == [column]
+
+        rows = conn.execute(
+            f"SELECT id FROM registrations WHERE event_id = 'e1' AND {column} = 'MIT'"
+        ).fetchall()
+        assert [row[0] for row in rows] == ["r1"]
+        plan = " ".join(
+            str(row[3]) for row in conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT DISTINCT {column} FROM registrations WHERE event_id = 'e1'"
+            ).fetchall()
+        )
+        assert f"idx_registrations_{column}" in plan
+
+        # Idempotent
+        assert manager.ensure_hot_field("Where's college?") == column
+        conn.close()
+
+    def test_backfill_pages_registrations(self, tmp_path):
+        """Test that the answers backfill walks registrations in rowid batches"""
+        conn = libsql.connect(str(tmp_path / "paged.db"))
+        manager = SchemaManager(conn)
+        manager.sync_schema()
+        conn.execute(
+            "INSERT INTO events (id, name, date, time, venue) VALUES ('e1', 'Event', '2025-01-01', '10:00', 'Hall')"
+        )
+        conn.executemany(
+            "INSERT INTO registrations (id, event_id, email, phone, form_data) VALUES (?, 'e1', ?, '1', ?)",
+            [(f"r{i}", f"{i}@example.com", f'{{"year": {i}}}') for i in range(1, 6)],
+        )
+        conn.execute("DELETE FROM registration_answers")
+
+        manager._backfill_registration_answers(batch_size=2)
+
+        rows = conn.execute("SELECT registration_id, value FROM registration_answers ORDER BY value").fetchall()
+        assert [tuple(row) for row in rows] == [(f"r{i}", str(i)) for i in range(1, 6)]
+        conn.close()
+
+    def test_json_path_quoting(self, tmp_path):
+        """Test that field names with path syntax are quoted and double quotes are rejected"""
+        conn = libsql.connect(str(tmp_path / "paths.db"))
+        form_data = json.dumps({"a.b[0]": "dotted", "Where's college?": "MIT"})
+        for field_name, value in (("a.b[0]", "dotted"), ("Where's college?", "MIT")):
+            assert conn.execute("SELECT json_extract(?, ?)", [form_data, json_path(field_name)]).fetchone()[0] == value
+        with pytest.raises(ValueError):
+            json_path('say "hi"')
+        conn.close()
+
+
+class TestSchemaIndexes:
+    """Test composite/partial index declarations and the query plan report"""
+
+    def test_partial_index_and_scan_report(self, tmp_path):
+        """Test that partial indexes are created with their WHERE clause and scans are reported"""
+        conn = libsql.connect(str(tmp_path / "plans.db"))
+        manager = SchemaManager(conn)
+        manager.sync_schema()
+
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'idx_jobs_unfinished'").fetchone()[0]
+        assert sql.endswith("ON jobs (status, created_at) WHERE status IN ('pending', 'running')")
+
+        # Every declared hot query is served by an index
+        assert manager.report_query_plans() == []
+
+        unindexed = "SELECT id FROM registrations WHERE phone = ?"
+        assert manager.report_query_plans([unindexed, "SELECT id FROM events WHERE id = ?"]) == [unindexed]
+
+        # Walking a whole index is a scan too
+        index_scans = [
+            "SELECT id FROM registrations ORDER BY event_id, created_at",
+            "SELECT COUNT(*) FROM registrations",
+        ]
+        assert manager.report_query_plans(index_scans) == index_scans
+        conn.close()
+
+    def test_unique_index_over_duplicates_fails_sync(self, tmp_path):
+        """Test that a unique index existing rows violate stops the sync instead of being skipped"""
+        conn = libsql.connect(str(tmp_path / "duplicates.db"))
+        SchemaManager(conn).sync_schema()
+        conn.execute(
+            "INSERT INTO events (id, name, date, time, venue) VALUES ('e1', 'Event', '2025-01-01', '10:00', 'Hall')"
+        )
+        # Simulate a database from before the constraint existed
+        conn.execute("DROP INDEX idx_registrations_event_email_unique")
+        conn.executemany(
+            "INSERT INTO registrations (id, event_id, email, phone, form_data) VALUES (?, 'e1', 'a@example.com', '1', '{}')",
+            [("r1",), ("r2",)],
+        )
+        conn.commit()
+
+        with pytest.raises(RuntimeError, match="idx_registrations_event_email_unique.*1 duplicated"):
+            SchemaManager(conn).sync_schema()
+        conn.close()
+
+
+class TestSchemaObjects:
+    """Test view and trigger definitions"""
+
+    def test_changed_trigger_is_recreated(self, tmp_path):
+        """Test that a trigger whose definition changed is replaced on the next sync"""
+        conn = libsql.connect(str(tmp_path / "objects.db"))
+        SchemaManager(conn).sync_schema()
+        manager = SchemaManager(conn)
+        trigger = next(obj for obj in manager.schema_objects if obj.type == "TRIGGER")
+        stored = "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?"
+        assert conn.execute(stored, [trigger.name]).fetchone()[0] == trigger.sql
+
+        # Simulate an older definition
+        conn.execute(f"DROP TRIGGER {trigger.name}")
+        conn.execute(
+            f"CREATE TRIGGER {trigger.name} INSTEAD OF INSERT ON registration_submissions BEGIN SELECT 1; END"
+        )
+        manager.sync_schema()
+        assert conn.execute(stored, [trigger.name]).fetchone()[0] == trigger.sql
+        conn.close()
+
+    def test_submission_is_all_or_nothing(self, tmp_path):
+        """Test that a rejected submission leaves no partial writes behind"""
+        conn = libsql.connect(str(tmp_path / "submissions.db"))
+        SchemaManager(conn).sync_schema()
+        conn.execute(
+            "INSERT INTO events (id, name, date, time, venue) VALUES ('e1', 'Event', '2025-01-01', '10:00', 'Hall')"
+        )
+        submit = (
+            "INSERT INTO registration_submissions (id, event_id, email, phone, form_data, created_at, answers,"
+            " profile_id, message_id, message_kind, message_payload)"
+            " VALUES (?, ?, 'a@example.com', '1', '{\"a\": \"x\"}', '2025-01-01 00:00:00', '{\"a\": \"x\"}',"
+            " ?, ?, 'registration_confirmation', '{}')"
+        )
+        conn.execute(submit, ["r1", "e1", "p1", "m1"])
+        with pytest.raises(ValueError, match="UNIQUE constraint failed"):
+            conn.execute(submit, ["r2", "e1", "p2", "m2"])
+        with pytest.raises(ValueError, match="event not found"):
+            conn.execute(submit, ["r3", "missing", "p3", "m3"])
+        conn.execute("UPDATE events SET registrations_open = 0 WHERE id = 'e1'")
+        with pytest.raises(ValueError, match="registrations closed"):
+            conn.execute(submit, ["r4", "e1", "p4", "m4"])
+
+        for table in ("registrations", "registration_answers", "user_profiles", "outbox"):
+            assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 1
+        assert conn.execute("SELECT count FROM registration_facets").fetchall() == [(1,)]
+        conn.close()
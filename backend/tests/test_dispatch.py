@@ -0,0 +1,141 @@
+"""Tests for concurrent message dispatch"""
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import Mock, patch
+from app.core.dispatch import TokenBucket, dispatch
+
+
+class TestDispatch:
+    """Test the bounded-concurrency dispatcher"""
+
+    async def test_results_keep_item_order(self):
+        """Test that results line up with the input items"""
+        async def send(item):
+            await asyncio.sleep(0.01 * (5 - item))
+            return {"success": True, "value": item}
+
+        results = await dispatch(list(range(5)), send, concurrency=5)
+        assert [r["value"] for r in results] == [0, 1, 2, 3, 4]
+
+    async def test_concurrency_is_bounded(self):
+        """Test that no more than `concurrency` sends run at once"""
+        in_flight = 0
+        peak = 0
+
+        async def send(item):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return {"success": True}
+
+        await dispatch(list(range(20)), send, concurrency=3)
+        assert peak == 3
+
+    async def test_retryable_failures_are_retried(self):
+        """Test retry with backoff for retryable failures only"""
+        calls = {"flaky": 0, "fatal": 0}
+
+        async def send(item):
+            calls[item] += 1
+            if item == "flaky" and calls[item] < 3:
+                return {"success": False, "retryable": True}
+            if item == "fatal":
+                return {"success": False, "retryable": False}
+            return {"success": True}
+
+        results = await dispatch(["flaky", "fatal"], send, max_retries=2, backoff_base=0.001)
+        assert results[0]["success"] is True
+        assert results[0]["attempts"] == 3
+        assert results[1]["success"] is False
+        assert calls["fatal"] == 1
+
+    async def test_only_transient_exceptions_are_retried(self):
+        """Test that network errors are retried and programming errors are not"""
+        calls = {"network": 0, "bug": 0}
+
+        async def send(item):
+            calls[item] += 1
+            if item == "network":
+                raise ConnectionError("reset by peer")
+            raise KeyError("missing")
+
+        results = await dispatch(["network", "bug"], send, max_retries=2, backoff_base=0.001)
+        assert [r["success"] for r in results] == [False, False]
+        assert calls == {"network": 3, "bug": 1}
+
+    async def test_token_bucket_limits_rate(self):
+        """Test that the token bucket spaces out sends beyond the burst"""
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        assert time.monotonic() - start >= 0.09
+
+
+class TestWhatsAppBulkSend:
+    """Test WhatsAppService.send_bulk_messages with a fake Twilio client"""
+
+    async def test_send_bulk_messages_reports_summary(self, test_db, sample_event_data, monkeypatch):
+        """Test that the concurrent sender reports the same summary as before"""
+        from app.services.event_service import EventService
+        from app.schemas.event import EventCreate
+        from app.core.database import db
+
+        monkeypatch.setenv("TWILIO_ACCOUNT_SID", "AC_test")
+        monkeypatch.setenv("TWILIO_AUTH_TOKEN", "token")
+
+        event = await EventService.create_event(EventCreate(**sample_event_data))
+        for i in range(4):
+            await db.execute(
+                "INSERT INTO registrations (id, event_id, email, phone, form_data) VALUES (?, ?, ?, ?, ?)",
+                [f"reg-{i}", event.id, f"user{i}@example.com", f"98765432{i:02d}", json.dumps({"name": f"User {i}"})],
+            )
+
+        sent_bodies = []
+
+        def create(from_, body, to):
+            if to.endswith("03"):
+                raise ValueError("unreachable")
+            sent_bodies.append(body)
+            return Mock(sid=f"SM{len(sent_bodies)}", status="queued")
+
+        with patch("app.services.whatsapp_service.Client") as client_cls:
+            client_cls.return_value.messages.create.side_effect = create
+            from app.services.whatsapp_service import WhatsAppService
+            service = WhatsAppService()
+            monkeypatch.setattr("app.services.whatsapp_service.settings.WHATSAPP_SEND_MAX_RETRIES", 0)
+            result = await service.send_bulk_messages(event.id, "Hi {{name}}")
+
+        assert result["total"] == 4
+        assert result["sent"] == 3
+        assert result["failed"] == 1
+        assert sorted(sent_bodies) == ["Hi User 0", "Hi User 1", "Hi User 2"]
+        failed = [r for r in result["results"] if r["error"]]
+        assert failed[0]["registration_id"] == "reg-3"
+
+    async def test_send_that_raises_does_not_abort_batch(self, monkeypatch):
+        """Test that a send raising instead of returning a result is reported as failed"""
+        from app.services.whatsapp_service import WhatsAppService
+
+        monkeypatch.setenv("TWILIO_ACCOUNT_SID", "AC_test")
+        monkeypatch.setenv("TWILIO_AUTH_TOKEN", "token")
+        with patch("app.services.whatsapp_service.Client"):
+            service = WhatsAppService()
+
+        async def send_message_async(to_number, message):
+            if to_number == "9876543201":
+                raise RuntimeError("executor gone")
+            return {"success": True, "message_sid": "SM1", "status": "queued", "error": None}
+
+        monkeypatch.setattr(service, "send_message_async", send_message_async)
+        registrations = [
+            {"id": f"reg-{i}", "email": f"user{i}@example.com", "phone": f"987654320{i}", "form_data": "{}"}
+            for i in range(2)
+        ]
+        results = await service.send_to_registrations(registrations, "Hi")
+        assert [(r["success"], r["status"]) for r in results] == [(True, "queued"), (False, "failed")]
+        assert results[1]["error"] == "executor gone"
@@ -0,0 +1,75 @@
+"""Tests for email provider batch sending"""
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+from brevo_python.rest import ApiException
+from app.providers import BrevoEmailProvider, ResendEmailProvider
+
+
+def _messages(count):
+    return [
+        {"to_email": f"user{i}@example.com", "subject": f"Hi {i}", "html_content": f"<p>{i}</p>"}
+        for i in range(count)
+    ]
+
+
+class TestBrevoBatch:
+    """Test Brevo message-version batching"""
+
+    def test_batch_uses_one_request_per_chunk(self, monkeypatch):
+        """Test chunking and per-recipient message ids"""
+        provider = BrevoEmailProvider(api_key="key")
+        monkeypatch.setattr(provider, "MAX_BATCH_SIZE", 2)
+        provider.api_instance = Mock()
+        provider.api_instance.send_transac_email.side_effect = lambda email: SimpleNamespace(
+            message_ids=[f"<{v.to[0]['email']}>" for v in email.message_versions]
+        )
+
+        results = provider.send_batch(_messages(3))
+
+        assert provider.api_instance.send_transac_email.call_count == 2
+        first_request = provider.api_instance.send_transac_email.call_args_list[0].args[0]
+        assert [v.subject for v in first_request.message_versions] == ["Hi 0", "Hi 1"]
+        assert results["user2@example.com"] == {
+            "success": True,
+            "message_id": "<user2@example.com>",
+            "to": "user2@example.com",
+            "error": None,
+        }
+
+    def test_failed_request_fails_its_recipients(self, monkeypatch):
+        """Test that an API error marks only the recipients in that request as failed"""
+        provider = BrevoEmailProvider(api_key="key")
+        monkeypatch.setattr(provider, "MAX_BATCH_SIZE", 2)
+        provider.api_instance = Mock()
+        provider.api_instance.send_transac_email.side_effect = [
+            SimpleNamespace(message_ids=["a", "b"]),
+            ApiException(status=400, reason="Bad Request"),
+        ]
+
+        results = provider.send_batch(_messages(3))
+
+        assert results["user0@example.com"]["success"] is True
+        assert results["user2@example.com"]["success"] is False
+        assert "Status: 400" in results["user2@example.com"]["error"]
+
+
+class TestResendBatch:
+    """Test Resend batch endpoint usage"""
+
+    def test_batch_maps_ids_in_order(self):
+        """Test one batch request and ids mapped back to recipients"""
+        provider = ResendEmailProvider(api_key="key", from_email="events@example.com")
+        with patch("app.providers.resend_provider.resend.Batch.send") as send:
+            send.return_value = {"data": [{"id": "id-0"}, {"id": "id-1"}]}
+            results = provider.send_batch(_messages(2))
+
+        send.assert_called_once()
+        payload = send.call_args.args[0]
+        assert payload[1] == {
+            "from": "events@example.com",
+            "to": "user1@example.com",
+            "subject": "Hi 1",
+            "html": "<p>1</p>",
+        }
+        assert results["user0@example.com"]["message_id"] == "id-0"
+        assert results["user1@example.com"]["success"] is True
@@ -44,6 +44,31 @@ class TestEventFieldsAPI:
         # Should be first 10 chars, lowercase, no special chars
         assert data["field_name"] == "collegename"
 
+    def test_create_event_field_rejects_double_quote(self, client, sample_event_data):
+        """Test that field names with a double quote, which no JSON path can address, are rejected"""
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+
+        response = client.post(f"/api/events/{event_id}/fields/", json={
+            "field_name": 'say "hi"',
+            "field_label": "Greeting",
+            "field_type": "text",
+        })
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_existing_field_with_double_quote_still_loads(self, client, sample_event_data, test_db):
+        """Test that a field stored before the name rule is still returned"""
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        test_db.execute(
+            "INSERT INTO event_fields (id, event_id, field_name, field_type, field_label) "
+            "VALUES ('f1', ?, 'say \"hi\"', 'text', 'Greeting')",
+            [event_id],
+        )
+        test_db.commit()
+
+        response = client.get(f"/api/events/{event_id}/fields/")
+        assert response.status_code == status.HTTP_200_OK
+        assert [field["field_name"] for field in response.json()] == ['say "hi"']
+
     def test_create_field_with_dropdown_options(self, client, sample_event_data):
         """Test creating a dropdown field with options"""
         # Create event
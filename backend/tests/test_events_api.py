@@ -40,6 +40,42 @@ class TestEventsAPI:
         data = response.json()
         assert len(data) == 2
 
+    def test_get_all_events_includes_each_events_fields(self, client, sample_event_data):
+        """Test that the bulk loader attaches fields to the right event"""
+        event_data_1 = sample_event_data.copy()
+        event_data_1["fields"] = [
+            {"field_name": "college", "field_type": "text", "field_label": "College", "field_order": 2},
+            {"field_name": "name", "field_type": "text", "field_label": "Name", "field_order": 1},
+        ]
+        first_id = client.post("/api/events/", json=event_data_1).json()["id"]
+
+        event_data_2 = sample_event_data.copy()
+        event_data_2["name"] = "Second Event"
+        event_data_2["fields"] = [
+            {"field_name": "role", "field_type": "text", "field_label": "Role", "field_order": 1},
+        ]
+        second_id = client.post("/api/events/", json=event_data_2).json()["id"]
+
+        response = client.get("/api/events/")
+        assert response.status_code == status.HTTP_200_OK
+        events = {event["id"]: event for event in response.json()}
+        assert [f["field_name"] for f in events[first_id]["fields"]] == ["name", "college"]
+        assert [f["field_name"] for f in events[second_id]["fields"]] == ["role"]
+
+    def test_get_all_events_paginated(self, client, sample_event_data):
+        """Test limit/offset paging on the events list"""
+        for name in ["First", "Second", "Third"]:
+            event_data = sample_event_data.copy()
+            event_data["name"] = name
+            client.post("/api/events/", json=event_data)
+
+        first_page = client.get("/api/events/?limit=2")
+        assert first_page.status_code == status.HTTP_200_OK
+        assert [e["name"] for e in first_page.json()] == ["Third", "Second"]
+
+        second_page = client.get("/api/events/?limit=2&offset=2")
+        assert [e["name"] for e in second_page.json()] == ["First"]
+
     def test_get_event_by_id(self, client, sample_event_data):
         """Test getting an event by ID"""
         # Create event
@@ -234,3 +270,110 @@ class TestEventsAPI:
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
         assert len(data) == 2
+
+    def _register_many(self, client, event_id, count):
+        for i in range(count):
+            client.post("/api/registrations/", json={
+                "event_id": event_id,
+                "email": f"user{i}@example.com",
+                "phone": f"98765432{i:02d}",
+                "form_data": {"name": f"User {i}", "role": "student" if i % 2 else "mentor"},
+            })
+
+    def test_get_event_registrations_paginated(self, client, sample_event_data):
+        """Test keyset pagination over event registrations"""
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        self._register_many(client, event_id, 5)
+
+        seen = []
+        cursor = None
+        pages = 0
+        while True:
+            url = f"/api/events/{event_id}/registrations?limit=2"
+            if cursor:
+                url += f"&cursor={cursor}"
+            response = client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            seen.extend(reg["id"] for reg in response.json())
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        assert pages == 3
+        assert len(seen) == 5
+        assert len(set(seen)) == 5
+
+    def test_get_event_registrations_filters(self, client, sample_event_data):
+        """Test server-side filters on event registrations"""
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        self._register_many(client, event_id, 4)
+        client.post(f"/api/registrations/check-in/{event_id}/", json={"email": "user1@example.com"})
+
+        response = client.get(f"/api/events/{event_id}/registrations?checked_in=true")
+        assert [reg["email"] for reg in response.json()] == ["user1@example.com"]
+
+        response = client.get(f"/api/events/{event_id}/registrations?email_prefix=user2")
+        assert [reg["email"] for reg in response.json()] == ["user2@example.com"]
+
+        response = client.get(f"/api/events/{event_id}/registrations?phone_prefix=9876543203")
+        assert [reg["email"] for reg in response.json()] == ["user3@example.com"]
+
+        response = client.get(f"/api/events/{event_id}/registrations?form_filter=role:mentor")
+        assert sorted(reg["email"] for reg in response.json()) == ["user0@example.com", "user2@example.com"]
+
+    def test_get_event_registrations_hot_field_filter(self, client, sample_event_data):
+        """Test that filters on a hot field match the same registrations as any other field"""
+        sample_event_data["fields"] = [
+            {"field_name": "role", "field_type": "text", "field_label": "Role", "is_indexed": True},
+        ]
+        response = client.post("/api/events/", json=sample_event_data)
+        event_id = response.json()["id"]
+        assert response.json()["fields"][0]["is_indexed"] is True
+        self._register_many(client, event_id, 4)
+
+        response = client.get(f"/api/events/{event_id}/registrations?form_filter=role:mentor")
+        assert sorted(reg["email"] for reg in response.json()) == ["user0@example.com", "user2@example.com"]
+
+    def test_get_event_registrations_numeric_and_boolean_filters(self, client, sample_event_data):
+        """Test that numeric and boolean answers match their text form, on plain and hot fields"""
+        sample_event_data["fields"] = [
+            {"field_name": "year", "field_type": "text", "field_label": "Year", "is_indexed": True},
+        ]
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        for i, form_data in enumerate([
+            {"year": 3, "alumni": True},
+            {"year": "3", "alumni": False},
+            {"year": 4, "alumni": True},
+        ]):
+            client.post("/api/registrations/", json={
+                "event_id": event_id,
+                "email": f"user{i}@example.com",
+                "phone": f"98765432{i:02d}",
+                "form_data": form_data,
+            })
+
+        url = f"/api/events/{event_id}/registrations"
+        response = client.get(f"{url}?form_filter=year:3")
+        assert sorted(reg["email"] for reg in response.json()) == ["user0@example.com", "user1@example.com"]
+        response = client.get(f"{url}?form_filter=alumni:True&form_filter=year:4")
+        assert [reg["email"] for reg in response.json()] == ["user2@example.com"]
+
+    def test_get_event_registrations_projection(self, client, sample_event_data):
+        """Test the fields= projection on event registrations"""
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        self._register_many(client, event_id, 1)
+
+        response = client.get(f"/api/events/{event_id}/registrations?fields=email,form_data.name")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == [{"email": "user0@example.com", "form_data": {"name": "User 0"}}]
+
+    def test_get_event_registrations_rejects_bad_input(self, client, sample_event_data):
+        """Test that invalid cursors and fields return 400"""
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+
+        response = client.get(f"/api/events/{event_id}/registrations?cursor=not-a-cursor")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = client.get(f"/api/events/{event_id}/registrations?fields=password")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,74 @@
+"""Tests for registration export endpoint"""
+import csv
+import io
+import json
+import pytest
+from fastapi import status
+from app.services.export_service import ExportService
+
+
+class TestExportAPI:
+    """Test streaming registration exports"""
+
+    @pytest.fixture
+    def event_with_registrations(self, client, sample_event_data):
+        event_data = sample_event_data.copy()
+        event_data["fields"] = [
+            {"field_name": "name", "field_type": "text", "field_label": "Full Name", "field_order": 1},
+            {"field_name": "college", "field_type": "text", "field_label": "College Name", "field_order": 2},
+        ]
+        event_id = client.post("/api/events/", json=event_data).json()["id"]
+        for i in range(5):
+            form_data = {"name": f"User {i}", "college": "MIT"}
+            if i == 0:
+                form_data["t_shirt_size"] = "L"
+            client.post("/api/registrations/", json={
+                "event_id": event_id,
+                "email": f"user{i}@example.com",
+                "phone": f"98765432{i:02d}",
+                "form_data": form_data,
+            })
+        return event_id
+
+    def test_export_csv(self, client, event_with_registrations, monkeypatch):
+        """Test CSV export uses event field labels and covers every registration"""
+        monkeypatch.setattr(ExportService, "CHUNK_SIZE", 2)
+
+        response = client.get(f"/api/events/{event_with_registrations}/registrations/export")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "attachment" in response.headers["content-disposition"]
+
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0] == [
+            "Email", "Phone", "Checked In", "Registered At",
+            "Full Name", "College Name", "T Shirt Size",
+        ]
+        assert len(rows) == 6
+        assert {row[0] for row in rows[1:]} == {f"user{i}@example.com" for i in range(5)}
+        user0 = next(row for row in rows[1:] if row[0] == "user0@example.com")
+        assert user0[4:] == ["User 0", "MIT", "L"]
+
+    def test_export_ndjson(self, client, event_with_registrations, monkeypatch):
+        """Test NDJSON export emits one registration per line"""
+        monkeypatch.setattr(ExportService, "CHUNK_SIZE", 2)
+
+        response = client.get(
+            f"/api/events/{event_with_registrations}/registrations/export?format=ndjson"
+        )
+        assert response.status_code == status.HTTP_200_OK
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 5
+        assert all(line["form_data"]["college"] == "MIT" for line in lines)
+
+    def test_export_unknown_event(self, client):
+        """Test exporting a nonexistent event returns 404"""
+        response = client.get("/api/events/99999/registrations/export")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_export_rejects_unknown_format(self, client, event_with_registrations):
+        """Test unsupported formats are rejected"""
+        response = client.get(
+            f"/api/events/{event_with_registrations}/registrations/export?format=xml"
+        )
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
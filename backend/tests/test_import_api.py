@@ -0,0 +1,133 @@
+"""Tests for bulk registration import endpoint"""
+import json
+import pytest
+from fastapi import status
+from app.services.import_service import ImportService
+
+
+class TestImportAPI:
+    """Test bulk registration imports"""
+
+    @pytest.fixture
+    def event_id(self, client, sample_event_data):
+        event_data = sample_event_data.copy()
+        event_data["fields"] = [
+            {"field_name": "name", "field_type": "text", "field_label": "Full Name",
+             "is_required": True, "field_order": 1},
+            {"field_name": "role", "field_type": "select", "field_label": "Role",
+             "field_options": '["mentor", "student"]', "field_order": 2},
+        ]
+        return client.post("/api/events/", json=event_data).json()["id"]
+
+    def _import(self, client, event_id, body, **params):
+        return client.post(
+            f"/api/events/{event_id}/registrations/import",
+            params=params,
+            content=body.encode(),
+        )
+
+    def test_import_csv(self, client, event_id, monkeypatch):
+        """Test CSV import by label, with batching, validation errors and duplicates"""
+        monkeypatch.setattr(ImportService, "BATCH_SIZE", 2)
+        client.post("/api/registrations/", json={
+            "event_id": event_id,
+            "email": "existing@example.com",
+            "phone": "9876543299",
+            "form_data": {"name": "Existing"},
+        })
+
+        body = "\n".join([
+            "Email,Phone,Full Name,Role,Checked In",
+            "a@example.com,9876543200,Alice,mentor,No",
+            "b@example.com,9876543201,Bob,student,No",
+            "a@example.com,9876543200,Alice again,mentor,No",
+            "existing@example.com,9876543299,Existing,,No",
+            "c@example.com,9876543202,,student,No",
+            "d@example.com,12345,Dan,teacher,No",
+            "",
+            "e@example.com,9876543204,Eve,,Yes",
+        ])
+        response = self._import(client, event_id, body)
+        assert response.status_code == status.HTTP_200_OK
+        result = response.json()
+        assert result["total"] == 7
+        assert result["imported"] == 3
+        assert result["duplicates"] == 2
+        assert result["failed"] == 2
+        assert [(e["row"], e["email"]) for e in result["errors"]] == [
+            (6, "c@example.com"),
+            (7, "d@example.com"),
+        ]
+        assert "name: required" in result["errors"][0]["error"]
+        assert "phone" in result["errors"][1]["error"]
+        assert "'teacher' is not one of the options" in result["errors"][1]["error"]
+
+        registrations = client.get(f"/api/events/{event_id}/registrations").json()
+        by_email = {r["email"]: r["form_data"] for r in registrations}
+        assert sorted(by_email) == ["a@example.com", "b@example.com", "e@example.com", "existing@example.com"]
+        assert by_email["a@example.com"] == {"name": "Alice", "role": "mentor"}
+
+        facets = client.get(f"/api/events/{event_id}/facets").json()["fields"]
+        assert facets["role"] == [
+            {"value": "mentor", "count": 1, "checked_in_count": 0},
+            {"value": "student", "count": 1, "checked_in_count": 0},
+        ]
+
+        profile = client.get(
+            "/api/registrations/profile/autofill?email=b@example.com&phone=9876543201"
+        ).json()
+        assert profile["profile_data"] == {"name": "Bob", "role": "student"}
+
+    async def test_import_ndjson_with_confirmations(self, client, event_id, test_db):
+        """Test NDJSON import in flat and export shapes, queueing confirmation emails"""
+        body = "\n".join([
+            json.dumps({"email": "a@example.com", "phone": "9876543200", "name": "Alice"}),
+            json.dumps({"email": "b@example.com", "phone": "9876543201", "form_data": {"name": "Bob"}}),
+            "not json",
+        ])
+        response = self._import(client, event_id, body, format="ndjson", send_confirmations=True)
+        result = response.json()
+        assert (result["imported"], result["failed"]) == (2, 1)
+        assert result["errors"][0] == {"row": 3, "email": None, "error": "Not a JSON object"}
+
+        queued = test_db.execute(
+            "SELECT payload FROM outbox WHERE kind = 'registration_confirmation'"
+        ).fetchall()
+        assert sorted(json.loads(row[0])["email"] for row in queued) == ["a@example.com", "b@example.com"]
+
+    def test_import_batch_is_one_statement_per_table(self, client, event_id):
+        """Test that a batch's rows, answers, facets, profiles and confirmations use multi-row inserts"""
+        from app.core.database import db
+
+        body = "\n".join(
+            json.dumps({"email": f"user{i}@example.com", "phone": f"98765432{i:02d}", "name": f"User {i}",
+                        "role": "mentor" if i % 2 else "student"})
+            for i in range(20)
+        )
+        inserts = []
+
+        def listener(query, params, elapsed, rows):
+            if query.lstrip().startswith("INSERT"):
+                inserts.append((query.split("(")[0].strip(), params))
+
+        db.add_query_listener(listener)
+        try:
+            result = self._import(client, event_id, body, format="ndjson", send_confirmations=True).json()
+        finally:
+            db.remove_query_listener(listener)
+
+        assert result["imported"] == 20
+        assert [table for table, _ in inserts] == [
+            "INSERT INTO registrations",
+            "INSERT INTO registration_answers",
+            "INSERT INTO registration_facets",
+            "INSERT INTO user_profiles",
+            "INSERT INTO outbox",
+        ]
+        # executemany reports no parameters; a multi-row statement binds every row's values
+        assert all(params for _, params in inserts)
+
+    def test_import_unknown_event(self, client):
+        """Test importing into a missing event returns 404"""
+        response = self._import(client, "missing", "email,phone\n")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
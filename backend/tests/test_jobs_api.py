@@ -0,0 +1,225 @@
+"""Tests for background bulk-send jobs"""
+import asyncio
+import pytest
+from fastapi import status
+from unittest.mock import Mock, patch
+from app.core.database import db
+from app.services.job_service import JobService, JobWorker, job_worker
+
+
+@pytest.fixture
+def fake_email_provider():
+    """Email provider that fails for addresses starting with 'bad'"""
+    provider = Mock()
+    provider.get_provider_name.return_value = "fake"
+    sent = []
+
+    def send_email(to_email, subject, html_content):
+        if to_email.startswith("bad"):
+            return {"success": False, "message_id": None, "to": to_email, "error": "rejected"}
+        sent.append(to_email)
+        return {"success": True, "message_id": f"msg-{len(sent)}", "to": to_email, "error": None}
+
+    provider.send_email.side_effect = send_email
+    provider.send_batch.side_effect = lambda messages: {
+        m["to_email"]: send_email(m["to_email"], m["subject"], m["html_content"]) for m in messages
+    }
+    provider.sent = sent
+    with patch("app.services.email_messaging_service.get_email_provider", return_value=provider):
+        yield provider
+
+
+def _create_event_with_registrations(client, sample_event_data, emails):
+    event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+    for i, email in enumerate(emails):
+        client.post("/api/registrations/", json={
+            "event_id": event_id,
+            "email": email,
+            "phone": f"98765432{i:02d}",
+            "form_data": {"name": f"User {i}"},
+        })
+    return event_id
+
+
+def _queue_email_job(client, event_id):
+    response = client.post("/api/email/send-bulk/", json={
+        "event_id": event_id,
+        "subject": "Hello",
+        "message": "Hi {{name}}",
+        "background": True,
+    })
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    return response.json()
+
+
+class TestJobsAPI:
+    """Test job creation, progress, results and cancellation"""
+
+    async def test_background_email_send_runs_as_job(self, client, sample_event_data, fake_email_provider):
+        """Test that a background send returns a job id and the worker completes it"""
+        event_id = _create_event_with_registrations(
+            client, sample_event_data, ["a@example.com", "bad@example.com", "c@example.com"]
+        )
+
+        queued = _queue_email_job(client, event_id)
+        assert queued["status"] == "pending"
+        assert queued["total"] == 3
+
+        job = client.get(f"/api/jobs/{queued['job_id']}").json()
+        assert job["pending"] == 3
+        assert fake_email_provider.send_batch.call_count == 0
+
+        await job_worker.run_job(queued["job_id"])
+
+        job = client.get(f"/api/jobs/{queued['job_id']}").json()
+        assert job["status"] == "completed"
+        assert job["sent"] == 2
+        assert job["failed"] == 1
+        assert job["pending"] == 0
+        assert job["finished_at"] is not None
+
+        failed = client.get(f"/api/jobs/{queued['job_id']}/recipients", params={"status": "failed"}).json()
+        assert len(failed) == 1
+        assert failed[0]["email"] == "bad@example.com"
+        assert failed[0]["error"] == "rejected"
+
+        jobs = client.get("/api/jobs/", params={"event_id": event_id}).json()
+        assert [j["id"] for j in jobs] == [queued["job_id"]]
+
+    async def test_worker_resumes_unsent_recipients(self, client, sample_event_data, fake_email_provider, monkeypatch):
+        """Test that restarting the worker only sends recipients not yet checkpointed"""
+        monkeypatch.setattr("app.services.job_service.settings.JOB_BATCH_SIZE", 2)
+        event_id = _create_event_with_registrations(
+            client, sample_event_data, ["a@example.com", "b@example.com", "c@example.com"]
+        )
+        job_id = _queue_email_job(client, event_id)["job_id"]
+
+        # Simulate a crash after the first recipient was sent and checkpointed
+        first = await db.fetch_one(
+            """
+            SELECT jr.id, r.email FROM job_recipients jr
+            JOIN registrations r ON r.id = jr.registration_id
+            WHERE jr.job_id = ? ORDER BY jr.position LIMIT 1
+            """,
+            [job_id],
+        )
+        await db.execute("UPDATE job_recipients SET status = 'sent' WHERE id = ?", [first["id"]])
+        await db.execute("UPDATE jobs SET status = 'running', sent = 1 WHERE id = ?", [job_id])
+
+        await job_worker.start(concurrency=1)
+        try:
+            for _ in range(200):
+                job = await JobService.get_job(job_id)
+                if job.status == "completed":
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await job_worker.stop()
+
+        assert job.status == "completed"
+        assert job.sent == 3
+        assert sorted(fake_email_provider.sent) == sorted(
+            {"a@example.com", "b@example.com", "c@example.com"} - {first["email"]}
+        )
+
+    async def test_cancel_job(self, client, sample_event_data, fake_email_provider):
+        """Test that a cancelled job is never sent"""
+        event_id = _create_event_with_registrations(client, sample_event_data, ["a@example.com"])
+        job_id = _queue_email_job(client, event_id)["job_id"]
+
+        response = client.post(f"/api/jobs/{job_id}/cancel")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["status"] == "cancelled"
+
+        await job_worker.run_job(job_id)
+        assert fake_email_provider.sent == []
+        assert (await JobService.get_job(job_id)).status == "cancelled"
+
+    async def test_two_workers_send_each_recipient_once(self, client, sample_event_data, fake_email_provider, monkeypatch):
+        """Test that workers in two processes racing for a job never both send it"""
+        monkeypatch.setattr("app.services.job_service.settings.JOB_BATCH_SIZE", 2)
+        emails = [f"user{i}@example.com" for i in range(5)]
+        event_id = _create_event_with_registrations(client, sample_event_data, emails)
+        job_id = _queue_email_job(client, event_id)["job_id"]
+
+        await asyncio.gather(JobWorker().run_job(job_id), JobWorker().run_job(job_id))
+
+        assert sorted(fake_email_provider.sent) == emails
+        job = await JobService.get_job(job_id)
+        assert (job.status, job.sent, job.failed) == ("completed", 5, 0)
+
+    async def test_job_taken_over_after_lease_expires(self, client, sample_event_data, fake_email_provider):
+        """Test that a job held by a live worker is skipped, and resumed once its lease lapses"""
+        event_id = _create_event_with_registrations(
+            client, sample_event_data, ["a@example.com", "b@example.com", "c@example.com"]
+        )
+        job_id = _queue_email_job(client, event_id)["job_id"]
+        recipients = await db.fetch_all(
+            """
+            SELECT jr.id, r.email FROM job_recipients jr
+            JOIN registrations r ON r.id = jr.registration_id
+            WHERE jr.job_id = ? ORDER BY jr.position
+            """,
+            [job_id],
+        )
+
+        # Another worker holds the job: it sent the first recipient and was sending the second
+        await db.execute(
+            "UPDATE jobs SET status = 'running', owner = 'other', sent = 1, "
+            "lease_until = datetime('now', '+60 seconds') WHERE id = ?",
+            [job_id],
+        )
+        await db.execute("UPDATE job_recipients SET status = 'sent' WHERE id = ?", [recipients[0]["id"]])
+        await db.execute(
+            "UPDATE job_recipients SET status = 'sending', owner = 'other', "
+            "lease_until = datetime('now', '+60 seconds') WHERE id = ?",
+            [recipients[1]["id"]],
+        )
+
+        worker = JobWorker()
+        await worker.run_job(job_id)
+        assert fake_email_provider.sent == []
+
+        # It died: both leases lapse
+        await db.execute("UPDATE jobs SET lease_until = datetime('now', '-1 seconds') WHERE id = ?", [job_id])
+        await db.execute(
+            "UPDATE job_recipients SET lease_until = datetime('now', '-1 seconds') WHERE id = ?",
+            [recipients[1]["id"]],
+        )
+        await worker.run_job(job_id)
+
+        assert sorted(fake_email_provider.sent) == sorted(r["email"] for r in recipients[1:])
+        job = await JobService.get_job(job_id)
+        assert (job.status, job.sent) == ("completed", 3)
+
+    def test_get_missing_job(self, client):
+        """Test 404 for unknown jobs"""
+        assert client.get("/api/jobs/missing").status_code == status.HTTP_404_NOT_FOUND
+        assert client.post("/api/jobs/missing/cancel").status_code == status.HTTP_404_NOT_FOUND
+
+    def test_background_email_without_recipients(self, client, sample_event_data, fake_email_provider):
+        """Test that a background email send with no recipients is rejected instead of queueing an empty job"""
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+
+        response = client.post("/api/email/send-bulk/", json={
+            "event_id": event_id,
+            "subject": "Hello",
+            "message": "Hi",
+            "background": True,
+        })
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert client.get(f"/api/jobs/?event_id={event_id}").json() == []
+
+    def test_background_whatsapp_without_recipients(self, client, sample_event_data, monkeypatch):
+        """Test that a background WhatsApp send with no recipients is rejected up front"""
+        monkeypatch.setenv("TWILIO_ACCOUNT_SID", "AC_test")
+        monkeypatch.setenv("TWILIO_AUTH_TOKEN", "token")
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+
+        with patch("app.services.whatsapp_service.Client"):
+            response = client.post("/api/whatsapp/send-bulk/", json={
+                "event_id": event_id,
+                "message": "Hi",
+                "background": True,
+            })
+        assert response.status_code == status.HTTP_404_NOT_FOUND
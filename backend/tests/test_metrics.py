@@ -0,0 +1,138 @@
+"""Tests for request timing metrics"""
+from fastapi import status
+from app.core.metrics import LatencyHistogram, request_metrics
+
+
+class TestLatencyHistogram:
+    """Test bucketed percentile estimates"""
+
+    def test_percentiles(self):
+        """Test that percentiles fall in the right bucket and never exceed the max"""
+        histogram = LatencyHistogram()
+        for value in [3] * 90 + [40] * 9 + [700]:
+            histogram.observe(value)
+
+        assert 2.5 < histogram.percentile(0.5) <= 5
+        assert 25 < histogram.percentile(0.95) <= 50
+        assert histogram.percentile(1.0) == 700
+        assert LatencyHistogram().percentile(0.5) == 0.0
+
+
+class TestAdminMetricsAPI:
+    """Test the request timing middleware and admin metrics endpoint"""
+
+    def test_routes_recorded_by_template_with_db_usage(self, client, sample_event_data):
+        """Test per-route aggregation and per-request query counts"""
+        request_metrics.reset()
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        for _ in range(3):
+            client.get(f"/api/events/{event_id}/registrations")
+        client.get("/api/does-not-exist")
+
+        response = client.get("/api/admin/metrics")
+        assert response.status_code == status.HTTP_200_OK
+        routes = {(r["method"], r["route"]): r for r in response.json()["routes"]}
+
+        registrations = routes[("GET", "/api/events/{event_id}/registrations")]
+        assert registrations["count"] == 3
+        assert registrations["db_queries_per_request"] >= 1
+        assert registrations["p99_ms"] <= registrations["max_ms"]
+        assert routes[("POST", "/api/events/")]["count"] == 1
+        assert ("GET", "unmatched") in routes
+
+
+class TestPrometheusMetrics:
+    """Test the /metrics text exposition"""
+
+    def test_metrics_cover_db_cache_http_and_registrations(self, client, sample_event_data):
+        """Test that core metric families are exported in text format"""
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        client.get(f"/api/events/{event_id}")
+        client.get(f"/api/events/{event_id}")
+        client.post("/api/registrations/", json={
+            "event_id": event_id,
+            "email": "metrics@example.com",
+            "phone": "9876543210",
+            "form_data": {"name": "Metrics"},
+        })
+
+        response = client.get("/metrics")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+
+        assert "# TYPE magpie_db_queries_total counter" in body
+        assert 'magpie_db_queries_total{statement="INSERT INTO registration_submissions (' in body
+        assert "magpie_cache_hits_total" in body
+        assert 'magpie_http_request_duration_seconds_bucket{method="GET",route="/api/events/{event_id}",le="+Inf"}' in body
+        assert "magpie_registrations_total" in body
+
+    def test_metrics_token(self, client, monkeypatch):
+        """Test that a configured token is required"""
+        monkeypatch.setattr("app.main.settings.METRICS_TOKEN", "secret")
+        assert client.get("/metrics").status_code == status.HTTP_401_UNAUTHORIZED
+        assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == status.HTTP_200_OK
+
+    def test_provider_call_outcomes(self):
+        """Test provider latency and error accounting"""
+        from app.core.metrics import provider_call, provider_requests_total
+
+        before = provider_requests_total.value("test", "send", "error")
+        try:
+            with provider_call("test", "send"):
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+        with provider_call("test", "send"):
+            pass
+
+        assert provider_requests_total.value("test", "send", "error") == before + 1
+        assert provider_requests_total.value("test", "send", "success") >= 1
+
+
+class TestQueryProfiler:
+    """Test the slow-query log"""
+
+    async def test_slowest_queries_kept_with_plans(self, client, sample_event_data):
+        """Test that statements are ranked and full scans are flagged"""
+        import asyncio
+        from app.core.database import db, query_profiler
+
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        query_profiler.reset()
+        query_profiler.slow_ms = 0
+        query_profiler.enable()
+        try:
+            await db.fetch_all(
+                "SELECT id FROM registrations WHERE json_extract(form_data, '$.name') = ?", ["x"]
+            )
+            await db.fetch_one("SELECT id FROM events WHERE id = ?", [event_id])
+            for _ in range(5):
+                await asyncio.sleep(0.01)  # plans are fetched in the background
+        finally:
+            query_profiler.disable()
+            query_profiler.slow_ms = 100.0
+
+        snapshot = client.get("/api/admin/slow-queries").json()
+        assert snapshot["enabled"] is False
+        queries = {q["statement"]: q for q in snapshot["queries"]}
+        durations = [q["duration_ms"] for q in snapshot["queries"]]
+        assert durations == sorted(durations, reverse=True)
+
+        scan = queries["SELECT id FROM registrations WHERE json_extract(form_data, '$.name') = ?"]
+        assert scan["params_count"] == 1
+        assert scan["full_scan"] is True
+        lookup = queries["SELECT id FROM events WHERE id = ?"]
+        assert lookup["rows"] == 1
+        assert lookup["full_scan"] is False
+
+        assert client.delete("/api/admin/slow-queries").json()["queries"] == []
+
+    def test_keeps_only_slowest(self):
+        """Test the bounded ranking"""
+        from app.core.database import QueryProfiler
+
+        profiler = QueryProfiler(database=None, slow_ms=10_000, max_entries=2)
+        for elapsed in (0.003, 0.001, 0.005, 0.002):
+            profiler.record(f"SELECT {elapsed}", None, elapsed, 0)
+        assert [q["duration_ms"] for q in profiler.snapshot()["queries"]] == [5.0, 3.0]
@@ -0,0 +1,105 @@
+"""Tests for the registration confirmation outbox"""
+import asyncio
+import json
+import pytest
+from unittest.mock import patch
+from app.core.database import db
+from app.services.outbox_service import OutboxDispatcher, OutboxService, outbox_dispatcher
+
+
+class TestOutbox:
+    """Test outbox writes and dispatcher delivery"""
+
+    @pytest.fixture
+    def registration(self, client, sample_event_data, sample_registration_data):
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        data = {**sample_registration_data, "event_id": event_id}
+        with patch("app.services.email_service.email_service.send_registration_confirmation") as send:
+            response = client.post("/api/registrations/", json=data)
+        assert response.status_code == 201
+        # Registering never talks to the email provider
+        send.assert_not_called()
+        return response.json()
+
+    async def test_registration_queues_confirmation(self, registration):
+        """Test that the confirmation is written to the outbox with the registration"""
+        rows = await db.fetch_all("SELECT kind, payload, status FROM outbox")
+        assert len(rows) == 1
+        assert rows[0]["kind"] == "registration_confirmation"
+        assert rows[0]["status"] == "pending"
+        payload = json.loads(rows[0]["payload"])
+        assert payload["email"] == registration["email"]
+        assert payload["event_id"] == registration["event_id"]
+
+    async def test_dispatch_delivers_and_marks_sent(self, registration):
+        """Test that the dispatcher sends due messages once"""
+        with patch("app.services.registration_service.email_service.send_registration_confirmation", return_value=True) as send:
+            assert await outbox_dispatcher.dispatch_due() == 1
+            assert await outbox_dispatcher.dispatch_due() == 0
+
+        send.assert_called_once()
+        assert send.call_args.kwargs["to_email"] == registration["email"]
+        row = await db.fetch_one("SELECT status, attempts, sent_at FROM outbox")
+        assert row["status"] == "sent"
+        assert row["attempts"] == 1
+        assert row["sent_at"] is not None
+
+    async def test_failed_delivery_is_retried_later(self, registration, monkeypatch):
+        """Test backoff scheduling and giving up after the last attempt"""
+        monkeypatch.setattr("app.services.outbox_service.settings.OUTBOX_MAX_ATTEMPTS", 2)
+        with patch("app.services.registration_service.email_service.send_registration_confirmation", return_value=False):
+            await outbox_dispatcher.dispatch_due()
+            row = await db.fetch_one("SELECT status, attempts, next_attempt_at > CURRENT_TIMESTAMP AS deferred FROM outbox")
+            assert row["status"] == "pending"
+            assert row["attempts"] == 1
+            assert row["deferred"] == 1
+
+            # Not due yet
+            assert await outbox_dispatcher.dispatch_due() == 0
+
+            await db.execute("UPDATE outbox SET next_attempt_at = CURRENT_TIMESTAMP")
+            await outbox_dispatcher.dispatch_due()
+
+        row = await db.fetch_one("SELECT status, attempts, last_error FROM outbox")
+        assert row["status"] == "failed"
+        assert row["attempts"] == 2
+        assert row["last_error"] == "Delivery failed"
+
+    async def test_two_dispatchers_deliver_each_message_once(self, registration, monkeypatch):
+        """Test that dispatchers in two processes never deliver the same message"""
+        monkeypatch.setattr("app.services.outbox_service.settings.OUTBOX_BATCH_SIZE", 3)
+        await OutboxService.enqueue_many("test", [{"n": n} for n in range(9)])
+        delivered = []
+
+        async def handler(payload):
+            await asyncio.sleep(0.01)  # both dispatchers are mid-delivery at once
+            delivered.append(payload["n"])
+            return True
+
+        dispatchers = [OutboxDispatcher(), OutboxDispatcher()]
+        for dispatcher in dispatchers:
+            dispatcher.register("test", handler)
+
+        async def drain(dispatcher):
+            while await dispatcher.dispatch_due():
+                pass
+
+        await asyncio.gather(*(drain(dispatcher) for dispatcher in dispatchers))
+        assert sorted(delivered) == list(range(9))
+        row = await db.fetch_one("SELECT COUNT(*) AS count FROM outbox WHERE kind = 'test' AND status = 'sent'")
+        assert row["count"] == 9
+
+    async def test_expired_lease_is_claimed_again(self, registration):
+        """Test that a message left sending by a dispatcher that died is delivered later"""
+        await db.execute(
+            "UPDATE outbox SET status = 'sending', lease_until = datetime('now', '+60 seconds')"
+        )
+        with patch("app.services.registration_service.email_service.send_registration_confirmation", return_value=True) as send:
+            assert await outbox_dispatcher.dispatch_due() == 0
+
+            await db.execute("UPDATE outbox SET lease_until = datetime('now', '-1 seconds')")
+            assert await outbox_dispatcher.dispatch_due() == 1
+
+        send.assert_called_once()
+        row = await db.fetch_one("SELECT status, lease_until FROM outbox")
+        assert (row["status"], row["lease_until"]) == ("sent", None)
@@ -78,6 +78,45 @@ class TestRegistrationsAPI:
         data = response.json()
         assert data["form_data"]["collegename"] == "MIT"
 
+    def test_create_registration_is_one_statement(self, client, sample_event_data, test_db):
+        """Test that a registration and everything it writes take a single database statement"""
+        from app.core.database import db
+
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        statements = []
+        listener = lambda query, params, elapsed, rows: statements.append((" ".join(query.split()), params))
+        db.add_query_listener(listener)
+        try:
+            response = client.post("/api/registrations/", json={
+                "event_id": event_id,
+                "email": "john@example.com",
+                "phone": "9876543210",
+                "form_data": {"name": "John Doe", "collegename": "MIT", "year": 3},
+            })
+        finally:
+            db.remove_query_listener(listener)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert [query.split("(")[0] for query, _ in statements] == ["INSERT INTO registration_submissions "]
+
+        # The trigger wrote every table
+        registration_id = response.json()["id"]
+        assert test_db.execute(
+            "SELECT field_name, value FROM registration_answers WHERE registration_id = ? ORDER BY field_name",
+            [registration_id],
+        ).fetchall() == [("collegename", "MIT"), ("name", "John Doe"), ("year", "3")]
+        assert test_db.execute(
+            "SELECT COUNT(*) FROM registration_facets WHERE event_id = ? AND count = 1", [event_id]
+        ).fetchone()[0] == 3
+        assert test_db.execute(
+            "SELECT phone FROM user_profiles WHERE email = 'john@example.com'"
+        ).fetchone()[0] == "9876543210"
+        assert test_db.execute(
+            "SELECT COUNT(*) FROM outbox WHERE kind = 'registration_confirmation'"
+        ).fetchone()[0] == 1
+        # The response is built without reading the row back, and matches it
+        assert client.get(f"/api/registrations/{registration_id}").json() == response.json()
+
     def test_create_registration_with_missing_required_fields(self, client, sample_event_data):
         """Test creating registration with missing required fields"""
         # Create event
@@ -244,6 +283,12 @@ class TestRegistrationsAPI:
         data = response.json()
         assert data["message"] == "Successfully checked in"
         assert data["email"] == registration_data["email"]
+        assert data["already_checked_in"] is False
+
+        response = client.post(f"/api/registrations/check-in/{event_id}", json={
+            "email": registration_data["email"]
+        })
+        assert response.json()["already_checked_in"] is True
 
     def test_check_in_nonexistent_registration(self, client, sample_event_data):
         """Test checking in a non-existent registration"""
@@ -339,3 +384,276 @@ class TestRegistrationsAPI:
         response2 = client.post("/api/registrations/", json=registration_data)
         assert response2.status_code == status.HTTP_400_BAD_REQUEST
         assert "already registered" in response2.json()["detail"].lower()
+
+    async def test_concurrent_duplicates_and_profile_upsert(self, client, sample_event_data):
+        """Test that racing duplicates register once and the profile keeps the latest answers"""
+        import asyncio
+        from app.schemas.registration import RegistrationCreate
+        from app.services.registration_service import DuplicateRegistrationError, RegistrationService
+
+        event_ids = [client.post("/api/events/", json=sample_event_data).json()["id"] for _ in range(2)]
+
+        def registration(event_id, name):
+            return RegistrationCreate(
+                event_id=event_id, email="race@example.com", phone="9876543210", form_data={"name": name}
+            )
+
+        results = await asyncio.gather(
+            *(RegistrationService.create_registration(registration(event_ids[0], "First")) for _ in range(3)),
+            return_exceptions=True,
+        )
+        assert sum(isinstance(r, DuplicateRegistrationError) for r in results) == 2
+        created = next(r for r in results if not isinstance(r, Exception))
+        assert created.email == "race@example.com"
+        assert created.is_checked_in is False
+        assert created.created_at
+
+        await RegistrationService.create_registration(registration(event_ids[1], "Second"))
+        profile = await RegistrationService.get_user_profile("race@example.com", "9876543210")
+        assert profile.profile_data == {"name": "Second"}
+
+
+class TestRegistrationAnswers:
+    """Test the indexed registration_answers table"""
+
+    async def test_filters_and_distinct_values_use_answers(self, client, sample_event_data):
+        """Test subset filters and field values for text and checkbox answers"""
+        from app.services.email_messaging_service import EmailMessagingService
+        from app.services.registration_service import RegistrationService
+        from app.services.whatsapp_service import WhatsAppService
+
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        answers = [
+            {"name": "A", "college": "MIT", "parking": True},
+            {"name": "B", "college": "Stanford", "parking": False},
+            {"name": "C", "college": "MIT", "parking": True, "notes": ""},
+        ]
+        for i, form_data in enumerate(answers):
+            client.post("/api/registrations/", json={
+                "event_id": event_id,
+                "email": f"user{i}@example.com",
+                "phone": f"98765432{i:02d}",
+                "form_data": form_data,
+            })
+
+        assert await RegistrationService.get_answer_values(event_id, "college") == ["MIT", "Stanford"]
+        assert await RegistrationService.get_answer_values(event_id, "parking") == ["True"]
+        assert await RegistrationService.get_answer_values(event_id, "notes") == []
+
+        mit = await WhatsAppService.get_target_registrations(event_id, "college", "MIT")
+        assert sorted(r["email"] for r in mit) == ["user0@example.com", "user2@example.com"]
+
+        parking = await EmailMessagingService.get_target_registrations(event_id, "subset", "parking", "True")
+        assert sorted(r["email"] for r in parking) == ["user0@example.com", "user2@example.com"]
+        assert parking[0]["event_name"] == "Test Event"
+        assert len(await EmailMessagingService.get_target_registrations(event_id, "all")) == 3
+        assert await EmailMessagingService.get_target_registrations(event_id, "subset") == []
+
+
+class TestRegistrationFacets:
+    """Test the materialized per-event facet counts"""
+
+    def test_facets_follow_registrations(self, client, sample_event_data):
+        """Test that facet counts track registration, check-in and delete"""
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        ids = []
+        for i, role in enumerate(["mentor", "student", "mentor"]):
+            response = client.post("/api/registrations/", json={
+                "event_id": event_id,
+                "email": f"user{i}@example.com",
+                "phone": f"98765432{i:02d}",
+                "form_data": {"role": role},
+            })
+            ids.append(response.json()["id"])
+
+        # Checking in twice counts once; undoing check-in reverses it
+        client.post(f"/api/registrations/check-in/{event_id}/", json={"email": "user0@example.com"})
+        client.post(f"/api/registrations/check-in/{event_id}/", json={"email": "user0@example.com"})
+        client.post(f"/api/registrations/{ids[1]}/check-in/", json={"check_in": True})
+        client.post(f"/api/registrations/{ids[1]}/check-in/", json={"check_in": False})
+
+        response = client.get(f"/api/events/{event_id}/facets")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            "event_id": event_id,
+            "fields": {
+                "role": [
+                    {"value": "mentor", "count": 2, "checked_in_count": 1},
+                    {"value": "student", "count": 1, "checked_in_count": 0},
+                ],
+            },
+        }
+
+        assert client.delete(f"/api/registrations/{ids[0]}").status_code == status.HTTP_204_NO_CONTENT
+        assert client.delete(f"/api/registrations/{ids[1]}").status_code == status.HTTP_204_NO_CONTENT
+        assert client.delete(f"/api/registrations/{ids[1]}").status_code == status.HTTP_404_NOT_FOUND
+
+        response = client.get(f"/api/events/{event_id}/facets")
+        assert response.json()["fields"] == {
+            "role": [{"value": "mentor", "count": 1, "checked_in_count": 0}],
+        }
+
+    def test_facets_unknown_event(self, client):
+        """Test facets for a missing event return 404"""
+        response = client.get("/api/events/missing/facets")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestDoorCheckIn:
+    """Test scanner check-ins served from the in-memory index"""
+
+    def _register(self, client, event_id, email, role="mentor"):
+        return client.post("/api/registrations/", json={
+            "event_id": event_id,
+            "email": email,
+            "phone": "9876543210",
+            "form_data": {"role": role},
+        }).json()["id"]
+
+    async def test_buffered_check_ins(self, client, sample_event_data, test_db, monkeypatch):
+        """Test that scans are answered at once and written on flush"""
+        from app.core.config import get_settings
+        from app.services.checkin_service import CheckInService, checkin_writer
+        from app.services.registration_service import RegistrationService
+
+        monkeypatch.setattr(get_settings(), "CHECKIN_FLUSH_INTERVAL", 60.0)
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        first = self._register(client, event_id, "a@example.com")
+        second = self._register(client, event_id, "b@example.com", role="student")
+
+        await checkin_writer.start()
+        try:
+            assert await CheckInService.check_in(event_id, "a@example.com") is True
+            assert await CheckInService.check_in(event_id, "a@example.com") is False
+            assert await CheckInService.check_in(event_id, "b@example.com") is True
+            assert await CheckInService.check_in(event_id, "nobody@example.com") is None
+            assert test_db.execute(
+                "SELECT COUNT(*) FROM registrations WHERE is_checked_in = 1"
+            ).fetchone()[0] == 0
+
+            # An undo waits for the buffered scan instead of being overwritten by it
+            await RegistrationService.check_in_registration_by_id(second, False)
+        finally:
+            await checkin_writer.stop()
+
+        rows = {row[0]: row[1:] for row in test_db.execute(
+            "SELECT id, is_checked_in, checked_in_at IS NOT NULL FROM registrations"
+        ).fetchall()}
+        assert rows == {first: (1, 1), second: (0, 0)}
+        facets = client.get(f"/api/events/{event_id}/facets").json()["fields"]
+        assert facets["role"] == [
+            {"value": "mentor", "count": 1, "checked_in_count": 1},
+            {"value": "student", "count": 1, "checked_in_count": 0},
+        ]
+
+    def test_registration_missing_from_index(self, client, sample_event_data, test_db):
+        """Test that a registration written by another process is found in the database"""
+        from app.services.checkin_service import checkin_index
+
+        # Creating the event active loads its (empty) index
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        assert checkin_index.get_event(event_id) == {}
+        test_db.execute(
+            "INSERT INTO registrations (id, event_id, email, phone, form_data) "
+            "VALUES ('elsewhere', ?, 'late@example.com', '9876543210', '{}')",
+            [event_id],
+        )
+        test_db.commit()
+
+        url = f"/api/registrations/check-in/{event_id}/"
+        assert client.post(url, json={"email": "late@example.com"}).json()["already_checked_in"] is False
+        assert client.post(url, json={"email": "late@example.com"}).json()["already_checked_in"] is True
+        assert test_db.execute(
+            "SELECT is_checked_in FROM registrations WHERE id = 'elsewhere'"
+        ).fetchone()[0] == 1
+
+    async def test_undo_reaches_other_worker_index(self, client, sample_event_data, test_db, monkeypatch):
+        """Test that an undo on one worker reaches another worker's index over the bus"""
+        from app.core.cache_bus import DatabaseInvalidationBackend, InvalidationBus
+        from app.services import checkin_service, registration_service
+        from app.services.checkin_service import CheckInIndex, CheckInService, apply_remote_check_ins
+        from app.services.registration_service import RegistrationService
+
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        registration_id = self._register(client, event_id, "a@example.com")
+
+        def use_index(index):
+            monkeypatch.setattr(checkin_service, "checkin_index", index)
+            monkeypatch.setattr(registration_service, "checkin_index", index)
+
+        worker_a, worker_b = CheckInIndex(10), CheckInIndex(10)
+
+        async def deliver_to_b(tags):
+            use_index(worker_b)
+            await apply_remote_check_ins(tags)
+
+        monkeypatch.setattr(checkin_service, "invalidation_bus", InvalidationBus(DatabaseInvalidationBackend()))
+        receiver = DatabaseInvalidationBackend(poll_interval=60)
+        await receiver.start("worker-b", deliver_to_b)
+        try:
+            use_index(worker_b)
+            assert await CheckInService.check_in(event_id, "a@example.com") is True
+
+            use_index(worker_a)
+            await CheckInService.warm(event_id)
+            await RegistrationService.check_in_registration_by_id(registration_id, False)
+            await receiver.poll()
+        finally:
+            await receiver.stop()
+
+        assert worker_b.get_event(event_id)["a@example.com"].checked_in is False
+        assert await CheckInService.check_in(event_id, "a@example.com") is True
+        assert await CheckInService.check_in(event_id, "a@example.com") is False
+        assert test_db.execute(
+            "SELECT is_checked_in FROM registrations WHERE id = ?", [registration_id]
+        ).fetchone()[0] == 1
+        facets = client.get(f"/api/events/{event_id}/facets").json()["fields"]
+        assert facets["role"] == [{"value": "mentor", "count": 1, "checked_in_count": 1}]
+
+    async def test_rescan_and_unknown_events_stay_in_memory(self, client, sample_event_data, test_db):
+        """Test that re-scans don't write, and scans for other event ids don't evict the active one"""
+        from app.core.database import db
+        from app.services.checkin_service import CheckInService, checkin_index
+
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        self._register(client, event_id, "a@example.com")
+        assert await CheckInService.check_in(event_id, "a@example.com") is True
+
+        statements = []
+        listener = lambda query, params, elapsed, rows: statements.append(query)
+        db.add_query_listener(listener)
+        try:
+            for _ in range(3):
+                assert await CheckInService.check_in(event_id, "a@example.com") is False
+        finally:
+            db.remove_query_listener(listener)
+        assert statements == []
+
+        for i in range(checkin_index.max_events + 1):
+            assert await CheckInService.check_in(f"bogus-{i}", "a@example.com") is None
+        assert checkin_index.get_event(event_id) is not None
+        assert all(checkin_index.get_event(f"bogus-{i}") is None for i in range(checkin_index.max_events + 1))
+
+    async def test_remote_check_in_state_updates_index(self, client, sample_event_data, test_db):
+        """Test that check-ins and undos published by another worker reach the index"""
+        from app.core.cache_bus import DatabaseInvalidationBackend, InvalidationBus, invalidation_bus
+        from app.services.checkin_service import CHECKED_IN_TAG, CHECKED_OUT_TAG, CheckInService, checkin_index
+
+        event_id = client.post("/api/events/", json=sample_event_data).json()["id"]
+        registration_id = self._register(client, event_id, "a@example.com")
+        await CheckInService.warm(event_id)
+        entry = checkin_index.get_event(event_id)["a@example.com"]
+
+        backend = DatabaseInvalidationBackend(poll_interval=60)
+        await backend.start(invalidation_bus.origin, invalidation_bus._deliver)
+        try:
+            other_worker = InvalidationBus(backend)
+            await other_worker.publish([CHECKED_IN_TAG + registration_id])
+            await backend.poll()
+            assert entry.checked_in is True
+
+            await other_worker.publish([CHECKED_OUT_TAG + registration_id])
+            await backend.poll()
+            assert entry.checked_in is False
+        finally:
+            await backend.stop()
@@ -9,7 +9,7 @@ import { Label } from "@/components/ui/label";
 import { RadioGroup, RadioGroupItem } from "@/components/ui/radio-group";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
 import { Alert, AlertDescription } from "@/components/ui/alert";
-import { emailApi, messageTemplatesApi } from '../services/api';
+import { emailApi, messageTemplatesApi, jobsApi } from '../services/api';
 
 // Icons (inline SVG)
 const MailIcon = ({ className = "h-6 w-6" }) => (
@@ -54,6 +54,7 @@ export default function EmailModal({ eventId, eventFields, isOpen, onClose, regi
   const [filterValue, setFilterValue] = useState('');
   const [fieldValues, setFieldValues] = useState([]);
   const [isSending, setIsSending] = useState(false);
+  const [progress, setProgress] = useState(null);
   const [sendResult, setSendResult] = useState(null);
 
   useEffect(() => {
@@ -141,21 +142,25 @@ export default function EmailModal({ eventId, eventFields, isOpen, onClose, regi
         payload.template_variables = templateVariables;
       }
 
+      // Queue the send as a background job and poll it so large events don't time out
+      payload.background = true;
       const response = await emailApi.sendBulkEmails(payload);
-      setSendResult(response.data);
+      const result = await jobsApi.waitForCompletion(response.data.job_id, setProgress);
+      setSendResult(result);
 
-      if (response.data.sent > 0) {
-        toast.success(`Successfully sent ${response.data.sent} emails!`);
+      if (result.sent > 0) {
+        toast.success(`Successfully sent ${result.sent} emails!`);
       }
 
-      if (response.data.failed > 0) {
-        toast.error(`Failed to send ${response.data.failed} emails`);
+      if (result.failed > 0) {
+        toast.error(`Failed to send ${result.failed} emails`);
       }
     } catch (error) {
       console.error('Error sending emails:', error);
       toast.error(error.response?.data?.detail || 'Failed to send emails');
     } finally {
       setIsSending(false);
+      setProgress(null);
     }
   };
 
@@ -441,7 +446,9 @@ export default function EmailModal({ eventId, eventFields, isOpen, onClose, regi
               {isSending ? (
                 <>
                   <LoaderIcon className="h-4 w-4 mr-2" />
-                  <span>Sending...</span>
+                  <span>
+                    {progress ? `Sending... ${progress.sent + progress.failed}/${progress.total}` : 'Sending...'}
+                  </span>
                 </>
               ) : (
                 <>
@@ -9,7 +9,7 @@ import { Label } from "@/components/ui/label";
 import { RadioGroup, RadioGroupItem } from "@/components/ui/radio-group";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
 import { Alert, AlertDescription } from "@/components/ui/alert";
-import { whatsappApi, messageTemplatesApi } from '../services/api';
+import { whatsappApi, messageTemplatesApi, jobsApi } from '../services/api';
 
 // Icons (inline SVG)
 const SendIcon = ({ className = "h-6 w-6" }) => (
@@ -53,6 +53,7 @@ export default function WhatsAppModal({ eventId, eventFields, isOpen, onClose, r
   const [filterValue, setFilterValue] = useState('');
   const [fieldValues, setFieldValues] = useState([]);
   const [isSending, setIsSending] = useState(false);
+  const [progress, setProgress] = useState(null);
   const [sendResult, setSendResult] = useState(null);
 
   useEffect(() => {
@@ -134,21 +135,25 @@ export default function WhatsAppModal({ eventId, eventFields, isOpen, onClose, r
         payload.template_variables = templateVariables;
       }
 
+      // Queue the send as a background job and poll it so large events don't time out
+      payload.background = true;
       const response = await whatsappApi.sendBulkMessages(payload);
-      setSendResult(response.data);
+      const result = await jobsApi.waitForCompletion(response.data.job_id, setProgress);
+      setSendResult(result);
 
-      if (response.data.sent > 0) {
-        toast.success(`Successfully sent ${response.data.sent} messages!`);
+      if (result.sent > 0) {
+        toast.success(`Successfully sent ${result.sent} messages!`);
       }
 
-      if (response.data.failed > 0) {
-        toast.error(`Failed to send ${response.data.failed} messages`);
+      if (result.failed > 0) {
+        toast.error(`Failed to send ${result.failed} messages`);
       }
     } catch (error) {
       console.error('Error sending WhatsApp messages:', error);
       toast.error(error.response?.data?.detail || 'Failed to send messages');
     } finally {
       setIsSending(false);
+      setProgress(null);
     }
   };
 
@@ -421,7 +426,9 @@ export default function WhatsAppModal({ eventId, eventFields, isOpen, onClose, r
               {isSending ? (
                 <>
                   <LoaderIcon className="h-4 w-4 mr-2" />
-                  <span>Sending...</span>
+                  <span>
+                    {progress ? `Sending... ${progress.sent + progress.failed}/${progress.total}` : 'Sending...'}
+                  </span>
                 </>
               ) : (
                 <>
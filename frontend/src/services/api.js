@@ -103,4 +103,41 @@ export const emailApi = {
   getFieldValues: (eventId, fieldName) => api.get(`/email/field-values/${eventId}/${encodeURIComponent(fieldName)}`),
 };
 
+// Background jobs API (bulk sends queued with `background: true`)
+const JOB_POLL_INTERVAL_MS = 1500;
+const FINISHED_JOB_STATUSES = ['completed', 'failed', 'cancelled'];
+
+export const jobsApi = {
+  get: (jobId) => api.get(`/jobs/${jobId}`),
+  getRecipients: (jobId, params) => api.get(`/jobs/${jobId}/recipients`, { params }),
+  cancel: (jobId) => api.post(`/jobs/${jobId}/cancel`),
+
+  // Poll a job until it finishes; resolves to a send summary ({ total, sent, failed, results })
+  waitForCompletion: async (jobId, onProgress) => {
+    let job;
+    for (;;) {
+      job = (await jobsApi.get(jobId)).data;
+      onProgress?.(job);
+      if (FINISHED_JOB_STATUSES.includes(job.status)) break;
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Background send failed');
+    }
+
+    const failures = job.failed > 0
+      ? (await jobsApi.getRecipients(jobId, { status: 'failed', limit: 1000 })).data
+      : [];
+    return {
+      job_id: job.id,
+      status: job.status,
+      total: job.total,
+      sent: job.sent,
+      failed: job.failed,
+      results: failures.map((recipient) => ({ ...recipient, success: false, message_sid: null })),
+    };
+  },
+};
+
 export default api;